@@ -0,0 +1,275 @@
+# app/cache.py
+"""
+Shared cache for computed results, selected by CACHE_BACKEND
+
+    memory - in-process LRU with TTL (default; per uvicorn worker)
+    redis  - any server speaking the Redis protocol at CACHE_URL, shared by all
+             workers (needs the `redis` package)
+
+Keys for one business live in a namespace with a generation counter, so
+invalidate_business() drops all of them with a single increment.
+
+get_or_compute() is single-flight: while one caller (thread or worker process)
+computes a key, the others wait for its result instead of computing it again.
+
+Values are pickled for the redis backend - only point CACHE_URL at a trusted server.
+A redis outage degrades to recomputation; failures are logged at most once per
+CACHE_ERROR_LOG_INTERVAL, not once per request.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "smartpesa:")
+CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", "3600"))
+# memory backend only
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+# Longest a single-flight computation may hold its lock before others compute anyway
+CACHE_LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", "120"))
+# How often waiters check for the result
+CACHE_LOCK_POLL = 0.05
+# redis backend only - log a failing cache at most once per interval
+CACHE_ERROR_LOG_INTERVAL = float(os.getenv("CACHE_ERROR_LOG_INTERVAL", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+class Cache(ABC):
+    """Backend-independent behaviour - subclasses implement the primitives"""
+
+    @abstractmethod
+    def get(self, key: str):
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value, ttl: int = None):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def _acquire(self, key: str, wait: float):
+        """Lock token if acquired within `wait` seconds, else None"""
+
+    @abstractmethod
+    def _release(self, key: str, token):
+        ...
+
+    def business_key(self, business_id: int, *parts) -> str:
+        """Key inside the business's namespace"""
+        generation = self.get(f"gen:b{business_id}") or 0
+        return ":".join([f"b{business_id}", f"g{int(generation)}", *map(str, parts)])
+
+    def invalidate_business(self, business_id: int):
+        """Make every key of this business unreachable - old entries expire on their own"""
+        self.incr(f"gen:b{business_id}")
+
+    def get_or_compute(self, key: str, compute, ttl: int = None, cache_if=None):
+        """Cached value, or compute it once across all callers
+
+        `cache_if(value)` decides whether a computed value is stored (default: not None).
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+        while True:
+            token = self._acquire(key, CACHE_LOCK_POLL)
+            if token is not None:
+                try:
+                    # The previous holder may have finished while we waited
+                    value = self.get(key)
+                    if value is None:
+                        value = compute()
+                        if (cache_if or (lambda v: v is not None))(value):
+                            self.set(key, value, ttl)
+                    return value
+                finally:
+                    self._release(key, token)
+
+            value = self.get(key)
+            if value is not None:
+                return value
+            if time.monotonic() > deadline:
+                # Holder is stuck or gone - don't wait forever
+                return compute()
+
+
+class MemoryCache(Cache):
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Generation counters are kept apart so LRU eviction can't reset them
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._flight_locks = {}
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or CACHE_DEFAULT_TTL), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def _acquire(self, key, wait):
+        # [lock, callers holding or waiting] - dropped once nobody references it
+        with self._lock:
+            flight = self._flight_locks.setdefault(key, [threading.Lock(), 0])
+            flight[1] += 1
+        if flight[0].acquire(timeout=wait):
+            return flight
+        self._forget_flight(key, flight)
+        return None
+
+    def _release(self, key, token):
+        token[0].release()
+        self._forget_flight(key, token)
+
+    def _forget_flight(self, key, flight):
+        with self._lock:
+            flight[1] -= 1
+            if flight[1] == 0:
+                self._flight_locks.pop(key, None)
+
+
+class RedisCache(Cache):
+    # Delete the lock only if we still own it
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+    def __init__(self, url: str = CACHE_URL, prefix: str = CACHE_PREFIX):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package (pip install redis)")
+        self.errors = redis.RedisError
+        self.client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self._release_script = self.client.register_script(self.RELEASE_SCRIPT)
+        self.prefix = prefix
+        self.url = url
+        self.failures = 0
+        self._failures_logged = 0
+        self._last_error_log = float('-inf')
+        self._log_lock = threading.Lock()
+
+    def _k(self, key):
+        return self.prefix + key
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self._k(key))
+        except self.errors as e:
+            # Cache outages degrade to recomputation, never to failed requests
+            self._log_failure("read", e)
+            return None
+        if raw is None:
+            return None
+        return int(raw) if key.startswith("gen:") else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.client.set(self._k(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                            ex=ttl or CACHE_DEFAULT_TTL)
+        except self.errors as e:
+            self._log_failure("write", e)
+
+    def delete(self, key):
+        try:
+            self.client.delete(self._k(key))
+        except self.errors as e:
+            self._log_failure("delete", e)
+
+    def incr(self, key):
+        try:
+            return self.client.incr(self._k(key))
+        except self.errors as e:
+            self._log_failure("increment", e)
+            return None
+
+    def _acquire(self, key, wait):
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.client.set(self._k(f"lock:{key}"), token, nx=True,
+                                       px=int(CACHE_LOCK_TIMEOUT * 1000))
+        except self.errors as e:
+            # No shared lock available - compute locally
+            self._log_failure("lock", e)
+            return token
+        if acquired:
+            return token
+        time.sleep(wait)
+        return None
+
+    def _release(self, key, token):
+        try:
+            self._release_script(keys=[self._k(f"lock:{key}")], args=[token])
+        except self.errors as e:
+            # The lock expires on its own after CACHE_LOCK_TIMEOUT
+            self._log_failure("unlock", e)
+
+    def _log_failure(self, operation, error):
+        """One warning per CACHE_ERROR_LOG_INTERVAL during an outage, not one per call"""
+        with self._log_lock:
+            self.failures += 1
+            now = time.monotonic()
+            if now - self._last_error_log < CACHE_ERROR_LOG_INTERVAL:
+                return
+            count = self.failures - self._failures_logged
+            self._failures_logged = self.failures
+            self._last_error_log = now
+        logger.warning("Cache %s failed (%d failures since last report), recomputing: %s",
+                       operation, count, error)
+
+
+_cache = None
+_cache_guard = threading.Lock()
+
+def get_cache() -> Cache:
+    """Process-wide cache for the configured backend"""
+    global _cache
+    with _cache_guard:
+        if _cache is None:
+            if CACHE_BACKEND == "redis":
+                _cache = RedisCache()
+                logger.info("Using Redis cache at %s", _cache.url)
+            elif CACHE_BACKEND == "memory":
+                _cache = MemoryCache()
+            else:
+                raise RuntimeError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND} (use memory or redis)")
+        return _cache
@@ -6,8 +6,10 @@ from app import models
 import json
 
 class CreditScoringEngine:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, read_db: Session = None):
         self.db = db
+        # Heavy aggregate reads can go to a read replica; writes always use db
+        self.read_db = read_db or db
     
     def calculate_credit_score(self, business_id: int, user_id: int):
         """Calculate comprehensive credit score for a business"""
@@ -98,7 +100,7 @@ class CreditScoringEngine:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=365)
         
-        monthly_revenue = self.db.query(
+        monthly_revenue = self.read_db.query(
             func.strftime('%Y-%m', models.Transaction.created_at).label('month'),
             func.sum(models.Transaction.amount).label('revenue')
         ).filter(
@@ -132,7 +134,7 @@ class CreditScoringEngine:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=90)
         
-        daily_net = self.db.query(
+        daily_net = self.read_db.query(
             func.date(models.Transaction.created_at).label('date'),
             func.sum(models.Transaction.amount).label('net')
         ).filter(
@@ -165,7 +167,7 @@ class CreditScoringEngine:
         start_date = end_date - timedelta(days=90)
         
         # Sum income and expenses
-        result = self.db.query(
+        result = self.read_db.query(
             func.sum(models.Transaction.amount).filter(models.Transaction.type == 'income').label('income'),
             func.sum(models.Transaction.amount).filter(models.Transaction.type == 'expense').label('expense')
         ).filter(
@@ -188,7 +190,7 @@ class CreditScoringEngine:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=90)
         
-        net_cashflow = self.db.query(
+        net_cashflow = self.read_db.query(
             func.sum(models.Transaction.amount).label('net')
         ).filter(
             models.Transaction.business_id == business_id,
@@ -199,7 +201,7 @@ class CreditScoringEngine:
             return 0
         
         # Calculate average monthly expense
-        monthly_expense = self.db.query(
+        monthly_expense = self.read_db.query(
             func.sum(models.Transaction.amount).label('expense')
         ).filter(
             models.Transaction.business_id == business_id,
@@ -231,7 +233,7 @@ class CreditScoringEngine:
     
     def _calculate_inventory_health(self, business_id: int) -> float:
         """Calculate inventory health score (0-100)"""
-        inventory_items = self.db.query(models.Inventory).filter(
+        inventory_items = self.read_db.query(models.Inventory).filter(
             models.Inventory.business_id == business_id
         ).all()
         
@@ -273,7 +275,7 @@ class CreditScoringEngine:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=365)
         
-        tx_count = self.db.query(models.Transaction).filter(
+        tx_count = self.read_db.query(models.Transaction).filter(
             models.Transaction.business_id == business_id,
             models.Transaction.created_at.between(start_date, end_date)
         ).count()
@@ -288,7 +290,7 @@ class CreditScoringEngine:
     
     def get_lender_risk_profile(self, business_id: int, credit_score: models.CreditScore):
         """Generate risk profile for lenders"""
-        business = self.db.query(models.Business).filter(
+        business = self.read_db.query(models.Business).filter(
             models.Business.id == business_id
         ).first()
         
@@ -296,7 +298,7 @@ class CreditScoringEngine:
             return None
         
         # Get user
-        user = self.db.query(models.User).filter(
+        user = self.read_db.query(models.User).filter(
             models.User.id == business.owner_id
         ).first()
         
@@ -313,7 +315,7 @@ class CreditScoringEngine:
         start_date = end_date - timedelta(days=365)
         
         # Avg monthly revenue
-        monthly_revenue = self.db.query(
+        monthly_revenue = self.read_db.query(
             func.avg(models.Transaction.amount).label('avg_revenue')
         ).filter(
             models.Transaction.business_id == business_id,
@@ -322,7 +324,7 @@ class CreditScoringEngine:
         ).first()[0] or 0
         
         # Revenue stability
-        monthly_revenues = self.db.query(
+        monthly_revenues = self.read_db.query(
             func.strftime('%Y-%m', models.Transaction.created_at).label('month'),
             func.sum(models.Transaction.amount).label('revenue')
         ).filter(
@@ -340,7 +342,7 @@ class CreditScoringEngine:
             revenue_stability = 1
         
         # Cash buffer in months
-        avg_monthly_expense = self.db.query(
+        avg_monthly_expense = self.read_db.query(
             func.avg(models.Transaction.amount).label('avg_expense')
         ).filter(
             models.Transaction.business_id == business_id,
@@ -348,7 +350,7 @@ class CreditScoringEngine:
             models.Transaction.created_at.between(start_date, end_date)
         ).first()[0] or 1
         
-        total_cash = self.db.query(
+        total_cash = self.read_db.query(
             func.sum(models.Transaction.amount).label('total_net')
         ).filter(
             models.Transaction.business_id == business_id,
@@ -358,7 +360,7 @@ class CreditScoringEngine:
         cash_buffer_months = total_cash / avg_monthly_expense if avg_monthly_expense > 0 else 0
         
         # Total inventory value
-        inventory_value = self.db.query(
+        inventory_value = self.read_db.query(
             func.sum(models.Inventory.quantity * models.Inventory.price_per_unit)
         ).filter(
             models.Inventory.business_id == business_id
@@ -368,7 +370,7 @@ class CreditScoringEngine:
         business_age_months = int((datetime.utcnow() - business.created_at).days / 30)
         
         # Transaction volume
-        tx_count_12m = self.db.query(models.Transaction).filter(
+        tx_count_12m = self.read_db.query(models.Transaction).filter(
             models.Transaction.business_id == business_id,
             models.Transaction.created_at.between(start_date, end_date)
         ).count()
@@ -1,8 +1,15 @@
 # app/database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request
+from app.db_config import engine_kwargs, configure_engine
+import hashlib
 import os
+import threading
+import time
 
 # Get database URL from environment variable (set in Render)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./smartpesa.db")
@@ -11,25 +18,149 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./smartpesa.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-# Create engine based on database type
+# Async drivers for each supported backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+def get_async_url(url: str) -> str:
+    """Map a sync database URL onto the matching async driver"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+# Async URL can be overridden, otherwise derived from DATABASE_URL
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or get_async_url(DATABASE_URL)
+
+# Optional read replica - GET requests and heavy reads go here when set
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+if DATABASE_REPLICA_URL and DATABASE_REPLICA_URL.startswith("postgres://"):
+    DATABASE_REPLICA_URL = DATABASE_REPLICA_URL.replace("postgres://", "postgresql://", 1)
+
+# After a client writes, its reads stay on the primary for this long (replica lag cover)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Create engine - pool, pragma and timeout settings come from app/db_config.py
+engine = configure_engine(create_engine(DATABASE_URL, **engine_kwargs(DATABASE_URL)))
 if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False}
-    )
     print("✅ Using SQLite (local development)")
 else:
-    engine = create_engine(DATABASE_URL)
     print("✅ Using PostgreSQL (production)")
 
+# Async engine - request concurrency is bounded by this pool, not the threadpool
+async_engine = configure_engine(
+    create_async_engine(ASYNC_DATABASE_URL, **engine_kwargs(ASYNC_DATABASE_URL))
+)
+
+# Replica engines fall back to the primary when no replica is configured
+if DATABASE_REPLICA_URL:
+    replica_engine = configure_engine(
+        create_engine(DATABASE_REPLICA_URL, **engine_kwargs(DATABASE_REPLICA_URL))
+    )
+    async_replica_url = os.getenv("ASYNC_DATABASE_REPLICA_URL") or get_async_url(DATABASE_REPLICA_URL)
+    async_replica_engine = configure_engine(
+        create_async_engine(async_replica_url, **engine_kwargs(async_replica_url))
+    )
+    print("✅ Read replica configured")
+else:
+    replica_engine = engine
+    async_replica_engine = async_engine
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+# expire_on_commit=False so committed objects can be serialized without a lazy reload
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+AsyncReplicaSessionLocal = async_sessionmaker(
+    async_replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
+# Clients that wrote recently: client key -> time until which reads stay on the primary
+_recent_writes = {}
+_recent_writes_lock = threading.Lock()
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def _client_key(request: Request):
+    """Identify the caller by bearer token (hashed) or, failing that, by client address"""
+    auth_header = request.headers.get("authorization")
+    if auth_header:
+        return hashlib.sha1(auth_header.encode()).hexdigest()
+    return request.client.host if request.client else "unknown"
+
+def mark_write(request: Request):
+    """Pin the caller's reads to the primary for READ_YOUR_WRITES_SECONDS"""
+    now = time.monotonic()
+    with _recent_writes_lock:
+        _recent_writes[_client_key(request)] = now + READ_YOUR_WRITES_SECONDS
+        # Sweep expired entries once the table grows
+        if len(_recent_writes) > 10000:
+            for key in [k for k, until in _recent_writes.items() if until < now]:
+                del _recent_writes[key]
+
+def recently_wrote(request: Request):
+    until = _recent_writes.get(_client_key(request))
+    return until is not None and until >= time.monotonic()
+
+def use_replica(request: Request = None):
+    """Reads go to the replica unless this is a write or the caller wrote recently"""
+    if request is None or replica_engine is engine:
+        return False
+    if request.method not in SAFE_METHODS:
+        return False
+    return not recently_wrote(request)
+
+def mark_unsafe(request: Request = None):
+    """Mark writes on entry - code after a dependency's yield runs once the response
+    has been sent, too late for the client's immediate follow-up read"""
+    if request is not None and request.method not in SAFE_METHODS:
+        mark_write(request)
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_flushed_write(session, flush_context):
+    """A get_primary_db session that writes (even on GET) pins its caller to the primary"""
+    request = session.info.get("request")
+    if request is not None:
+        mark_write(request)
+
+# Dependency to get DB session - replica for GET requests, primary for writes
+def get_db(request: Request = None):
+    mark_unsafe(request)
+    db = ReplicaSessionLocal() if use_replica(request) else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency for endpoints that may write even on GET
+def get_primary_db(request: Request = None):
+    db = SessionLocal(info={"request": request})
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency for heavy read-only work (forecast extraction, scoring reads, lender listings)
+# Uses the replica regardless of HTTP method, unless the caller wrote recently
+def get_read_db(request: Request = None):
+    pinned = request is not None and recently_wrote(request)
+    db = SessionLocal() if pinned else ReplicaSessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+# Dependency to get an async DB session (for async def routes)
+async def get_async_db(request: Request = None):
+    mark_unsafe(request)
+    session_factory = AsyncReplicaSessionLocal if use_replica(request) else AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
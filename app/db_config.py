@@ -0,0 +1,210 @@
+# app/db_config.py
+"""
+Database configuration layer - all engine tuning is driven by environment variables
+
+Pool:     DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+Timeouts: DB_STATEMENT_TIMEOUT_MS (0 disables) - sized for request queries;
+          maintenance jobs lift it per transaction with no_statement_timeout()
+SQLite:   SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE,
+          SQLITE_BUSY_TIMEOUT_MS, SQLITE_TEMP_STORE
+
+Run `python -m app.db_config` to print the effective settings.
+"""
+import os
+import time
+from contextlib import contextmanager
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+
+# Connection pool
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "true")
+
+# Statement timeout in milliseconds (0 = no timeout)
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# SQLite pragmas - WAL lets readers run alongside a writer
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB, i.e. 64 MiB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+
+def is_sqlite(url) -> bool:
+    return make_url(str(url)).get_backend_name() == "sqlite"
+
+
+def is_memory_sqlite(url) -> bool:
+    database = make_url(str(url)).database
+    return not database or database == ":memory:"
+
+
+def engine_kwargs(url) -> dict:
+    """Keyword arguments for create_engine / create_async_engine"""
+    parsed = make_url(str(url))
+    backend = parsed.get_backend_name()
+    driver = parsed.get_driver_name()
+    kwargs = {"pool_pre_ping": POOL_PRE_PING}
+
+    # Only a QueuePool takes sizing arguments - in-memory SQLite uses a static
+    # connection, and aiosqlite file databases use NullPool before SQLAlchemy 2.1
+    if issubclass(parsed.get_dialect().get_pool_class(parsed), QueuePool):
+        kwargs.update(
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+        )
+
+    connect_args = {}
+    if backend == "sqlite":
+        connect_args["check_same_thread"] = False
+        # Python-level wait on locked database (seconds)
+        connect_args["timeout"] = SQLITE_PRAGMAS["busy_timeout"] / 1000
+    elif STATEMENT_TIMEOUT_MS > 0:
+        if backend == "postgresql" and driver == "asyncpg":
+            connect_args["server_settings"] = {"statement_timeout": str(STATEMENT_TIMEOUT_MS)}
+        elif backend == "postgresql":
+            connect_args["options"] = f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"
+        elif backend == "mysql":
+            connect_args["init_command"] = f"SET SESSION max_execution_time={STATEMENT_TIMEOUT_MS}"
+
+    if connect_args:
+        kwargs["connect_args"] = connect_args
+    return kwargs
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: dict = None):
+    """Run PRAGMA statements on a fresh SQLite connection"""
+    pragmas = pragmas or SQLITE_PRAGMAS
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _install_sqlite_statement_timeout(sync_engine):
+    """Abort SQLite statements that run longer than STATEMENT_TIMEOUT_MS"""
+    timeout = STATEMENT_TIMEOUT_MS / 1000
+
+    @event.listens_for(sync_engine, "connect")
+    def set_progress_handler(dbapi_connection, connection_record):
+        # Only the stdlib driver exposes a synchronous progress handler
+        if not hasattr(dbapi_connection, "set_progress_handler"):
+            return
+        info = connection_record.info
+
+        def check_deadline():
+            deadline = info.get("statement_deadline")
+            return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+        dbapi_connection.set_progress_handler(check_deadline, 10000)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_deadline(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("statement_timeout_exempt"):
+            return
+        conn.info["statement_deadline"] = time.monotonic() + timeout
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def clear_deadline(conn, cursor, statement, parameters, context, executemany):
+        conn.info.pop("statement_deadline", None)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def clear_deadline_on_error(context):
+        # A failed statement never reaches after_cursor_execute - don't leave its
+        # deadline armed for whatever runs next on this pooled connection
+        if context.connection is not None:
+            context.connection.info.pop("statement_deadline", None)
+
+
+@contextmanager
+def no_statement_timeout(conn):
+    """Lift DB_STATEMENT_TIMEOUT_MS for a maintenance job's transaction on `conn`
+
+        with engine.begin() as conn, no_statement_timeout(conn):
+            ...
+    """
+    backend = conn.dialect.name
+    if backend == "postgresql":
+        # Reverts by itself when the transaction ends
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+    elif backend == "mysql":
+        conn.execute(text("SET SESSION max_execution_time = 0"))
+    conn.info["statement_timeout_exempt"] = True
+    try:
+        yield conn
+    finally:
+        conn.info.pop("statement_timeout_exempt", None)
+        if backend == "mysql" and STATEMENT_TIMEOUT_MS > 0:
+            conn.execute(text(f"SET SESSION max_execution_time = {STATEMENT_TIMEOUT_MS}"))
+
+
+def configure_engine(engine):
+    """Attach connect-time hooks (pragmas, timeouts) to a sync or async engine"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not is_sqlite(sync_engine.url):
+        return engine
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        pragmas = dict(SQLITE_PRAGMAS)
+        # WAL needs a file on disk
+        if is_memory_sqlite(sync_engine.url):
+            pragmas.pop("journal_mode")
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    if STATEMENT_TIMEOUT_MS > 0:
+        _install_sqlite_statement_timeout(sync_engine)
+
+    return engine
+
+
+def check_database(engine) -> dict:
+    """Startup self-check: connect once and report the effective settings"""
+    report = {
+        "backend": engine.url.get_backend_name(),
+        "driver": engine.url.get_driver_name(),
+        "database": engine.url.render_as_string(hide_password=True),
+        "pool": engine.pool.status(),
+        "pool_pre_ping": POOL_PRE_PING,
+        "statement_timeout_ms": STATEMENT_TIMEOUT_MS,
+    }
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        if report["backend"] == "sqlite":
+            report["pragmas"] = {
+                name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in SQLITE_PRAGMAS
+            }
+        elif report["backend"] == "postgresql":
+            report["statement_timeout"] = conn.exec_driver_sql("SHOW statement_timeout").scalar()
+        elif report["backend"] == "mysql":
+            report["statement_timeout"] = conn.exec_driver_sql(
+                "SELECT @@SESSION.max_execution_time"
+            ).scalar()
+
+    return report
+
+
+if __name__ == "__main__":
+    from app.database import engine
+
+    for key, value in check_database(engine).items():
+        print(f"{key}: {value}")
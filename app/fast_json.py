@@ -0,0 +1,72 @@
+# app/fast_json.py
+"""
+Fast path for large list responses (opt-in with FAST_JSON_LISTS=true)
+
+The regular path loads ORM objects, validates each through the response_model
+and JSON-encodes the result - for multi-thousand-row pages most of the time
+goes to serialization. The fast path selects only the schema's columns as
+plain tuples and encodes them directly with orjson, skipping per-row
+validation: the rows come straight from our own tables, so they already have
+the schema's shape. The JSON is the same as the regular path's.
+
+Without the `orjson` package the stdlib encoder is used (still without
+per-row validation).
+
+    python benchmarks/json_lists.py --rows 10000
+"""
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from fastapi import Response
+
+FAST_JSON_LISTS = os.getenv("FAST_JSON_LISTS", "false").lower() == "true"
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _default_utc_z(value):
+    if isinstance(value, datetime) and value.utcoffset() is not None and not value.utcoffset():
+        return value.isoformat()[:-6] + "Z"
+    return _default(value)
+
+
+def dumps(content, utc_z: bool = True) -> bytes:
+    """Encode like the regular path: utc_z=True matches a response_model (Pydantic
+    writes UTC as "Z"), utc_z=False matches a plain dict return (jsonable_encoder
+    keeps "+00:00")"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z if utc_z else 0)
+    return json.dumps(content, default=_default_utc_z if utc_z else _default, separators=(",", ":")).encode()
+
+
+def columns(schema, model):
+    """Model columns for every field of a response schema, in field order"""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def rows(result) -> list:
+    """Column tuples (a Result or a list of Rows) as dicts keyed by column name"""
+    result = list(result)
+    if not result:
+        return []
+    keys = result[0]._fields
+    return [dict(zip(keys, row)) for row in result]
+
+
+def response(content, utc_z: bool = True) -> Response:
+    """Pre-encoded JSON response - FastAPI's response_model is bypassed"""
+    return Response(content=dumps(content, utc_z), media_type="application/json")
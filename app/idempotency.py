@@ -0,0 +1,94 @@
+# app/idempotency.py
+"""
+Idempotency keys for transaction creation
+
+Clients send an Idempotency-Key header with POST /transactions/. The first
+request stores its response under (business_id, key) in the same database
+transaction as the insert; the unique index on that pair means concurrent
+retries can't both insert. Later retries get the stored response back - from
+the shared cache when possible - without ownership checks or writes.
+
+Keys are kept for IDEMPOTENCY_KEY_TTL_HOURS. An expired key is treated as
+unused (and its row deleted) when it comes back; the rest are deleted in small
+batches by the worker's housekeeping (purge_expired), off the request path.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, delete
+from app import models
+from app.cache import get_cache
+
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Rows deleted per statement when purging
+PURGE_BATCH_SIZE = 5000
+
+
+def fingerprint(payload: dict) -> str:
+    """Stable hash of a request body"""
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def expires_at() -> datetime:
+    return datetime.utcnow() + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """PostgreSQL returns aware timestamps, SQLite naive (UTC) ones"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _cache_key(business_id: int, key: str) -> str:
+    return f"idem:b{business_id}:{hashlib.sha1(key.encode()).hexdigest()}"
+
+
+def remember(business_id: int, key: str, record: dict, expires: datetime = None):
+    """Cache a stored response: {'user_id', 'fingerprint', 'status_code', 'response'}"""
+    ttl = IDEMPOTENCY_KEY_TTL_HOURS * 3600
+    if expires is not None:
+        ttl = max(1, int((expires - datetime.utcnow()).total_seconds()))
+    get_cache().set(_cache_key(business_id, key), record, ttl)
+
+
+async def lookup(db, business_id: int, key: str):
+    """Stored response for a key, or None if the key hasn't been used"""
+    record = get_cache().get(_cache_key(business_id, key))
+    if record is not None:
+        return record
+
+    row = (await db.execute(
+        select(models.IdempotencyKey).filter(
+            models.IdempotencyKey.business_id == business_id,
+            models.IdempotencyKey.key == key
+        )
+    )).scalars().first()
+    if row is None:
+        return None
+    expires = _naive_utc(row.expires_at)
+    if expires <= datetime.utcnow():
+        # Expired: the key is free again - drop the row so the unique index lets the new one in
+        await db.delete(row)
+        await db.flush()
+        return None
+    record = {'user_id': row.user_id, 'fingerprint': row.fingerprint,
+              'status_code': row.status_code, 'response': row.response}
+    remember(business_id, key, record, expires)
+    return record
+
+
+def purge_expired(db, batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Delete expired keys a batch at a time (keeps locks short); returns how many"""
+    total = 0
+    while True:
+        expired = select(models.IdempotencyKey.id).filter(
+            models.IdempotencyKey.expires_at <= datetime.utcnow()
+        ).limit(batch_size)
+        deleted = db.execute(
+            delete(models.IdempotencyKey).where(models.IdempotencyKey.id.in_(expired))
+        ).rowcount
+        db.commit()
+        total += deleted
+        if deleted < batch_size:
+            return total
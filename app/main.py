@@ -1,28 +1,50 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
+import logging
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 # Import routers
-from app.routes import users, businesses, transactions, forecast, inventory, suppliers, credit, password
+from app.routes import users, businesses, transactions, forecast, inventory, suppliers, credit, password, webhooks, sync, dashboard
 
 # Import middleware
 from app.middleware.logging import RequestLoggingMiddleware, AuditLogMiddleware
 from app.middleware.security import SecurityHeadersMiddleware
+from app.middleware.etag import ConditionalGetMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.rate_limit import enforce_rate_limit, RateLimitHeadersMiddleware
+from app.middleware.admission import admission_stats
+
+# Import database self-check
+from app.database import engine, SessionLocal
+from app.db_config import check_database
+
+from app.worker import start_background_worker, stop_background_worker
+from app.mpesa import start_background_consumer, stop_background_consumer
+from app.sync import backfill_if_empty
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="SmartPesa API",
     description="Intelligent Cash Flow Forecasting for SMEs",
-    version="2.0.0"
+    version="2.0.0",
+    # Token-bucket limits per user / IP - routes set their cost with @rate_limit
+    dependencies=[Depends(enforce_rate_limit)]
 )
 
 # Get CORS origins from environment
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
 
+# Compress responses - added first so it sits next to the routes and sees their own body messages
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RateLimitHeadersMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -30,12 +52,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Readable by the PWA's service worker for revalidation
+    expose_headers=["ETag", "Last-Modified", "X-Forecast-Source", "Idempotent-Replayed",
+                    "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After"],
 )
 
 # Add security middleware
 app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(RequestLoggingMiddleware)
 app.add_middleware(AuditLogMiddleware)
+app.add_middleware(ConditionalGetMiddleware)
 
 # Include routers
 app.include_router(users.router)
@@ -46,6 +72,58 @@ app.include_router(inventory.router)
 app.include_router(suppliers.router)
 app.include_router(credit.router)
 app.include_router(password.router)
+app.include_router(webhooks.router)
+app.include_router(sync.router)
+app.include_router(dashboard.router)
+
+# Report effective database settings on startup
+@app.on_event("startup")
+def database_self_check():
+    try:
+        report = check_database(engine)
+        logger.info(f"Database self-check passed: {report}")
+    except Exception as e:
+        logger.error(f"Database self-check failed: {e}")
+        raise
+
+# Seed the delta-sync change log with existing rows the first time it's used
+@app.on_event("startup")
+def seed_change_log():
+    db = SessionLocal()
+    try:
+        logged = backfill_if_empty(db)
+        if logged:
+            logger.info(f"Change log seeded with {logged} existing rows")
+    finally:
+        db.close()
+
+# Optionally run the off-peak precompute worker inside the API process
+@app.on_event("startup")
+def start_precompute_worker():
+    if os.getenv("WORKER_IN_PROCESS", "false").lower() == "true":
+        start_background_worker()
+
+@app.on_event("shutdown")
+def stop_precompute_worker():
+    stop_background_worker()
+
+# Optionally turn queued M-Pesa callbacks into transactions inside the API process - off by
+# default because every uvicorn worker would start one; run python -m app.mpesa consume instead
+@app.on_event("startup")
+def start_mpesa_consumer():
+    if os.getenv("MPESA_CONSUMER_IN_PROCESS", "false").lower() == "true":
+        start_background_consumer()
+
+@app.on_event("shutdown")
+def stop_mpesa_consumer():
+    stop_background_consumer()
+
+# Stop forecast worker processes with the server (only started if a forecast was served)
+@app.on_event("shutdown")
+def stop_forecast_pool():
+    forecast_service = sys.modules.get("app.ml.forecast_service")
+    if forecast_service is not None:
+        forecast_service.shutdown_forecast_pool()
 
 @app.get("/")
 def root():
@@ -81,7 +159,8 @@ def root():
                 "7day": "GET /forecast/{business_id}/7days",
                 "30day": "GET /forecast/{business_id}/30days",
                 "risk_alert": "GET /forecast/{business_id}/risk-alert",
-                "health": "GET /forecast/{business_id}/health"
+                "health": "GET /forecast/{business_id}/health",
+                "batch": "POST /forecast/batch"
             },
             "inventory": {
                 "create": "POST /inventory/",
@@ -111,6 +190,17 @@ def root():
                 "lender_profile": "GET /credit/lender/business/{business_id}",
                 "lender_businesses": "GET /credit/lender/businesses",
                 "calculate_all": "POST /credit/calculate-all"
+            },
+            "dashboard": {
+                "bootstrap": "GET /dashboard/{business_id}?widgets={names}&fields={widget.field,...}"
+            },
+            "sync": {
+                "changes": "GET /sync/{business_id}?transactions={cursor}&inventory={cursor}&suppliers={cursor}"
+            },
+            "webhooks": {
+                "mpesa_callback": "POST /webhooks/mpesa",
+                "register_mpesa_account": "POST /webhooks/mpesa/accounts",
+                "mpesa_accounts": "GET /webhooks/mpesa/accounts"
             }
         }
     }
@@ -123,3 +213,8 @@ def health_check():
         "version": "2.0.0",
         "environment": os.getenv("ENVIRONMENT", "development")
     }
+
+# In-flight requests and queue depth per CPU-heavy endpoint class (this worker)
+@app.get("/health/admission")
+def admission_health():
+    return admission_stats()
@@ -0,0 +1,174 @@
+"""
+Admission control for CPU-heavy endpoints
+
+Each endpoint class has a limit on requests in flight in this worker. Requests
+over the limit wait in a bounded queue for up to ADMISSION_MAX_WAIT_SECONDS;
+when the queue is full or the wait runs out they get a fast 503 with
+Retry-After instead of piling onto the threadpool, where every fit would slow
+down together and time out.
+
+    forecast - single forecasts and risk alerts (Prophet / model fits)
+    credit   - single credit scorings
+    bulk     - batch forecasts and scoring every business
+
+    @router.get(..., dependencies=[admission("bulk")])   # whole request
+
+    with admitted("forecast"):                            # just the fit
+        payload = compute()
+
+As a dependency the slot is taken before the route's own dependencies (no DB
+session is held while waiting) and released once the response has been sent,
+so a streamed batch holds its slot while it streams. Single forecasts and
+credit scorings use admitted() around the computation only, so 304s, stored
+scores, snapshot and cache hits never wait for or occupy a slot. Rate limiting still applies first: that budgets each
+client, this protects the server from all of them together.
+admission_stats() reports in-flight requests, queue depth and outcomes.
+"""
+import asyncio
+import math
+import os
+import time
+from contextlib import contextmanager
+from anyio import from_thread
+from fastapi import Depends, HTTPException, status
+from app.ml.config import FORECAST_POOL_WORKERS
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# How long a request may wait for a slot before it gets 503
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "5"))
+# class: (requests in flight, requests waiting) per worker - fits are CPU-bound,
+# so more in flight than cores only makes each one slower
+ADMISSION_LIMITS = {
+    "forecast": (
+        int(os.getenv("ADMISSION_FORECAST_LIMIT", str(FORECAST_POOL_WORKERS))),
+        int(os.getenv("ADMISSION_FORECAST_QUEUE", "32"))
+    ),
+    "credit": (
+        int(os.getenv("ADMISSION_CREDIT_LIMIT", str(FORECAST_POOL_WORKERS))),
+        int(os.getenv("ADMISSION_CREDIT_QUEUE", "32"))
+    ),
+    "bulk": (
+        int(os.getenv("ADMISSION_BULK_LIMIT", "1")),
+        int(os.getenv("ADMISSION_BULK_QUEUE", "4"))
+    ),
+}
+
+
+class AdmissionGate:
+    """Semaphore with a bounded, timed queue in front of it"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float = ADMISSION_MAX_WAIT_SECONDS):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._slots = asyncio.Semaphore(self.limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds = 0.0
+        self.completed = 0
+        self.busy_seconds = 0.0
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead has likely drained, from the average time a slot is held"""
+        average = self.busy_seconds / self.completed if self.completed else 1.0
+        return max(1, math.ceil(average * (self.waiting + 1) / self.limit))
+
+    def _busy(self):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Server busy: too many {self.name} requests in progress. Please retry later.",
+            headers={"Retry-After": str(self.retry_after())}
+        )
+
+    async def acquire(self):
+        """Take a slot, waiting up to max_wait behind at most max_queue others, or raise 503"""
+        if self._slots.locked():
+            if self.waiting >= self.max_queue or self.max_wait <= 0:
+                self.rejected += 1
+                raise self._busy()
+            self.waiting += 1
+            self.queued += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise self._busy()
+            finally:
+                self.waiting -= 1
+                self.wait_seconds += time.monotonic() - started
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self, held_seconds: float):
+        self.in_flight -= 1
+        self.completed += 1
+        self.busy_seconds += held_seconds
+        self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'queue_depth': self.waiting,
+            'queue_limit': self.max_queue,
+            'peak_queue_depth': self.peak_waiting,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'rejected_queue_full': self.rejected,
+            'rejected_wait_timeout': self.timed_out,
+            'avg_wait_ms': round(self.wait_seconds / self.queued * 1000, 1) if self.queued else 0.0,
+            'avg_held_ms': round(self.busy_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+        }
+
+
+gates = {name: AdmissionGate(name, limit, max_queue) for name, (limit, max_queue) in ADMISSION_LIMITS.items()}
+
+
+def admission(name: str):
+    """Route dependency holding a slot of the named gate for the whole request"""
+    gate = gates[name]
+
+    async def admit():
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        await gate.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            gate.release(time.monotonic() - started)
+
+    return Depends(admit)
+
+
+@contextmanager
+def admitted(name: str):
+    """Hold a slot of the named gate around a block of a sync (threadpool) handler"""
+    gate = gates[name]
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    # The gate lives on the event loop - wait for it there, not in this worker thread
+    from_thread.run(gate.acquire)
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        from_thread.run_sync(gate.release, time.monotonic() - started)
+
+
+def admission_stats() -> dict:
+    """Per-class in-flight requests, queue depth and outcomes for this worker"""
+    return {'enabled': ADMISSION_ENABLED, 'max_wait_seconds': ADMISSION_MAX_WAIT_SECONDS,
+            'classes': {name: gate.stats() for name, gate in gates.items()}}
@@ -0,0 +1,42 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    bare = etag[2:] if etag.startswith("W/") else etag
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return bare in tags or f"W/{bare}" in tags
+
+class ConditionalGetMiddleware(BaseHTTPMiddleware):
+    """ETag every JSON GET response that doesn't set its own, and answer 304 when it matches
+
+    The tag is a hash of the body, so this saves bandwidth (the service worker
+    revalidates cached dashboard data with If-None-Match), not server work.
+    Endpoints with cheaper validators (forecasts, analytics) set their ETag themselves.
+    """
+    
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        if (request.method != "GET" or response.status_code != 200
+                or "etag" in response.headers
+                or not response.headers.get("content-type", "").startswith("application/json")):
+            return response
+        
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = f'W/"{hashlib.sha1(body).hexdigest()[:32]}"'
+        headers = dict(response.headers)
+        headers["etag"] = etag
+        headers.setdefault("cache-control", "private, no-cache")
+        if "authorization" not in headers.get("vary", "").lower():
+            headers["vary"] = ", ".join(filter(None, [headers.get("vary"), "Authorization"]))
+        
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            headers.pop("content-length", None)
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, status_code=200, headers=headers, media_type=response.media_type)
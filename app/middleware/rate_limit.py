@@ -1,29 +1,270 @@
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from fastapi import Request
-from fastapi.responses import JSONResponse
-
-# Initialize limiter
-limiter = Limiter(key_func=get_remote_address)
-
-def add_rate_limiting(app):
-    """Add rate limiting to the application"""
-    from slowapi import _rate_limit_exceeded_handler
-    from slowapi.errors import RateLimitExceeded
-    
-    app.state.limiter = limiter
-    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-    
-    print("✅ Rate limiting enabled")
-    
-    return limiter
-
-# Custom rate limit exceeded handler
-async def rate_limit_handler(request: Request, exc):
-    return JSONResponse(
-        status_code=429,
-        content={
-            "error": "Rate limit exceeded",
-            "message": "Too many requests. Please try again later.",
+"""
+Token-bucket rate limiting, selected by RATE_LIMIT_BACKEND
+
+    memory - buckets in this process (default; per uvicorn worker)
+    redis  - buckets shared by all workers at RATE_LIMIT_URL (needs the `redis` package);
+             checked with redis.asyncio, so a slow or unreachable server never
+             blocks the event loop - only the request waiting on its own check
+
+Requests with a valid bearer token draw from their user's bucket, anonymous
+ones from their IP's. Every request costs 1 token unless its route says
+otherwise with @rate_limit(cost=...) - a forecast fit costs 50, so a client
+can't saturate the CPU with a burst of them. Buckets refill continuously at
+the configured rate up to their capacity (the burst size).
+
+enforce_rate_limit runs as an app-wide dependency, after routing, so it knows
+the route's cost; it answers 429 with Retry-After when the bucket is short.
+RateLimitHeadersMiddleware adds RateLimit-Limit / -Remaining / -Reset to the
+responses it let through.
+"""
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from fastapi import HTTPException, Request, status
+from jose import JWTError, jwt
+from starlette.datastructures import MutableHeaders
+from app.auth import SECRET_KEY, ALGORITHM
+from app.cache import CACHE_URL, CACHE_PREFIX
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", CACHE_URL)
+# Burst size and refill rate (tokens per second) per signed-in user...
+RATE_LIMIT_USER_CAPACITY = float(os.getenv("RATE_LIMIT_USER_CAPACITY", "600"))
+RATE_LIMIT_USER_REFILL = float(os.getenv("RATE_LIMIT_USER_REFILL", "10"))
+# ...and per client IP for requests without a valid token
+RATE_LIMIT_IP_CAPACITY = float(os.getenv("RATE_LIMIT_IP_CAPACITY", "300"))
+RATE_LIMIT_IP_REFILL = float(os.getenv("RATE_LIMIT_IP_REFILL", "5"))
+# Behind a reverse proxy the client IP is the first X-Forwarded-For entry
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+# memory backend only
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
+# redis backend only - log a failing limiter at most once per interval
+RATE_LIMIT_ERROR_LOG_INTERVAL = float(os.getenv("RATE_LIMIT_ERROR_LOG_INTERVAL", "60"))
+
+DEFAULT_COST = 1
+
+logger = logging.getLogger(__name__)
+
+
+def rate_limit(cost: float):
+    """Tokens a request to this route takes (0 exempts it)
+
+    @router.get(...)
+    @rate_limit(cost=50)
+    def endpoint(...): ...
+    """
+    def decorate(endpoint):
+        endpoint.__rate_limit_cost__ = cost
+        return endpoint
+    return decorate
+
+
+class MemoryBuckets:
+    """Buckets as [tokens, last refill] in a dict
+
+    No lock: enforce_rate_limit is async, so every check runs on the event loop
+    thread and nothing can interleave within one - a lock would double the cost.
+    """
+
+    def __init__(self, max_buckets: int = RATE_LIMIT_MAX_BUCKETS):
+        self._buckets = {}
+        self.max_buckets = max_buckets
+
+    def consume(self, key: str, cost: float, capacity: float, refill: float):
+        """(allowed, tokens left) - tokens are only taken when there are enough"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._sweep(now, capacity, refill)
+            bucket = self._buckets[key] = [capacity, now]
+        tokens = bucket[0] + (now - bucket[1]) * refill
+        if tokens > capacity:
+            tokens = capacity
+        bucket[1] = now
+        if tokens >= cost:
+            bucket[0] = tokens = tokens - cost
+            return True, tokens
+        bucket[0] = tokens
+        return False, tokens
+
+    def _sweep(self, now, capacity, refill):
+        """Forget buckets that have refilled - a new one starts full anyway"""
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * refill < capacity
         }
-    )
+        if len(self._buckets) >= self.max_buckets:
+            # Under a flood of distinct clients: start over rather than grow without bound
+            self._buckets.clear()
+
+
+class RedisBuckets:
+    """Buckets as Redis hashes, updated atomically by a Lua script
+
+    consume() is a coroutine - the check runs on the event loop without blocking it.
+    """
+
+    CONSUME_SCRIPT = """
+local capacity, refill, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 't', 's')
+local tokens = tonumber(bucket[1]) or capacity
+local stamp = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - stamp) * refill)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 's', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / refill * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url: str = RATE_LIMIT_URL, prefix: str = CACHE_PREFIX + "rl:"):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package (pip install redis)")
+        self.errors = (redis.RedisError, OSError, asyncio.TimeoutError)
+        self.client = redis.asyncio.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._consume = self.client.register_script(self.CONSUME_SCRIPT)
+        self.prefix = prefix
+        self.url = url
+        self.failures = 0
+        self._failures_logged = 0
+        self._last_error_log = float('-inf')
+
+    async def consume(self, key: str, cost: float, capacity: float, refill: float):
+        try:
+            allowed, tokens = await self._consume(keys=[self.prefix + key], args=[capacity, refill, time.time(), cost])
+        except self.errors as e:
+            # Limiter outages let traffic through rather than failing every request
+            self._log_failure(e)
+            return True, capacity
+        return bool(allowed), float(tokens)
+
+    def _log_failure(self, error):
+        """One warning per RATE_LIMIT_ERROR_LOG_INTERVAL during an outage, not one per request"""
+        self.failures += 1
+        now = time.monotonic()
+        if now - self._last_error_log < RATE_LIMIT_ERROR_LOG_INTERVAL:
+            return
+        logger.warning("Rate limit check failed (%d failures since last report), letting traffic through: %s",
+                       self.failures - self._failures_logged, error)
+        self._failures_logged = self.failures
+        self._last_error_log = now
+
+
+_buckets = None
+_buckets_guard = threading.Lock()
+
+def get_buckets():
+    """Process-wide bucket store for the configured backend"""
+    global _buckets
+    with _buckets_guard:
+        if _buckets is None:
+            if RATE_LIMIT_BACKEND == "redis":
+                _buckets = RedisBuckets()
+                print(f"✅ Rate limiting with Redis at {_buckets.url}")
+            elif RATE_LIMIT_BACKEND == "memory":
+                _buckets = MemoryBuckets()
+            else:
+                raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND {RATE_LIMIT_BACKEND!r} (memory or redis)")
+        return _buckets
+
+
+# Verified token -> subject, so a client's requests don't each pay for a signature check
+_token_subjects = {}
+_TOKEN_CACHE_SIZE = 10000
+
+def token_subject(authorization: str):
+    """User the bearer token was issued to, or None if there's no valid token"""
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    token = authorization[7:]
+    subject = _token_subjects.get(token)
+    if subject is None:
+        try:
+            subject = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+        except JWTError:
+            return None
+        if subject is None:
+            return None
+        if len(_token_subjects) >= _TOKEN_CACHE_SIZE:
+            _token_subjects.clear()
+        _token_subjects[token] = subject
+    return subject
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def enforce_rate_limit(request: Request):
+    """App-wide dependency: take the route's cost from the caller's bucket or answer 429"""
+    if not RATE_LIMIT_ENABLED:
+        return
+    cost = getattr(request.scope.get("endpoint"), "__rate_limit_cost__", DEFAULT_COST)
+    if cost <= 0:
+        return
+
+    subject = token_subject(request.headers.get("authorization"))
+    if subject is not None:
+        key, capacity, refill = f"u:{subject}", RATE_LIMIT_USER_CAPACITY, RATE_LIMIT_USER_REFILL
+    else:
+        key, capacity, refill = f"ip:{client_ip(request)}", RATE_LIMIT_IP_CAPACITY, RATE_LIMIT_IP_REFILL
+
+    buckets = get_buckets()
+    if isinstance(buckets, RedisBuckets):
+        allowed, tokens = await buckets.consume(key, cost, capacity, refill)
+    else:
+        # Memory check is a dict update - no coroutine overhead on the common path
+        allowed, tokens = buckets.consume(key, cost, capacity, refill)
+    headers = {
+        "RateLimit-Limit": str(int(capacity)),
+        "RateLimit-Remaining": str(int(tokens)),
+        # Seconds until the bucket is full again
+        "RateLimit-Reset": str(math.ceil((capacity - tokens) / refill)),
+        "RateLimit-Policy": f"{int(capacity)};w={math.ceil(capacity / refill)}",
+    }
+    if not allowed:
+        headers["Retry-After"] = str(math.ceil((cost - tokens) / refill))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded. Please try again later.",
+            headers=headers
+        )
+    request.state.rate_limit = headers
+
+
+class RateLimitHeadersMiddleware:
+    """Copy the headers enforce_rate_limit computed onto the response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                limits = scope.get("state", {}).get("rate_limit")
+                if limits:
+                    headers = MutableHeaders(raw=message["headers"])
+                    for name, value in limits.items():
+                        headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
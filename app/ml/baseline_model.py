@@ -2,23 +2,43 @@ import pandas as pd
 import numpy as np
 from prophet import Prophet
 from sklearn.metrics import mean_absolute_error, mean_squared_error
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
 class BaselineModel:
-    def __init__(self):
+    def __init__(self, registry=None):
         self.model = None
         self.metrics = {}
+        # Optional ModelRegistry - reuses / warm-starts fits per business
+        self.registry = registry
+        self.fit_info = None
+        self.history_ds = None
     
-    def train(self, df: pd.DataFrame, date_col='date', target_col='net'):
+    def train(self, df: pd.DataFrame, date_col='date', target_col='net', business_id=None):
         """Train Prophet model"""
         # Prepare data for Prophet
         prophet_df = df[[date_col, target_col]].rename(
             columns={date_col: 'ds', target_col: 'y'}
         )
+        self.history_ds = prophet_df['ds'].reset_index(drop=True)
         
-        # Create and train model
-        self.model = Prophet(
+        if self.registry is not None and business_id is not None:
+            self.model, self.fit_info = self.registry.fit(
+                (business_id, 'baseline'), prophet_df, self.build_model
+            )
+            return self.model
+        
+        started = time.perf_counter()
+        self.model = self.build_model()
+        self.model.fit(prophet_df)
+        self.fit_info = {'mode': 'cold', 'duration_s': round(time.perf_counter() - started, 3)}
+        
+        return self.model
+    
+    def build_model(self):
+        """Configured, unfitted Prophet model"""
+        model = Prophet(
             yearly_seasonality=True,
             weekly_seasonality=True,
             daily_seasonality=False,
@@ -27,18 +47,20 @@ class BaselineModel:
         )
         
         # Add custom seasonalities
-        self.model.add_country_holidays(country_name='KE')  # Kenya holidays
-        
-        self.model.fit(prophet_df)
+        model.add_country_holidays(country_name='KE')  # Kenya holidays
         
-        return self.model
+        return model
     
     def predict(self, periods: int = 30, freq: str = 'D'):
         """Generate predictions"""
         if not self.model:
             raise ValueError("Model not trained yet")
         
-        future = self.model.make_future_dataframe(periods=periods, freq=freq)
+        # Future dates follow the training data - a reused registry model may have been fitted on older history
+        future_dates = pd.date_range(start=self.history_ds.iloc[-1], periods=periods + 1, freq=freq)[1:]
+        future = pd.DataFrame({
+            'ds': pd.concat([self.history_ds, pd.Series(future_dates)], ignore_index=True)
+        })
         forecast = self.model.predict(future)
         
         # Return with datetime objects (not strings)
@@ -0,0 +1,26 @@
+# app/ml/config.py
+"""
+Forecast settings shared by the API routes and the ML code
+
+Kept free of pandas / Prophet / scikit-learn imports so the API can validate
+requests and size batches without loading the ML stack; app.ml.forecast_service
+is imported on first use.
+"""
+import os
+
+# Forecast modes: 'fast' (NumPy smoothing, milliseconds), 'hybrid' (Prophet + RF), 'auto' picks one
+FORECAST_MODES = ("auto", "fast", "hybrid")
+# auto uses the fast model at or below this horizon (dashboard widgets)...
+FAST_MAX_DAYS_FORWARD = int(os.getenv("FORECAST_FAST_MAX_DAYS_FORWARD", "7"))
+# ...when history is shorter than this...
+FAST_SHORT_HISTORY_DAYS = int(os.getenv("FORECAST_FAST_SHORT_HISTORY_DAYS", "90"))
+# ...or when the caller's latency budget is below what a Prophet fit needs
+FAST_LATENCY_BUDGET_MS = int(os.getenv("FORECAST_FAST_LATENCY_BUDGET_MS", "3000"))
+FAST_MIN_DAYS = 14
+HYBRID_MIN_DAYS = 30
+
+# Shared process pool for batch forecasting - model fitting is CPU-bound
+FORECAST_POOL_WORKERS = int(os.getenv("FORECAST_POOL_WORKERS", str(os.cpu_count() or 2)))
+# Per-request cap on forecasts in flight (a request may ask for fewer)
+FORECAST_BATCH_CONCURRENCY = int(os.getenv("FORECAST_BATCH_CONCURRENCY", str(FORECAST_POOL_WORKERS)))
+FORECAST_BATCH_MAX_SIZE = int(os.getenv("FORECAST_BATCH_MAX_SIZE", "200"))
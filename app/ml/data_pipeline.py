@@ -6,6 +6,11 @@ from app import models
 import re
 
 class DataPipeline:
+    LAGS = [1, 2, 3, 7, 14, 30]
+    WINDOWS = [7, 14, 30]
+    # Rows a lag/rolling feature can look back over
+    MAX_LOOKBACK = max(LAGS + WINDOWS)
+    
     def __init__(self, db: Session):
         self.db = db
     
@@ -13,7 +18,7 @@ class DataPipeline:
         """Extract date from transaction description"""
         # Look for YYYY-MM-DD pattern in description
         date_pattern = r'\d{4}-\d{2}-\d{2}'
-        match = re.search(date_pattern, description)
+        match = re.search(date_pattern, description or '')
         if match:
             return datetime.strptime(match.group(), '%Y-%m-%d').date()
         return None
@@ -77,13 +82,72 @@ class DataPipeline:
         
         return daily.sort_values('date')
     
+    def fetch_transactions_many(self, business_ids, days: int = 365):
+        """Fetch transactions for several businesses in one query"""
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        
+        return self.db.query(
+            models.Transaction.business_id,
+            models.Transaction.amount,
+            models.Transaction.type,
+            models.Transaction.description,
+            models.Transaction.created_at
+        ).filter(
+            models.Transaction.business_id.in_(business_ids),
+            models.Transaction.created_at >= cutoff_date
+        ).order_by(models.Transaction.business_id, models.Transaction.created_at).all()
+    
+    def prepare_daily_data_many(self, business_ids, days: int = 365):
+        """Daily aggregated data per business (same shape as prepare_daily_data) from one grouped query"""
+        result = {business_id: pd.DataFrame() for business_id in business_ids}
+        rows = self.fetch_transactions_many(business_ids, days)
+        
+        if not rows:
+            return result
+        
+        df = pd.DataFrame({
+            'business_id': [t.business_id for t in rows],
+            'date': [self.extract_date_from_description(t.description) or t.created_at.date() for t in rows],
+            'amount': [t.amount for t in rows],
+            'type': [t.type for t in rows]
+        })
+        
+        # Pivot once for every business, then split
+        daily = df.pivot_table(
+            index=['business_id', 'date'],
+            columns='type',
+            values='amount',
+            aggfunc='sum',
+            fill_value=0
+        ).reset_index()
+        
+        if 'income' not in daily.columns:
+            daily['income'] = 0
+        if 'expense' not in daily.columns:
+            daily['expense'] = 0
+        
+        daily['net'] = daily['income'] - daily['expense']
+        daily['date'] = pd.to_datetime(daily['date'])
+        
+        for business_id, group in daily.groupby('business_id'):
+            result[business_id] = group.drop(columns='business_id').sort_values('date').reset_index(drop=True)
+        
+        return result
+    
     def engineer_features(self, df: pd.DataFrame):
         """Add feature engineering for ML models"""
         if df.empty:
             return df
         
         df = df.copy()
+        self.add_calendar_features(df)
+        self.add_window_features(df)
+        self.add_group_features(df)
         
+        return df.dropna()
+    
+    def add_calendar_features(self, df: pd.DataFrame):
+        """Features that depend only on the row's own date"""
         # Time-based features
         df['day_of_week'] = df['date'].dt.dayofweek
         df['month'] = df['date'].dt.month
@@ -91,28 +155,6 @@ class DataPipeline:
         df['day_of_month'] = df['date'].dt.day
         df['week_of_year'] = df['date'].dt.isocalendar().week.astype(int)
         
-        # Lag features (previous days)
-        for lag in [1, 2, 3, 7, 14, 30]:
-            df[f'net_lag_{lag}'] = df['net'].shift(lag)
-        
-        # Rolling statistics
-        for window in [7, 14, 30]:
-            df[f'net_rolling_mean_{window}'] = df['net'].rolling(window=window).mean()
-            df[f'net_rolling_std_{window}'] = df['net'].rolling(window=window).std()
-            df[f'income_rolling_mean_{window}'] = df['income'].rolling(window=window).mean()
-            df[f'expense_rolling_mean_{window}'] = df['expense'].rolling(window=window).mean()
-        
-        # Revenue volatility (7-day standard deviation / mean)
-        df['volatility_7d'] = df['net'].rolling(7).std() / (df['net'].rolling(7).mean().abs() + 1)
-        
-        # Day of week averages
-        dow_avg = df.groupby('day_of_week')['net'].transform('mean')
-        df['dow_avg_deviation'] = df['net'] - dow_avg
-        
-        # Month averages
-        month_avg = df.groupby('month')['net'].transform('mean')
-        df['month_avg_deviation'] = df['net'] - month_avg
-        
         # Weekend indicator
         df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
         
@@ -122,5 +164,34 @@ class DataPipeline:
         
         # Holiday indicator (simplified - you can expand this)
         df['is_holiday'] = 0
+        return df
+    
+    def add_window_features(self, df: pd.DataFrame):
+        """Lag and rolling features - each row looks back at most MAX_LOOKBACK rows"""
+        # Lag features (previous days)
+        for lag in self.LAGS:
+            df[f'net_lag_{lag}'] = df['net'].shift(lag)
         
-        return df.dropna()
+        # Rolling statistics over the days before this one - at prediction time
+        # (HybridForecaster.predict_recursive) the day's own value isn't known yet
+        previous = df[['net', 'income', 'expense']].shift(1)
+        for window in self.WINDOWS:
+            df[f'net_rolling_mean_{window}'] = previous['net'].rolling(window=window).mean()
+            df[f'net_rolling_std_{window}'] = previous['net'].rolling(window=window).std()
+            df[f'income_rolling_mean_{window}'] = previous['income'].rolling(window=window).mean()
+            df[f'expense_rolling_mean_{window}'] = previous['expense'].rolling(window=window).mean()
+        
+        # Revenue volatility (7-day standard deviation / mean, same previous days)
+        df['volatility_7d'] = previous['net'].rolling(7).std() / (previous['net'].rolling(7).mean().abs() + 1)
+        return df
+    
+    def add_group_features(self, df: pd.DataFrame):
+        """Deviation from day-of-week / month averages over the whole frame"""
+        # Day of week averages
+        dow_avg = df.groupby('day_of_week')['net'].transform('mean')
+        df['dow_avg_deviation'] = df['net'] - dow_avg
+        
+        # Month averages
+        month_avg = df.groupby('month')['net'].transform('mean')
+        df['month_avg_deviation'] = df['net'] - month_avg
+        return df
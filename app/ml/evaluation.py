@@ -0,0 +1,362 @@
+"""
+Rolling-origin cross-validation for every forecaster in app/ml
+
+For each business, the daily series is cut at `folds` origins spaced `step` days
+apart, ending `horizon` days before the last observation. Each forecaster is
+trained on the history up to an origin and scored on the next `horizon` days
+(MAE / RMSE / MAPE, plus fit and predict time). Folds and models are independent
+and run in parallel through joblib.
+
+Models are always fitted cold - the model registry is bypassed so a fold never
+sees a model trained on its own test days.
+
+Each run is saved to EVALUATION_DIR and compared with the previous run that used
+the same settings, so accuracy or speed regressions show up between commits:
+
+    python -m app.ml.evaluation run --business-id 1 --horizon 7 --folds 5
+    python -m app.ml.evaluation run --all --models fast,hybrid --jobs 8
+    python -m app.ml.evaluation run --snapshot daily.parquet --fail-on-regression 10
+    python -m app.ml.evaluation export daily.parquet --all
+    python -m app.ml.evaluation history
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from joblib import Parallel, delayed
+from app.ml.data_pipeline import DataPipeline
+from app.ml.baseline_model import BaselineModel
+from app.ml.hybrid_model import HybridModel
+from app.ml.fast_model import FastModel
+from app.ml.forecast_service import HYBRID_FEATURES, HYBRID_MIN_DAYS, FAST_MIN_DAYS, future_frame
+
+EVALUATION_DIR = os.getenv(
+    "EVALUATION_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".evaluation")
+)
+
+SNAPSHOT_COLUMNS = ['business_id', 'date', 'income', 'expense', 'net']
+
+
+# ----------------------------------------------------------------------
+# Forecasters - each trains on a daily frame and returns a callable producing
+# (dates, predictions), so fitting and predicting are timed separately
+
+def fit_fast(train: pd.DataFrame, horizon: int):
+    model = FastModel()
+    model.train(train)
+    return lambda: model.forecast(horizon)[:2]
+
+def fit_baseline(train: pd.DataFrame, horizon: int):
+    model = BaselineModel()
+    model.train(train)
+
+    def predict():
+        forecast = model.predict(periods=horizon).tail(horizon)
+        return pd.DatetimeIndex(forecast['ds']), forecast['yhat'].values
+    return predict
+
+def fit_hybrid(train: pd.DataFrame, horizon: int):
+    data = DataPipeline(None).engineer_features(train)
+    features = [col for col in HYBRID_FEATURES if col in data.columns]
+    model = HybridModel()
+    model.train(data, features)
+
+    def predict():
+        future_df = future_frame(data['date'].max(), horizon)
+        history = data['net'].tail(DataPipeline.MAX_LOOKBACK).values
+        forecast = model.predict(future_df, features, history=history)
+        return pd.DatetimeIndex(forecast['dates']), np.array(forecast['hybrid_prediction'])
+    return predict
+
+# name -> (fit function, minimum training days)
+FORECASTERS = {
+    'fast': (fit_fast, FAST_MIN_DAYS),
+    'baseline': (fit_baseline, HYBRID_MIN_DAYS),
+    # The hybrid drops the first MAX_LOOKBACK rows while engineering features
+    'hybrid': (fit_hybrid, HYBRID_MIN_DAYS + DataPipeline.MAX_LOOKBACK),
+}
+
+
+# ----------------------------------------------------------------------
+# Cross-validation
+
+def rolling_origins(daily: pd.DataFrame, horizon: int, folds: int, step: int):
+    """Origin dates, oldest first - training uses rows on or before the origin"""
+    last = daily['date'].max()
+    origins = [last - pd.Timedelta(days=horizon + step * k) for k in range(folds)]
+    return sorted(origin for origin in origins if origin > daily['date'].min())
+
+def score(y_true: np.ndarray, y_pred: np.ndarray):
+    """Same error definitions as the models' own metrics"""
+    return {
+        'mae': float(np.mean(np.abs(y_true - y_pred))),
+        'rmse': float(np.sqrt(np.mean((y_true - y_pred) ** 2))),
+        'mape': float(np.mean(np.abs((y_true - y_pred) / (y_true + 1e-10))) * 100)
+    }
+
+def evaluate_fold(business_id: int, model_name: str, daily: pd.DataFrame, origin, horizon: int):
+    """Train one forecaster up to `origin` and score it on the following horizon days"""
+    # Prophet / cmdstanpy log every fit (and warn about short history) - keep worker output readable
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+    logging.getLogger('prophet').setLevel(logging.ERROR)
+
+    fit, min_days = FORECASTERS[model_name]
+    train = daily[daily['date'] <= origin].reset_index(drop=True)
+    test = daily[(daily['date'] > origin) & (daily['date'] <= origin + pd.Timedelta(days=horizon))]
+    row = {
+        'business_id': business_id,
+        'model': model_name,
+        'origin': origin.strftime('%Y-%m-%d'),
+        'train_days': len(train),
+        'test_days': len(test)
+    }
+    if len(train) < min_days or test.empty:
+        return {**row, 'skipped': f'needs {min_days} training days'}
+
+    try:
+        started = time.perf_counter()
+        predict = fit(train, horizon)
+        fitted = time.perf_counter()
+        dates, prediction = predict()
+        predicted_at = time.perf_counter()
+    except Exception as e:
+        return {**row, 'error': str(e)}
+
+    # Score on the days that actually have data
+    predicted = pd.Series(prediction, index=pd.DatetimeIndex(dates).normalize())
+    y_pred = predicted.reindex(test['date'].values).values
+    mask = ~np.isnan(y_pred)
+    return {
+        **row,
+        **score(test['net'].values[mask], y_pred[mask]),
+        'fit_seconds': round(fitted - started, 4),
+        'predict_seconds': round(predicted_at - fitted, 4)
+    }
+
+def cross_validate(series: dict, models, horizon: int = 7, folds: int = 5, step: int = None, jobs: int = -1):
+    """Rows of fold results for every (business, model, fold), computed in parallel"""
+    step = step or horizon
+    tasks = [
+        delayed(evaluate_fold)(business_id, model_name, daily, origin, horizon)
+        for business_id, daily in series.items() if not daily.empty
+        for origin in rolling_origins(daily, horizon, folds, step)
+        for model_name in models
+    ]
+    return Parallel(n_jobs=jobs, backend='loky')(tasks)
+
+def summarize(rows):
+    """Per-model mean of each metric over the folds that ran"""
+    summary = {}
+    df = pd.DataFrame([r for r in rows if 'mae' in r])
+    if df.empty:
+        return summary
+    for model_name, group in df.groupby('model'):
+        summary[model_name] = {
+            'folds': int(len(group)),
+            'mae': float(group['mae'].mean()),
+            'rmse': float(group['rmse'].mean()),
+            'mape': float(group['mape'].mean()),
+            'fit_seconds': float(group['fit_seconds'].mean()),
+            'predict_seconds': float(group['predict_seconds'].mean())
+        }
+    return summary
+
+
+# ----------------------------------------------------------------------
+# Data sources
+
+def load_series_from_db(business_ids=None, days: int = 365):
+    """Daily frames per business straight from the database"""
+    from app.database import SessionLocal
+    from app import models
+
+    db = SessionLocal()
+    try:
+        if not business_ids:
+            business_ids = [row.id for row in db.query(models.Business.id).all()]
+        return DataPipeline(db).prepare_daily_data_many(business_ids, days)
+    finally:
+        db.close()
+
+def load_series_from_snapshot(path: str, business_ids=None):
+    """Daily frames per business from a Parquet (or CSV) snapshot written by `export`"""
+    # read_parquet needs pyarrow or fastparquet installed
+    df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+    df['date'] = pd.to_datetime(df['date'])
+    if business_ids:
+        df = df[df['business_id'].isin(business_ids)]
+    return {
+        int(business_id): group[SNAPSHOT_COLUMNS[1:]].sort_values('date').reset_index(drop=True)
+        for business_id, group in df.groupby('business_id')
+    }
+
+def export_snapshot(series: dict, path: str):
+    frames = [daily.assign(business_id=business_id) for business_id, daily in series.items() if not daily.empty]
+    df = pd.concat(frames, ignore_index=True)[SNAPSHOT_COLUMNS]
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return len(df)
+
+
+# ----------------------------------------------------------------------
+# Result tracking
+
+def save_run(run: dict, store_dir: str = EVALUATION_DIR):
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, f"run_{run['started_at'].replace(':', '').replace('-', '')}.json")
+    with open(path, 'w') as f:
+        json.dump(run, f, indent=2)
+    return path
+
+def load_runs(store_dir: str = EVALUATION_DIR):
+    """Saved runs, oldest first"""
+    if not os.path.isdir(store_dir):
+        return []
+    runs = []
+    for name in sorted(os.listdir(store_dir)):
+        if name.startswith('run_') and name.endswith('.json'):
+            with open(os.path.join(store_dir, name)) as f:
+                runs.append(json.load(f))
+    return runs
+
+def previous_run(config: dict, store_dir: str = EVALUATION_DIR):
+    """Most recent saved run with the same settings"""
+    matching = [run for run in load_runs(store_dir) if run['config'] == config]
+    return matching[-1] if matching else None
+
+def compare(summary: dict, baseline: dict):
+    """Percent change in MAE and fit time per model against an earlier summary"""
+    changes = {}
+    for model_name, current in summary.items():
+        before = baseline.get(model_name)
+        if not before:
+            continue
+        changes[model_name] = {
+            'mae_change_pct': round((current['mae'] - before['mae']) / (before['mae'] + 1e-10) * 100, 2),
+            'fit_seconds_change_pct': round(
+                (current['fit_seconds'] - before['fit_seconds']) / (before['fit_seconds'] + 1e-10) * 100, 2
+            )
+        }
+    return changes
+
+
+# ----------------------------------------------------------------------
+# CLI
+
+def run_command(args):
+    models = [name.strip() for name in args.models.split(',')]
+    unknown = [name for name in models if name not in FORECASTERS]
+    if unknown:
+        sys.exit(f"Unknown model(s): {', '.join(unknown)} - choose from {', '.join(FORECASTERS)}")
+
+    if args.snapshot:
+        series = load_series_from_snapshot(args.snapshot, args.business_id)
+    else:
+        series = load_series_from_db(args.business_id, args.days)
+    if not series:
+        sys.exit("No businesses to evaluate")
+
+    config = {
+        'source': os.path.basename(args.snapshot) if args.snapshot else 'database',
+        'business_ids': sorted(series),
+        'models': models,
+        'horizon': args.horizon,
+        'folds': args.folds,
+        'step': args.step or args.horizon
+    }
+    print(f"🔬 {len(series)} businesses x {len(models)} models x {args.folds} folds, horizon {args.horizon} days")
+
+    started_at = datetime.utcnow()
+    started = time.perf_counter()
+    rows = cross_validate(series, models, args.horizon, args.folds, args.step, args.jobs)
+    summary = summarize(rows)
+
+    run = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'wall_seconds': round(time.perf_counter() - started, 2),
+        'config': config,
+        'summary': summary,
+        'folds': rows
+    }
+    before = previous_run(config, args.store_dir)
+    run['compared_to'] = before['started_at'] if before else None
+    run['changes'] = compare(summary, before['summary']) if before else {}
+    path = save_run(run, args.store_dir)
+
+    print(f"\n{'model':<10}{'folds':>7}{'MAE':>14}{'RMSE':>14}{'MAPE %':>10}{'fit s':>9}{'pred s':>9}{'ΔMAE %':>9}")
+    for model_name, m in summary.items():
+        delta = run['changes'].get(model_name, {}).get('mae_change_pct')
+        print(f"{model_name:<10}{m['folds']:>7}{m['mae']:>14,.2f}{m['rmse']:>14,.2f}{m['mape']:>10.1f}"
+              f"{m['fit_seconds']:>9.3f}{m['predict_seconds']:>9.3f}{'' if delta is None else f'{delta:+.1f}':>9}")
+    skipped = sum(1 for r in rows if 'skipped' in r)
+    failed = [r for r in rows if 'error' in r]
+    if skipped:
+        print(f"⏭️  {skipped} folds skipped (not enough training history)")
+    for r in failed:
+        print(f"❌ business {r['business_id']} {r['model']} @ {r['origin']}: {r['error']}")
+    print(f"\n✅ {run['wall_seconds']}s wall time - saved to {path}")
+
+    if args.fail_on_regression is not None:
+        regressed = [name for name, change in run['changes'].items()
+                     if change['mae_change_pct'] > args.fail_on_regression]
+        if regressed:
+            print(f"⚠️ MAE regressed more than {args.fail_on_regression}% for: {', '.join(regressed)}")
+            sys.exit(1)
+
+def export_command(args):
+    series = load_series_from_db(args.business_id, args.days)
+    rows = export_snapshot(series, args.path)
+    print(f"✅ Wrote {rows} daily rows for {len(series)} businesses to {args.path}")
+
+def history_command(args):
+    for run in load_runs(args.store_dir):
+        config = run['config']
+        maes = ", ".join(f"{name} {m['mae']:,.0f}" for name, m in run['summary'].items())
+        print(f"{run['started_at']}  {config['source']} h={config['horizon']} folds={config['folds']} "
+              f"businesses={len(config['business_ids'])}  MAE: {maes}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling-origin cross-validation of the forecasters")
+    parser.add_argument("--store-dir", default=EVALUATION_DIR, help="Where runs are saved")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Cross-validate and save the results")
+    source = run.add_mutually_exclusive_group()
+    source.add_argument("--snapshot", help="Parquet / CSV snapshot instead of the database")
+    source.add_argument("--all", action="store_true", help="Every business in the database (default)")
+    run.add_argument("--business-id", type=int, action="append", help="Limit to these businesses (repeatable)")
+    run.add_argument("--models", default=",".join(FORECASTERS), help="Comma-separated: " + ", ".join(FORECASTERS))
+    run.add_argument("--horizon", type=int, default=7, help="Days forecast per fold")
+    run.add_argument("--folds", type=int, default=5)
+    run.add_argument("--step", type=int, help="Days between origins (default: horizon)")
+    run.add_argument("--days", type=int, default=365, help="History loaded from the database")
+    run.add_argument("--jobs", type=int, default=-1, help="Parallel workers (-1 = all cores)")
+    run.add_argument("--fail-on-regression", type=float, metavar="PCT",
+                     help="Exit 1 if any model's MAE is this many percent worse than the previous run")
+
+    export = sub.add_parser("export", help="Write daily series from the database to a snapshot file")
+    export.add_argument("path", help="Output .parquet or .csv")
+    export.add_argument("--business-id", type=int, action="append")
+    export.add_argument("--days", type=int, default=365)
+
+    sub.add_parser("history", help="List saved runs")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run_command(args)
+    elif args.command == "export":
+        export_command(args)
+    else:
+        history_command(args)
+
+
+if __name__ == "__main__":
+    main()
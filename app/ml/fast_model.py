@@ -0,0 +1,124 @@
+import pandas as pd
+import numpy as np
+import time
+
+class FastModel:
+    """Day-of-week adjusted exponential smoothing / seasonal-naive forecaster in NumPy - trains in milliseconds"""
+    SEASON = 7
+    ALPHAS = np.linspace(0.05, 0.95, 19)
+    # Day-of-week profile is taken from the most recent weeks only
+    PROFILE_WEEKS = 8
+    Z_95 = 1.96
+
+    def __init__(self):
+        self.method = None
+        self.alpha = None
+        self.level = None
+        self.profile = None
+        self.last_week = None
+        self.last_date = None
+        self.resid_std = 0.0
+        self.metrics = {}
+
+    def prepare_series(self, df: pd.DataFrame, date_col='date', target_col='net'):
+        """Continuous daily series - days without transactions count as zero"""
+        series = df.groupby(pd.to_datetime(df[date_col]))[target_col].sum()
+        dates = pd.date_range(series.index.min(), series.index.max(), freq='D')
+        return dates, series.reindex(dates, fill_value=0.0).values.astype(float)
+
+    def fit(self, dates: pd.DatetimeIndex, y: np.ndarray):
+        """Fit both candidates and keep whichever has the lower one-step error"""
+        n = len(y)
+        dow = dates.dayofweek.values
+
+        # Day-of-week profile (deviation from the recent mean)
+        recent = slice(max(0, n - self.PROFILE_WEEKS * self.SEASON), n)
+        sums = np.bincount(dow[recent], weights=y[recent], minlength=self.SEASON)
+        counts = np.bincount(dow[recent], minlength=self.SEASON)
+        means = sums / np.maximum(counts, 1)
+        self.profile = np.where(counts > 0, means - y[recent].mean(), 0.0)
+
+        # Simple exponential smoothing on the deseasonalized series, all alphas at once
+        z = y - self.profile[dow]
+        level = np.full(len(self.ALPHAS), z[0])
+        errors = np.zeros((n, len(self.ALPHAS)))
+        for t in range(1, n):
+            errors[t] = z[t] - level
+            level = level + self.ALPHAS * errors[t]
+
+        start = min(self.SEASON, n - 1)
+        ses_mse = (errors[start:] ** 2).mean(axis=0)
+        best = int(np.argmin(ses_mse))
+
+        # Seasonal naive: same weekday last week
+        naive_errors = y[self.SEASON:] - y[:-self.SEASON] if n > self.SEASON else np.array([np.inf])
+        naive_mse = float((naive_errors ** 2).mean())
+
+        if ses_mse[best] <= naive_mse:
+            self.method = 'exponential_smoothing'
+            self.alpha = float(self.ALPHAS[best])
+            self.level = float(level[best])
+            self.resid_std = float(errors[start:, best].std())
+        else:
+            self.method = 'seasonal_naive'
+            self.alpha = None
+            self.level = None
+            self.resid_std = float(naive_errors.std())
+
+        self.last_week = y[-self.SEASON:].copy()
+        self.last_date = dates[-1]
+        return self
+
+    def forecast(self, periods: int):
+        """Point forecast and 95% bounds as NumPy arrays"""
+        if self.method is None:
+            raise ValueError("Model not trained yet")
+
+        future = pd.date_range(self.last_date + pd.Timedelta(days=1), periods=periods, freq='D')
+        steps = np.arange(periods)
+
+        if self.method == 'exponential_smoothing':
+            prediction = self.level + self.profile[future.dayofweek.values]
+            # SES forecast variance grows with the horizon
+            spread = self.Z_95 * self.resid_std * np.sqrt(1 + steps * self.alpha ** 2)
+        else:
+            # Step k repeats the value from the same weekday in the last observed week
+            offset = len(self.last_week) - self.SEASON
+            prediction = self.last_week[offset + steps % self.SEASON] if offset >= 0 else np.zeros(periods)
+            spread = self.Z_95 * self.resid_std * np.sqrt(steps // self.SEASON + 1)
+
+        return future, prediction, prediction - spread, prediction + spread
+
+    def train(self, df: pd.DataFrame, date_col='date', target_col='net'):
+        """Backtest on a holdout, then refit on the full history"""
+        started = time.perf_counter()
+        dates, y = self.prepare_series(df, date_col, target_col)
+
+        # Holdout accuracy - comparable with the hybrid model's MAE / RMSE / MAPE
+        holdout = min(14, len(y) // 4)
+        if holdout > 0:
+            self.fit(dates[:-holdout], y[:-holdout])
+            _, y_pred, _, _ = self.forecast(holdout)
+            y_true = y[-holdout:]
+            self.metrics = {
+                'mae': float(np.mean(np.abs(y_true - y_pred))),
+                'rmse': float(np.sqrt(np.mean((y_true - y_pred) ** 2))),
+                'mape': float(np.mean(np.abs((y_true - y_pred) / (y_true + 1e-10))) * 100),
+                'holdout_days': holdout
+            }
+
+        self.fit(dates, y)
+        self.metrics['method'] = self.method
+        self.metrics['train_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return self.metrics
+
+    def predict(self, periods: int = 7):
+        """Generate predictions"""
+        future, prediction, lower, upper = self.forecast(periods)
+
+        return {
+            'dates': [d.isoformat() for d in future],
+            'prediction': [float(x) for x in prediction],
+            'lower_bound': [float(x) for x in lower],
+            'upper_bound': [float(x) for x in upper]
+        }
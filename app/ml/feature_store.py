@@ -0,0 +1,327 @@
+"""
+Incremental feature store for forecasting
+
+Keeps the daily aggregate frame and the engineered feature frame for each
+business, together with a watermark:
+    last_id     - highest transaction id folded into the frame
+    last_change - change_log sequence the frame is current with
+    cutoff      - created_at lower bound of the history window
+    count / sums - fingerprint of the rows at or below last_id
+
+On each request only rows newer than last_id (plus rows that aged out of the
+window) are fetched and added to / subtracted from their days. Lag and rolling
+features are recomputed from the earliest changed day minus MAX_LOOKBACK rows.
+Day-of-week / month deviations are recomputed over the whole frame, which is a
+single vectorized groupby. A change_log entry for a row already folded in
+(an edit - including a description edit that moves it to another day - or a
+delete), a fingerprint mismatch (writes that bypass the change log) or a frame
+older than FEATURE_STORE_MAX_AGE_HOURS triggers a full rebuild.
+
+The most recently used FEATURE_STORE_MAX_FRAMES frames are kept in memory, and
+all of them are pickled to FEATURE_STORE_DIR so they survive restarts.
+"""
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import pandas as pd
+from datetime import datetime, timedelta
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from app import models
+from app.ml.data_pipeline import DataPipeline
+
+FEATURE_STORE_DIR = os.getenv(
+    "FEATURE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".feature_store")
+)
+FEATURE_STORE_MAX_AGE_HOURS = float(os.getenv("FEATURE_STORE_MAX_AGE_HOURS", "24"))
+# Frames kept in memory per process, least recently used evicted first
+FEATURE_STORE_MAX_FRAMES = int(os.getenv("FEATURE_STORE_MAX_FRAMES", "256"))
+
+# Bump when the frame layout or engineered features change
+STORE_VERSION = 3
+
+AGGREGATE_COLUMNS = ['income', 'expense', 'n']
+
+
+class FeatureStore:
+    # Shared across instances - one entry per (business_id, days); _guard protects both dicts
+    _frames = OrderedDict()
+    _locks = {}
+    _guard = threading.Lock()
+
+    def __init__(self, db: Session, store_dir: str = FEATURE_STORE_DIR):
+        self.db = db
+        self.pipeline = DataPipeline(db)
+        self.store_dir = store_dir
+        # 'cached', 'incremental' or 'full' - how the last refresh was served
+        self.last_refresh = None
+
+    def get_daily(self, business_id: int, days: int = 365):
+        """Daily income / expense / net, same shape as DataPipeline.prepare_daily_data"""
+        state = self.refresh(business_id, days)
+        return state['daily'][['date', 'income', 'expense', 'net']].copy()
+
+    def get_features(self, business_id: int, days: int = 365):
+        """Engineered feature frame, same as DataPipeline.engineer_features"""
+        state = self.refresh(business_id, days)
+        return state['featured'].dropna()
+
+    def invalidate(self, business_id: int):
+        """Drop every stored frame for a business"""
+        with self._guard:
+            for key in [k for k in self._frames if k[0] == business_id]:
+                self._frames.pop(key, None)
+        if os.path.isdir(self.store_dir):
+            for name in os.listdir(self.store_dir):
+                if name.startswith(f"{business_id}_"):
+                    os.remove(os.path.join(self.store_dir, name))
+
+    def refresh(self, business_id: int, days: int = 365):
+        """Bring the stored frame up to date and return it"""
+        key = (business_id, days)
+        with self._lock_for(key):
+            state = self._cached(key) or self._load(key)
+            now = datetime.utcnow()
+            cutoff = now - timedelta(days=days)
+
+            if state is None or now - state['built_at'] > timedelta(hours=FEATURE_STORE_MAX_AGE_HOURS):
+                state = self._full_build(business_id, days, cutoff, now)
+            else:
+                state = self._incremental(state, business_id, cutoff, now)
+
+            self._remember(key, state)
+            return state
+
+    # ------------------------------------------------------------------
+    # Build paths
+
+    def _full_build(self, business_id: int, days: int, cutoff: datetime, now: datetime):
+        # Read the sequence first - a change landing meanwhile is seen again next time
+        last_change = self._last_change(business_id)
+        rows = self._fetch_rows(
+            business_id,
+            models.Transaction.created_at >= cutoff
+        )
+        daily = self._with_net(self._aggregate(rows))
+        featured = self._engineer(daily)
+
+        state = {
+            'version': STORE_VERSION,
+            'days': days,
+            'built_at': now,
+            'cutoff': cutoff,
+            'last_id': max((r.id for r in rows), default=0),
+            'last_change': last_change,
+            'count': len(rows),
+            'amount_sum': sum(r.amount for r in rows),
+            'signed_sum': sum(self._signed(r) for r in rows),
+            'daily': daily,
+            'featured': featured,
+        }
+        self.last_refresh = 'full'
+        self._save((business_id, state['days']), state)
+        return state
+
+    def _incremental(self, state, business_id: int, cutoff: datetime, now: datetime):
+        Transaction = models.Transaction
+        last_id = state['last_id']
+
+        # Any logged change to a row already folded in (edit, delete, moved business) means rebuild
+        last_change = self._last_change(business_id)
+        if last_change != state['last_change'] and self.db.query(models.ChangeLog.id).filter(
+            models.ChangeLog.business_id == business_id,
+            models.ChangeLog.entity == "transactions",
+            models.ChangeLog.id > state['last_change'],
+            models.ChangeLog.entity_id <= last_id
+        ).first() is not None:
+            return self._full_build(business_id, state['days'], cutoff, now)
+
+        # Rows that fell out of the history window since the last refresh
+        departed = self._fetch_rows(
+            business_id,
+            Transaction.id <= last_id,
+            Transaction.created_at >= state['cutoff'],
+            Transaction.created_at < cutoff
+        ) if cutoff > state['cutoff'] else []
+
+        # Everything at or below the watermark must still match the fingerprint
+        count, amount_sum, signed_sum = self.db.query(
+            func.count(Transaction.id),
+            func.coalesce(func.sum(Transaction.amount), 0.0),
+            func.coalesce(func.sum(case(
+                (Transaction.type == 'income', Transaction.amount),
+                else_=-Transaction.amount
+            )), 0.0)
+        ).filter(
+            Transaction.business_id == business_id,
+            Transaction.id <= last_id,
+            Transaction.created_at >= cutoff
+        ).one()
+
+        expected_count = state['count'] - len(departed)
+        expected_amount = state['amount_sum'] - sum(r.amount for r in departed)
+        expected_signed = state['signed_sum'] - sum(self._signed(r) for r in departed)
+        if (count != expected_count
+                or not self._close(amount_sum, expected_amount)
+                or not self._close(signed_sum, expected_signed)):
+            return self._full_build(business_id, state['days'], cutoff, now)
+
+        added = self._fetch_rows(
+            business_id,
+            Transaction.id > last_id,
+            Transaction.created_at >= cutoff
+        )
+
+        state = dict(state, cutoff=cutoff, last_change=last_change)
+        if not added and not departed:
+            self.last_refresh = 'cached'
+            return state
+
+        delta = pd.concat([self._aggregate(added), self._aggregate(departed, sign=-1)])
+        delta = delta.groupby('date')[AGGREGATE_COLUMNS].sum()
+        changed_from = delta.index.min()
+
+        daily = state['daily'].set_index('date')[AGGREGATE_COLUMNS]
+        daily = daily.add(delta, fill_value=0)
+        daily = self._with_net(daily[daily['n'] > 0].reset_index())
+
+        # Rows before the first changed day keep their lag / rolling features
+        pos = int(daily['date'].searchsorted(changed_from))
+        start = max(0, pos - DataPipeline.MAX_LOOKBACK)
+        tail = daily.iloc[start:].copy()
+        self.pipeline.add_calendar_features(tail)
+        self.pipeline.add_window_features(tail)
+
+        head = state['featured'].iloc[:pos]
+        featured = pd.concat([head, tail.iloc[pos - start:]], ignore_index=True)
+        self.pipeline.add_group_features(featured)
+
+        state.update(
+            last_id=max([last_id] + [r.id for r in added]),
+            count=expected_count + len(added),
+            amount_sum=expected_amount + sum(r.amount for r in added),
+            signed_sum=expected_signed + sum(self._signed(r) for r in added),
+            daily=daily,
+            featured=featured,
+        )
+        self.last_refresh = 'incremental'
+        self._save((business_id, state['days']), state)
+        return state
+
+    # ------------------------------------------------------------------
+    # Helpers
+
+    def _last_change(self, business_id: int) -> int:
+        return self.db.query(func.max(models.ChangeLog.id)).filter(
+            models.ChangeLog.business_id == business_id,
+            models.ChangeLog.entity == "transactions"
+        ).scalar() or 0
+
+    def _fetch_rows(self, business_id: int, *filters):
+        Transaction = models.Transaction
+        return self.db.query(
+            Transaction.id,
+            Transaction.amount,
+            Transaction.type,
+            Transaction.description,
+            Transaction.created_at
+        ).filter(
+            Transaction.business_id == business_id,
+            *filters
+        ).all()
+
+    def _aggregate(self, rows, sign: int = 1):
+        """Per-day income / expense / row count for a batch of transaction rows"""
+        if not rows:
+            return pd.DataFrame({
+                'date': pd.Series(dtype='datetime64[ns]'),
+                **{col: pd.Series(dtype='float64') for col in AGGREGATE_COLUMNS}
+            })
+
+        dates = []
+        for r in rows:
+            # Same date rule as DataPipeline.prepare_daily_data
+            transaction_date = self.pipeline.extract_date_from_description(r.description)
+            dates.append(transaction_date or r.created_at.date())
+
+        df = pd.DataFrame({
+            'date': pd.to_datetime(dates),
+            'income': [r.amount if r.type == 'income' else 0.0 for r in rows],
+            'expense': [r.amount if r.type == 'expense' else 0.0 for r in rows],
+            'n': 1.0,
+        })
+        daily = df.groupby('date', as_index=False)[AGGREGATE_COLUMNS].sum()
+        daily[AGGREGATE_COLUMNS] *= sign
+        return daily
+
+    def _with_net(self, daily):
+        daily = daily.sort_values('date').reset_index(drop=True)
+        daily['net'] = daily['income'] - daily['expense']
+        return daily
+
+    def _engineer(self, daily):
+        featured = daily.copy()
+        if featured.empty:
+            return featured
+        self.pipeline.add_calendar_features(featured)
+        self.pipeline.add_window_features(featured)
+        self.pipeline.add_group_features(featured)
+        return featured
+
+    @staticmethod
+    def _signed(row):
+        return row.amount if row.type == 'income' else -row.amount
+
+    @staticmethod
+    def _close(a, b):
+        return abs(float(a) - float(b)) <= 1e-6 * max(1.0, abs(float(b)))
+
+    def _lock_for(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _cached(self, key):
+        with self._guard:
+            state = self._frames.get(key)
+            if state is not None:
+                self._frames.move_to_end(key)
+            return state
+
+    def _remember(self, key, state):
+        """Keep the frame in memory, evicting the least recently used past the limit"""
+        with self._guard:
+            self._frames[key] = state
+            self._frames.move_to_end(key)
+            while len(self._frames) > FEATURE_STORE_MAX_FRAMES:
+                evicted, _ = self._frames.popitem(last=False)
+                lock = self._locks.get(evicted)
+                if lock is not None and not lock.locked():
+                    del self._locks[evicted]
+
+    # ------------------------------------------------------------------
+    # Persistence
+
+    def _path(self, key):
+        business_id, days = key
+        return os.path.join(self.store_dir, f"{business_id}_{days}.pkl")
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        return state if state.get('version') == STORE_VERSION else None
+
+    def _save(self, key, state):
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            tmp_path = self._path(key) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            # Disk persistence is best-effort - the in-memory frame is still valid
+            print(f"⚠️ Feature store could not persist {key}: {e}")
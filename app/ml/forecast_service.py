@@ -1,116 +1,177 @@
 import pandas as pd
 import numpy as np
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from app.ml.data_pipeline import DataPipeline
+from app.ml.feature_store import FeatureStore
 from app.ml.baseline_model import BaselineModel
 from app.ml.hybrid_model import HybridModel
+from app.ml.fast_model import FastModel
+from app.ml.model_registry import ModelRegistry
+from app.ml.config import (
+    FORECAST_MODES, FAST_MAX_DAYS_FORWARD, FAST_SHORT_HISTORY_DAYS, FAST_LATENCY_BUDGET_MS,
+    FAST_MIN_DAYS, HYBRID_MIN_DAYS, FORECAST_POOL_WORKERS, FORECAST_BATCH_CONCURRENCY,
+    FORECAST_BATCH_MAX_SIZE
+)
+
+def choose_mode(mode: str, days_forward: int, history_days: int, latency_budget_ms: int = None):
+    """Resolve 'auto' to 'fast' or 'hybrid'"""
+    if mode != 'auto':
+        return mode
+    if latency_budget_ms is not None and latency_budget_ms < FAST_LATENCY_BUDGET_MS:
+        return 'fast'
+    if days_forward <= FAST_MAX_DAYS_FORWARD or history_days < FAST_SHORT_HISTORY_DAYS:
+        return 'fast'
+    return 'hybrid'
+
+# Feature columns the hybrid model's RandomForest stage is trained on
+HYBRID_FEATURES = [
+    'day_of_week', 'month', 'quarter', 'week_of_year',
+    'net_lag_1', 'net_lag_2', 'net_lag_3', 'net_lag_7',
+    'net_rolling_mean_7', 'net_rolling_std_7',
+    'volatility_7d', 'is_weekend', 'is_month_start', 'is_month_end'
+]
+
+def future_frame(last_date, days_forward: int):
+    """Future dates after last_date with the calendar features known in advance"""
+    future_dates = pd.date_range(
+        start=last_date + timedelta(days=1),
+        periods=days_forward,
+        freq='D'
+    )
+    
+    future_df = pd.DataFrame({'ds': future_dates})
+    future_df['day_of_week'] = future_df['ds'].dt.dayofweek
+    future_df['month'] = future_df['ds'].dt.month
+    future_df['quarter'] = future_df['ds'].dt.quarter
+    future_df['week_of_year'] = future_df['ds'].dt.isocalendar().week.astype(int)
+    future_df['is_weekend'] = future_df['day_of_week'].isin([5, 6]).astype(int)
+    future_df['is_month_start'] = (future_df['ds'].dt.is_month_start).astype(int)
+    future_df['is_month_end'] = (future_df['ds'].dt.is_month_end).astype(int)
+    return future_df
+
+def date_to_str(d):
+    """Convert dates to string for JSON serialization"""
+    if isinstance(d, (np.datetime64, pd.Timestamp)):
+        return pd.Timestamp(d).strftime('%Y-%m-%d')
+    return str(d)
+
+_forecast_pool = None
+_forecast_pool_lock = threading.Lock()
+
+def get_forecast_pool():
+    """Lazily start the shared forecast process pool"""
+    global _forecast_pool
+    with _forecast_pool_lock:
+        if _forecast_pool is None:
+            # spawn - forking a threaded server process is unsafe
+            _forecast_pool = ProcessPoolExecutor(
+                max_workers=FORECAST_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _forecast_pool
+
+def shutdown_forecast_pool():
+    global _forecast_pool
+    with _forecast_pool_lock:
+        if _forecast_pool is not None:
+            _forecast_pool.shutdown(wait=False, cancel_futures=True)
+            _forecast_pool = None
+
+def submit_forecast(business_id: int, daily_data: pd.DataFrame, days_forward: int = 30, mode: str = 'hybrid'):
+    """Queue a forecast on the shared pool, restarting the pool if a worker died"""
+    try:
+        return get_forecast_pool().submit(forecast_from_daily, business_id, daily_data, days_forward, mode)
+    except BrokenProcessPool:
+        shutdown_forecast_pool()
+        return get_forecast_pool().submit(forecast_from_daily, business_id, daily_data, days_forward, mode)
+
+def forecast_from_daily(business_id: int, daily_data: pd.DataFrame, days_forward: int = 30, mode: str = 'hybrid'):
+    """Engineer features and forecast from a daily frame - no database access, runs in the process pool"""
+    service = ForecastService(db=None)
+    if choose_mode(mode, days_forward, len(daily_data)) == 'fast':
+        return service.fast_forecast(business_id, daily_data, days_forward)
+    data = service.pipeline.engineer_features(daily_data) if not daily_data.empty else None
+    return service.forecast_from_data(business_id, data, days_forward)
 
 class ForecastService:
     def __init__(self, db: Session):
         self.db = db
         self.pipeline = DataPipeline(db)
-        self.baseline = BaselineModel()
-        self.hybrid = HybridModel()
+        self.feature_store = FeatureStore(db)
+        self.registry = ModelRegistry()
+        self.baseline = BaselineModel(self.registry)
+        self.hybrid = HybridModel(self.registry)
+        self.fast = FastModel()
     
     def prepare_data_for_forecast(self, business_id: int, days_history: int = 365):
         """Prepare data for forecasting"""
-        # Get daily aggregated data
-        daily_data = self.pipeline.prepare_daily_data(business_id, days_history)
+        # Engineered features from the store - only days changed since the last call are recomputed
+        featured_data = self.feature_store.get_features(business_id, days_history)
         
-        if daily_data.empty:
+        if featured_data.empty:
             return None
         
-        # Engineer features
-        featured_data = self.pipeline.engineer_features(daily_data)
-        
         return featured_data
     
-    def generate_forecast(self, business_id: int, days_forward: int = 30):
+    def generate_forecast(self, business_id: int, days_forward: int = 30, mode: str = 'hybrid',
+                          latency_budget_ms: int = None):
         """Generate forecast for a business"""
+        if mode != 'hybrid':
+            daily_data = self.feature_store.get_daily(business_id)
+            if choose_mode(mode, days_forward, len(daily_data), latency_budget_ms) == 'fast':
+                return self.fast_forecast(business_id, daily_data, days_forward)
+        
         # Prepare data
         data = self.prepare_data_for_forecast(business_id)
-        
-        if data is None or len(data) < 30:
+        return self.forecast_from_data(business_id, data, days_forward)
+    
+    def forecast_from_data(self, business_id: int, data: pd.DataFrame, days_forward: int = 30):
+        """Train models and forecast from an engineered feature frame"""
+        if data is None or len(data) < HYBRID_MIN_DAYS:
             return {
-                'error': 'Insufficient data for forecasting. Need at least 30 days of data.'
+                'error': f'Insufficient data for forecasting. Need at least {HYBRID_MIN_DAYS} days of data.'
             }
         
-        # Define feature columns for hybrid model
-        feature_cols = [
-            'day_of_week', 'month', 'quarter', 'week_of_year',
-            'net_lag_1', 'net_lag_2', 'net_lag_3', 'net_lag_7',
-            'net_rolling_mean_7', 'net_rolling_std_7',
-            'volatility_7d', 'is_weekend', 'is_month_start', 'is_month_end'
-        ]
-        
         # Filter to available columns
-        available_features = [col for col in feature_cols if col in data.columns]
+        available_features = [col for col in HYBRID_FEATURES if col in data.columns]
         
         # Train baseline model
         print("Training baseline Prophet model...")
-        self.baseline.train(data)
+        self.baseline.train(data, business_id=business_id)
         baseline_metrics = self.baseline.evaluate(data)
         
         # Train hybrid model
         print("Training hybrid Prophet+RF model...")
-        hybrid_metrics = self.hybrid.train(data, available_features)
-        
-        # Generate future dates
-        last_date = data['date'].max()
-        future_dates = pd.date_range(
-            start=last_date + timedelta(days=1),
-            periods=days_forward,
-            freq='D'
-        )
-        
-        # Create future dataframe with features
-        future_df = pd.DataFrame({'ds': future_dates})
-        
-        # Add basic features for future dates
-        future_df['day_of_week'] = future_df['ds'].dt.dayofweek
-        future_df['month'] = future_df['ds'].dt.month
-        future_df['quarter'] = future_df['ds'].dt.quarter
-        future_df['week_of_year'] = future_df['ds'].dt.isocalendar().week.astype(int)
-        future_df['is_weekend'] = future_df['day_of_week'].isin([5, 6]).astype(int)
-        future_df['is_month_start'] = (future_df['ds'].dt.is_month_start).astype(int)
-        future_df['is_month_end'] = (future_df['ds'].dt.is_month_end).astype(int)
-        
-        # For lag features, use last known values from data
-        for lag in [1, 2, 3, 7]:
-            future_df[f'net_lag_{lag}'] = data['net'].iloc[-lag] if len(data) >= lag else 0
-        
-        # For rolling features, use recent averages
-        future_df['net_rolling_mean_7'] = data['net'].tail(7).mean()
-        future_df['net_rolling_std_7'] = data['net'].tail(7).std()
-        future_df['volatility_7d'] = future_df['net_rolling_std_7'] / (future_df['net_rolling_mean_7'].abs() + 1)
+        hybrid_metrics = self.hybrid.train(data, available_features, business_id=business_id)
+        
+        # Future dates with calendar features
+        future_df = future_frame(data['date'].max(), days_forward)
+        
+        # Lag / rolling features are rolled forward from the model's own predictions
+        history = data['net'].tail(DataPipeline.MAX_LOOKBACK).values
         
         # Generate predictions
         baseline_forecast = self.baseline.predict(periods=days_forward)
-        hybrid_forecast = self.hybrid.predict(future_df, available_features)
+        hybrid_forecast = self.hybrid.predict(future_df, available_features, history=history)
         
-        # Convert dates to string for JSON serialization
-        def date_to_str(d):
-            if isinstance(d, (np.datetime64, pd.Timestamp)):
-                return pd.Timestamp(d).strftime('%Y-%m-%d')
-            return str(d)
+        # Fast model on the same history - milliseconds, lets users compare accuracy
+        fast_metrics = self.fast.train(data)
+        fast_forecast = self.fast.predict(periods=days_forward)
         
         return {
             'business_id': business_id,
             'forecast_date': datetime.utcnow().isoformat(),
             'days_forward': days_forward,
-            'data_summary': {
-                'total_days': len(data),
-                'date_range': {
-                    'start': date_to_str(data['date'].min()),
-                    'end': date_to_str(data['date'].max())
-                },
-                'total_income': float(data['income'].sum()),
-                'total_expense': float(data['expense'].sum()),
-                'avg_daily_net': float(data['net'].mean())
-            },
+            'mode': 'hybrid',
+            'data_summary': self.summarize_data(data),
             'baseline_model': {
                 'metrics': baseline_metrics,
+                'fit': self.baseline.fit_info,
                 'forecast': [
                     {
                         'ds': date_to_str(row['ds']),
@@ -123,6 +184,7 @@ class ForecastService:
             },
             'hybrid_model': {
                 'metrics': hybrid_metrics,
+                'fit': self.hybrid.fit_info,
                 'feature_importance': self.hybrid.feature_importance,
                 'forecast': [
                     {
@@ -136,12 +198,60 @@ class ForecastService:
                     for i in range(len(hybrid_forecast['dates']))
                 ]
             },
-            'risk_analysis': self.analyze_risk(hybrid_forecast, data)
+            'fast_model': self.fast_model_section(fast_metrics, fast_forecast),
+            'risk_analysis': self.analyze_risk(hybrid_forecast['hybrid_prediction'], data)
         }
     
-    def analyze_risk(self, forecast, historical_data):
+    def fast_forecast(self, business_id: int, daily_data: pd.DataFrame, days_forward: int = 7):
+        """Forecast with the NumPy fast model only - no Prophet / RandomForest fit"""
+        if daily_data is None or len(daily_data) < FAST_MIN_DAYS:
+            return {
+                'error': f'Insufficient data for forecasting. Need at least {FAST_MIN_DAYS} days of data.'
+            }
+        
+        fast_metrics = self.fast.train(daily_data)
+        fast_forecast = self.fast.predict(periods=days_forward)
+        
+        return {
+            'business_id': business_id,
+            'forecast_date': datetime.utcnow().isoformat(),
+            'days_forward': days_forward,
+            'mode': 'fast',
+            'data_summary': self.summarize_data(daily_data),
+            'fast_model': self.fast_model_section(fast_metrics, fast_forecast),
+            'risk_analysis': self.analyze_risk(fast_forecast['prediction'], daily_data)
+        }
+    
+    def summarize_data(self, data: pd.DataFrame):
+        """Summary of the history a forecast was trained on"""
+        return {
+            'total_days': len(data),
+            'date_range': {
+                'start': date_to_str(data['date'].min()),
+                'end': date_to_str(data['date'].max())
+            },
+            'total_income': float(data['income'].sum()),
+            'total_expense': float(data['expense'].sum()),
+            'avg_daily_net': float(data['net'].mean())
+        }
+    
+    def fast_model_section(self, metrics, forecast):
+        return {
+            'method': self.fast.method,
+            'metrics': metrics,
+            'forecast': [
+                {
+                    'date': forecast['dates'][i],
+                    'prediction': forecast['prediction'][i],
+                    'lower_bound': forecast['lower_bound'][i],
+                    'upper_bound': forecast['upper_bound'][i]
+                }
+                for i in range(len(forecast['dates']))
+            ]
+        }
+    
+    def analyze_risk(self, predictions, historical_data):
         """Analyze risk based on forecast"""
-        predictions = forecast['hybrid_prediction']
         
         # Calculate risk metrics
         negative_days = sum(1 for p in predictions if p < 0)
@@ -186,21 +296,29 @@ class ForecastService:
             'alerts': alerts
         }
     
-    def get_risk_alert(self, business_id: int):
+    def get_risk_alert(self, business_id: int, mode: str = 'hybrid'):
         """Generate risk alert based on forecast"""
-        forecast = self.generate_forecast(business_id, days_forward=30)
-        
+        forecast = self.generate_forecast(business_id, days_forward=30, mode=mode)
+        return self.risk_alert_from_forecast(business_id, forecast)
+    
+    def risk_alert_from_forecast(self, business_id: int, forecast: dict, timestamp: str = None):
+        """Risk alert from an already computed 30-day forecast (e.g. a precomputed snapshot)"""
         if 'error' in forecast:
             return forecast
         
+        if 'hybrid_model' in forecast:
+            predictions = [f['hybrid_prediction'] for f in forecast['hybrid_model']['forecast']]
+        else:
+            predictions = [f['prediction'] for f in forecast['fast_model']['forecast']]
+        
         return {
             'business_id': business_id,
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': timestamp or datetime.utcnow().isoformat(),
             'risk_level': self.get_risk_level(forecast['risk_analysis']['risk_score']),
             'risk_score': forecast['risk_analysis']['risk_score'],
             'alerts': forecast['risk_analysis']['alerts'],
             'summary': {
-                'forecast_avg': float(np.mean([f['hybrid_prediction'] for f in forecast['hybrid_model']['forecast']])),
+                'forecast_avg': float(np.mean(predictions)),
                 'negative_days': forecast['risk_analysis']['negative_days_forecast'],
                 'volatility': forecast['risk_analysis']['forecast_volatility']
             }
@@ -1,5 +1,7 @@
 import pandas as pd
 import numpy as np
+import re
+import time
 from prophet import Prophet
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
@@ -8,13 +10,27 @@ import warnings
 warnings.filterwarnings('ignore')
 
 class HybridModel:
-    def __init__(self):
+    def __init__(self, registry=None):
         self.prophet_model = None
         self.rf_model = None
         self.metrics = {}
         self.feature_importance = None
+        # Optional ModelRegistry - reuses / warm-starts Prophet fits per business
+        self.registry = registry
+        self.fit_info = None
     
-    def train_prophet(self, df: pd.DataFrame, date_col='date', target_col='net'):
+    def build_prophet(self):
+        """Configured, unfitted Prophet model"""
+        model = Prophet(
+            yearly_seasonality=True,
+            weekly_seasonality=True,
+            daily_seasonality=False,
+            seasonality_mode='multiplicative'
+        )
+        model.add_country_holidays(country_name='KE')
+        return model
+    
+    def train_prophet(self, df: pd.DataFrame, date_col='date', target_col='net', business_id=None):
         """Train Prophet model and get residuals"""
         # Prepare data for Prophet
         prophet_df = df[[date_col, target_col]].rename(
@@ -22,14 +38,15 @@ class HybridModel:
         )
         
         # Train Prophet
-        self.prophet_model = Prophet(
-            yearly_seasonality=True,
-            weekly_seasonality=True,
-            daily_seasonality=False,
-            seasonality_mode='multiplicative'
-        )
-        self.prophet_model.add_country_holidays(country_name='KE')
-        self.prophet_model.fit(prophet_df)
+        if self.registry is not None and business_id is not None:
+            self.prophet_model, self.fit_info = self.registry.fit(
+                (business_id, 'hybrid'), prophet_df, self.build_prophet
+            )
+        else:
+            started = time.perf_counter()
+            self.prophet_model = self.build_prophet()
+            self.prophet_model.fit(prophet_df)
+            self.fit_info = {'mode': 'cold', 'duration_s': round(time.perf_counter() - started, 3)}
         
         # Get predictions and calculate residuals
         forecast = self.prophet_model.predict(prophet_df[['ds']])
@@ -68,10 +85,10 @@ class HybridModel:
         
         return rf_metrics
     
-    def train(self, df: pd.DataFrame, feature_cols):
+    def train(self, df: pd.DataFrame, feature_cols, business_id=None):
         """Complete hybrid training"""
         # Train Prophet and get residuals
-        residuals, prophet_forecast = self.train_prophet(df)
+        residuals, prophet_forecast = self.train_prophet(df, business_id=business_id)
         
         # Train Random Forest on residuals
         rf_metrics = self.train_rf(df, residuals, feature_cols)
@@ -92,8 +109,13 @@ class HybridModel:
         
         return self.metrics
     
-    def predict(self, future_df: pd.DataFrame, feature_cols):
-        """Generate hybrid predictions"""
+    def predict(self, future_df: pd.DataFrame, feature_cols, history=None):
+        """Generate hybrid predictions
+        
+        With `history` (observed net values, oldest first) the lag / rolling features
+        are rolled forward day by day from the model's own predictions. Without it
+        future_df must already hold every feature column.
+        """
         if not self.prophet_model or not self.rf_model:
             raise ValueError("Models not trained yet")
         
@@ -101,7 +123,10 @@ class HybridModel:
         prophet_pred = self.prophet_model.predict(future_df[['ds']])
         
         # Random Forest predictions for residuals
-        rf_pred = self.rf_model.predict(future_df[feature_cols].values)
+        if history is not None:
+            rf_pred = self.predict_recursive(future_df, feature_cols, prophet_pred['yhat'].values, history)
+        else:
+            rf_pred = self.rf_model.predict(future_df[feature_cols].values)
         
         # Combine predictions
         hybrid_pred = prophet_pred['yhat'].values + rf_pred
@@ -122,3 +147,51 @@ class HybridModel:
             'lower_bound': [float(x) for x in (prophet_pred['yhat_lower'].values + rf_pred)],
             'upper_bound': [float(x) for x in (prophet_pred['yhat_upper'].values + rf_pred)]
         }
+
+    def predict_recursive(self, future_df: pd.DataFrame, feature_cols, prophet_yhat, history):
+        """RF residual corrections where each day's lag / rolling features use earlier predictions"""
+        horizon = len(future_df)
+        history = np.asarray(history, dtype=float)
+        n_hist = len(history)
+        
+        # Preallocated buffers: net series (observed + predicted) and the feature matrix
+        net = np.empty(n_hist + horizon)
+        net[:n_hist] = history
+        X = np.zeros((horizon, len(feature_cols)), dtype=np.float32)
+        
+        # Calendar features are known up front; net-derived ones are filled per step
+        lags, means, stds, volatility = [], [], [], None
+        for j, col in enumerate(feature_cols):
+            lag = re.fullmatch(r'net_lag_(\d+)', col)
+            mean = re.fullmatch(r'net_rolling_mean_(\d+)', col)
+            std = re.fullmatch(r'net_rolling_std_(\d+)', col)
+            if lag:
+                lags.append((j, int(lag.group(1))))
+            elif mean:
+                means.append((j, int(mean.group(1))))
+            elif std:
+                stds.append((j, int(std.group(1))))
+            elif col == 'volatility_7d':
+                volatility = j
+            elif col in future_df.columns:
+                X[:, j] = future_df[col].values
+        
+        rf_pred = np.empty(horizon)
+        
+        for t in range(horizon):
+            pos = n_hist + t
+            row = X[t:t + 1]
+            for j, k in lags:
+                row[0, j] = net[pos - k] if pos >= k else 0.0
+            for j, w in means:
+                row[0, j] = net[max(0, pos - w):pos].mean()
+            for j, w in stds:
+                row[0, j] = net[max(0, pos - w):pos].std(ddof=1) if pos > 1 else 0.0
+            if volatility is not None:
+                window = net[max(0, pos - 7):pos]
+                row[0, volatility] = window.std(ddof=1) / (abs(window.mean()) + 1) if len(window) > 1 else 0.0
+            
+            rf_pred[t] = self.rf_model.predict(row)[0]
+            net[pos] = prophet_yhat[t] + rf_pred[t]
+        
+        return rf_pred
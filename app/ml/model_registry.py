@@ -0,0 +1,303 @@
+"""
+Prophet model registry with warm-started, drift-triggered refits
+
+Each (business_id, kind) keeps its last fitted Prophet model. When new data arrives:
+    - no model yet                          -> cold fit
+    - model older than PROPHET_MAX_MODEL_AGE_DAYS,
+      or RMSE on the days since the last fit is above
+      PROPHET_DRIFT_THRESHOLD x the model's noise level -> refit, warm-started
+                                               from the previous parameters
+    - otherwise                             -> reuse the fitted model
+
+Drift is measured with a point forecast only (no uncertainty sampling) and cached
+per model against a hash of the days since the fit, so repeat requests on
+unchanged data skip the predict entirely.
+
+Every fit records its duration, mode and drift ratio. Every model is serialized to
+MODEL_REGISTRY_DIR so worker processes and restarts share them; the most recently
+used MODEL_REGISTRY_MAX_MODELS are also kept in memory. An evicted model whose
+cached drift changed since it was stored is written back first, so reloading it
+doesn't repeat the predict.
+
+Run on a schedule (cron / worker):
+    python -m app.ml.model_registry refit      # refit every business where due
+    python -m app.ml.model_registry status     # last fits and durations
+"""
+import argparse
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from prophet.serialize import model_to_json, model_from_json
+
+MODEL_REGISTRY_DIR = os.getenv(
+    "MODEL_REGISTRY_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".model_registry")
+)
+# Refit when RMSE on new days exceeds this multiple of the fitted noise level
+PROPHET_DRIFT_THRESHOLD = float(os.getenv("PROPHET_DRIFT_THRESHOLD", "1.5"))
+# Refit at least this often even without drift
+PROPHET_MAX_MODEL_AGE_DAYS = float(os.getenv("PROPHET_MAX_MODEL_AGE_DAYS", "7"))
+# Fitted models kept in memory per process, least recently used evicted first
+MODEL_REGISTRY_MAX_MODELS = int(os.getenv("MODEL_REGISTRY_MAX_MODELS", "128"))
+# Fit records kept per model
+REFIT_HISTORY = 20
+
+
+def stan_init(model):
+    """Fitted parameters of a Prophet model, in the shape Prophet.fit(init=...) expects"""
+    init = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        init[name] = float(model.params[name][0][0])
+    for name in ['delta', 'beta']:
+        init[name] = model.params[name][0]
+    return init
+
+
+def noise_level(model):
+    """Residual scale the model was fitted with, in the units of y"""
+    return float(model.params['sigma_obs'][0][0]) * float(model.y_scale)
+
+
+class ModelRegistry:
+    # Shared across instances - key -> entry; _guard protects both dicts
+    _entries = OrderedDict()
+    _locks = {}
+    _guard = threading.Lock()
+
+    def __init__(self, store_dir: str = MODEL_REGISTRY_DIR):
+        self.store_dir = store_dir
+
+    def fit(self, key, df: pd.DataFrame, build):
+        """Fitted Prophet model for `key` on df (ds, y) - reused, warm-started or cold
+
+        `build` returns a new, configured, unfitted Prophet instance.
+        Returns (model, fit_info).
+        """
+        with self._lock_for(key):
+            entry = self._cached(key) or self._load(key)
+            if entry is not None:
+                # Keep loaded models in memory so the cached drift survives between requests
+                self._remember(key, entry)
+            decision, drift = self.refit_decision(entry, df)
+
+            if decision == 'reuse':
+                return entry['model'], {
+                    'mode': 'reused',
+                    'duration_s': 0.0,
+                    'drift_ratio': drift,
+                    'fitted_at': entry['fitted_at'].isoformat()
+                }
+
+            started = time.perf_counter()
+            model, mode = build(), 'cold'
+            if entry is not None:
+                try:
+                    # Start Stan's optimizer from the previous optimum
+                    model.fit(df, init=stan_init(entry['model']))
+                    mode = 'warm'
+                except Exception:
+                    model = build()
+            if mode == 'cold':
+                model.fit(df)
+            duration = time.perf_counter() - started
+
+            fit_info = {
+                'mode': mode,
+                'duration_s': round(duration, 3),
+                'drift_ratio': drift,
+                'fitted_at': datetime.utcnow().isoformat()
+            }
+            refits = (entry['refits'] if entry else []) + [fit_info]
+            entry = {
+                'model': model,
+                'fitted_at': datetime.utcnow(),
+                'last_ds': pd.Timestamp(df['ds'].max()),
+                'noise': noise_level(model),
+                'refits': refits[-REFIT_HISTORY:]
+            }
+            self._save(key, entry)
+            self._remember(key, entry)
+            return model, fit_info
+
+    def refit_decision(self, entry, df: pd.DataFrame):
+        """('cold' | 'warm' | 'reuse', drift ratio or None)"""
+        if entry is None:
+            return 'cold', None
+
+        new = df[df['ds'] > entry['last_ds']]
+        if len(new) == 0:
+            drift = 0.0
+        else:
+            watermark = int(pd.util.hash_pandas_object(new[['ds', 'y']], index=False).sum())
+            cached = entry.get('drift')
+            if cached is not None and cached[0] == watermark:
+                drift = cached[1]
+            else:
+                drift = self._drift(entry, new)
+                entry['drift'] = (watermark, drift)
+                entry['dirty'] = True
+
+        too_old = datetime.utcnow() - entry['fitted_at'] > timedelta(days=PROPHET_MAX_MODEL_AGE_DAYS)
+        if too_old or drift > PROPHET_DRIFT_THRESHOLD:
+            return 'warm', drift
+        return 'reuse', drift
+
+    @staticmethod
+    def _drift(entry, new: pd.DataFrame) -> float:
+        """RMSE of the point forecast on the new days, in units of the fitted noise"""
+        # Shallow copy so callers predicting with the shared model keep their intervals
+        model = copy.copy(entry['model'])
+        model.uncertainty_samples = 0
+        yhat = model.predict(new[['ds']])['yhat'].values
+        rmse = float(np.sqrt(np.mean((new['y'].values - yhat) ** 2)))
+        return round(rmse / entry['noise'], 3) if entry['noise'] > 0 else float('inf')
+
+    def status(self):
+        """Metadata for every stored model"""
+        rows = []
+        if not os.path.isdir(self.store_dir):
+            return rows
+        for name in sorted(os.listdir(self.store_dir)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(self.store_dir, name)) as f:
+                meta = json.load(f)['meta']
+            rows.append({'key': name[:-len('.json')], **meta})
+        return rows
+
+    def _lock_for(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _cached(self, key):
+        with self._guard:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _remember(self, key, entry):
+        """Keep the model in memory, evicting the least recently used past the limit"""
+        evicted = []
+        with self._guard:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > MODEL_REGISTRY_MAX_MODELS:
+                old_key, old_entry = self._entries.popitem(last=False)
+                evicted.append((old_key, old_entry))
+                lock = self._locks.get(old_key)
+                if lock is not None and not lock.locked():
+                    del self._locks[old_key]
+        # Serializing a model is slow - outside the guard
+        for old_key, old_entry in evicted:
+            if old_entry.get('dirty'):
+                self._save(old_key, old_entry)
+
+    # ------------------------------------------------------------------
+    # Persistence
+
+    def _path(self, key):
+        business_id, kind = key
+        return os.path.join(self.store_dir, f"{business_id}_{kind}.json")
+
+    def _load(self, key):
+        try:
+            with open(self._path(key)) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        meta = stored['meta']
+        entry = {
+            'model': model_from_json(stored['model']),
+            'fitted_at': datetime.fromisoformat(meta['fitted_at']),
+            'last_ds': pd.Timestamp(meta['last_ds']),
+            'noise': meta['noise'],
+            'refits': meta['refits']
+        }
+        if meta.get('drift') is not None:
+            entry['drift'] = tuple(meta['drift'])
+        return entry
+
+    def _save(self, key, entry):
+        stored = {
+            'model': model_to_json(entry['model']),
+            'meta': {
+                'fitted_at': entry['fitted_at'].isoformat(),
+                'last_ds': entry['last_ds'].isoformat(),
+                'noise': entry['noise'],
+                'refits': entry['refits'],
+                'drift': entry.get('drift')
+            }
+        }
+        entry['dirty'] = False
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            tmp_path = self._path(key) + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            # Disk persistence is best-effort - the in-memory model is still valid
+            print(f"⚠️ Model registry could not persist {key}: {e}")
+
+
+def refit_all():
+    """Scheduled job: run every business through the registry, refitting where due"""
+    from app.database import SessionLocal
+    from app import models
+    from app.ml.forecast_service import ForecastService, HYBRID_MIN_DAYS
+
+    db = SessionLocal()
+    try:
+        business_ids = [row.id for row in db.query(models.Business.id).all()]
+        totals = {'cold': 0, 'warm': 0, 'reused': 0, 'skipped': 0}
+        fit_seconds = 0.0
+        started = time.perf_counter()
+
+        service = ForecastService(db)
+        for business_id in business_ids:
+            data = service.prepare_data_for_forecast(business_id)
+            if data is None or len(data) < HYBRID_MIN_DAYS:
+                totals['skipped'] += 1
+                continue
+
+            # Only the Prophet fits - the RF stage is cheap and retrained per request
+            prophet_df = data[['date', 'net']].rename(columns={'date': 'ds', 'net': 'y'})
+            modes = []
+            for kind, build in (('baseline', service.baseline.build_model), ('hybrid', service.hybrid.build_prophet)):
+                _, fit_info = service.registry.fit((business_id, kind), prophet_df, build)
+                totals[fit_info['mode']] += 1
+                fit_seconds += fit_info['duration_s']
+                modes.append(f"{kind} {fit_info['mode']} {fit_info['duration_s']}s")
+            print(f"  business {business_id}: {', '.join(modes)}")
+
+        print(f"✅ {len(business_ids)} businesses in {time.perf_counter() - started:.1f}s "
+              f"(fitting {fit_seconds:.1f}s): {totals}")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prophet model registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("refit", help="Refit every business where drift or age requires it")
+    sub.add_parser("status", help="Show stored models and their last fits")
+    args = parser.parse_args()
+
+    if args.command == "refit":
+        refit_all()
+    else:
+        for row in ModelRegistry().status():
+            last = row['refits'][-1] if row['refits'] else {}
+            print(f"{row['key']}: fitted {row['fitted_at']}, last fit {last.get('mode')} "
+                  f"in {last.get('duration_s')}s, drift {last.get('drift_ratio')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Precomputed forecast snapshots
+
+The worker (python -m app.worker) writes a ForecastSnapshot per business and
+horizon during off-peak hours. Request handlers serve the snapshot while its
+watermark still matches the business's transaction data and the model version,
+and only compute on demand (storing the result) when it doesn't.
+
+Rendered responses are also kept in the shared cache (app.cache), keyed by
+business, horizon, mode, variant and version, so repeat views skip both the
+snapshot read and JSON encoding - in every worker, not just the one that rendered.
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import models
+from app.cache import get_cache
+from app.database import SessionLocal
+
+# Don't write last_accessed_at more than once per interval per business
+ACCESS_TOUCH_INTERVAL_SECONDS = int(os.getenv("ACCESS_TOUCH_INTERVAL_SECONDS", "300"))
+# Rendered forecast responses stay in the shared cache this long
+FORECAST_CACHE_TTL = int(os.getenv("FORECAST_CACHE_TTL", "86400"))
+# Bump when forecast models or the payload layout change - invalidates snapshots and ETags
+FORECAST_MODEL_VERSION = 2
+
+_last_touch = {}
+_last_touch_lock = threading.Lock()
+
+
+def data_watermark(db: Session, business_id: int) -> str:
+    """Version of a business's transaction data - changes on every write
+
+    The latest change_log sequence for the business: every ORM insert, update and
+    delete is logged, and so are bulk loads (app.data_generator) and raw-SQL
+    deletes (app.partitions). One probe of ix_change_log_business_entity_seq, so
+    a conditional GET costs the same for a year of history as for a day.
+    """
+    last_change = db.query(func.max(models.ChangeLog.id)).filter(
+        models.ChangeLog.business_id == business_id,
+        models.ChangeLog.entity == "transactions"
+    ).scalar()
+    return f"c{last_change or 0}"
+
+
+def snapshot_version(db: Session, business_id: int) -> str:
+    """Data watermark plus model version - what a stored forecast must match to be served"""
+    return f"{data_watermark(db, business_id)}.m{FORECAST_MODEL_VERSION}"
+
+
+def forecast_etag(business_id: int, horizon: int, mode: str, variant: str, version: str) -> str:
+    """Strong ETag for one rendering of a forecast version"""
+    digest = hashlib.sha1(f"{business_id}:{horizon}:{mode}:{variant}:{version}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def response_cache_key(business_id: int, horizon: int, mode: str, variant: str, version: str) -> str:
+    return get_cache().business_key(business_id, "forecast", horizon, mode, variant, version)
+
+
+def cached_response(business_id: int, horizon: int, mode: str, variant: str, version: str, render):
+    """Rendered response for this version from the shared cache, rendering it at most once
+
+    `render` returns a dict with 'body' and 'computed_at', or an error payload
+    (containing 'error') that is passed through without being cached.
+    Returns (rendered, hit).
+    """
+    cache = get_cache()
+    key = response_cache_key(business_id, horizon, mode, variant, version)
+    rendered = cache.get(key)
+    if rendered is not None:
+        return rendered, True
+    # Single-flight: concurrent requests for the same forecast wait for one computation
+    rendered = cache.get_or_compute(key, render, ttl=FORECAST_CACHE_TTL,
+                                    cache_if=lambda value: 'error' not in value)
+    return rendered, False
+
+
+def get_snapshot(db: Session, business_id: int, horizon: int, mode: str):
+    return db.query(models.ForecastSnapshot).filter(
+        models.ForecastSnapshot.business_id == business_id,
+        models.ForecastSnapshot.horizon == horizon,
+        models.ForecastSnapshot.mode == mode
+    ).first()
+
+
+def save_snapshot(db: Session, business_id: int, horizon: int, mode: str,
+                  watermark: str, payload: dict, duration_s: float = None):
+    """Insert or update the snapshot for (business, horizon, mode)"""
+    values = {
+        'watermark': watermark,
+        'payload': payload,
+        'duration_s': duration_s,
+        'computed_at': datetime.utcnow()
+    }
+    snapshot = get_snapshot(db, business_id, horizon, mode)
+    if snapshot is None:
+        snapshot = models.ForecastSnapshot(business_id=business_id, horizon=horizon, mode=mode, **values)
+        db.add(snapshot)
+    else:
+        for key, value in values.items():
+            setattr(snapshot, key, value)
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request or the worker inserted it first - update theirs
+        db.rollback()
+        snapshot = get_snapshot(db, business_id, horizon, mode)
+        for key, value in values.items():
+            setattr(snapshot, key, value)
+        db.commit()
+    return snapshot
+
+
+def cached_forecast(db: Session, business_id: int, horizon: int, mode: str, compute, version: str = None):
+    """Serve the precomputed forecast if it is current, otherwise compute and store it
+
+    `compute` is a zero-argument callable returning the forecast payload.
+    Returns (payload, source) with source 'precomputed' or 'on_demand'. The payload
+    only depends on the stored snapshot, so equal versions render identically.
+    `db` may be a replica session - a computed snapshot is stored through its own
+    short primary session.
+    """
+    version = version or snapshot_version(db, business_id)
+    snapshot = get_snapshot(db, business_id, horizon, mode)
+
+    if snapshot is not None and snapshot.watermark == version:
+        return snapshot_payload(snapshot, version), 'precomputed'
+
+    started = time.perf_counter()
+    payload = compute()
+    # Errors (e.g. insufficient data) are cheap to recompute and must not stick
+    if 'error' in payload:
+        return payload, 'on_demand'
+    with SessionLocal() as primary:
+        snapshot = save_snapshot(primary, business_id, horizon, mode, version, payload,
+                                 time.perf_counter() - started)
+        return snapshot_payload(snapshot, version), 'on_demand'
+
+
+def snapshot_payload(snapshot, version: str) -> dict:
+    return {
+        **snapshot.payload,
+        'snapshot': {
+            'watermark': version,
+            'computed_at': snapshot.computed_at.isoformat() if snapshot.computed_at else None
+        }
+    }
+
+
+def touch_access(business_id: int):
+    """Record that a user looked at this business - the worker precomputes recent ones first
+
+    Written in its own short primary session, so read-only routes keep their
+    replica session and the caller isn't pinned to the primary for a page view.
+    """
+    now = time.monotonic()
+    with _last_touch_lock:
+        if now - _last_touch.get(business_id, float('-inf')) < ACCESS_TOUCH_INTERVAL_SECONDS:
+            return
+        _last_touch[business_id] = now
+
+    with SessionLocal() as db:
+        activity = db.query(models.BusinessActivity).filter(
+            models.BusinessActivity.business_id == business_id
+        ).first()
+        if activity is None:
+            db.add(models.BusinessActivity(business_id=business_id, last_accessed_at=datetime.utcnow()))
+        else:
+            activity.last_accessed_at = datetime.utcnow()
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -43,7 +43,11 @@ class Business(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
-    __table_args__ = {'extend_existing': True}
+    # (business_id, created_at) serves every per-business date-window query
+    __table_args__ = (
+        Index("ix_transactions_business_created", "business_id", "created_at"),
+        {'extend_existing': True}
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Float, nullable=False)
@@ -180,3 +184,133 @@ class CreditScore(Base):
 
     def __repr__(self):
         return f"<CreditScore {self.smartpesa_score} for Business {self.business_id}>"
+
+
+class ForecastSnapshot(Base):
+    __tablename__ = "forecast_snapshots"
+    # One precomputed forecast per business, horizon and requested mode
+    __table_args__ = (
+        UniqueConstraint("business_id", "horizon", "mode", name="uq_forecast_snapshot"),
+        {'extend_existing': True}
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id", ondelete="CASCADE"), nullable=False, index=True)
+    horizon = Column(Integer, nullable=False)  # days_forward
+    mode = Column(String, nullable=False)  # auto, fast or hybrid
+    watermark = Column(String, nullable=False)  # transaction data + model version the payload was computed from
+    payload = Column(JSON, nullable=False)
+    duration_s = Column(Float)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ForecastSnapshot {self.business_id} {self.horizon}d {self.mode}>"
+
+
+class BusinessActivity(Base):
+    __tablename__ = "business_activity"
+    __table_args__ = {'extend_existing': True}
+
+    business_id = Column(Integer, ForeignKey("businesses.id", ondelete="CASCADE"), primary_key=True)
+    last_accessed_at = Column(DateTime(timezone=True))  # last forecast / credit read - precompute priority
+    last_precomputed_at = Column(DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"<BusinessActivity {self.business_id}>"
+
+
+class MpesaAccount(Base):
+    __tablename__ = "mpesa_accounts"
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    shortcode = Column(String, unique=True, index=True, nullable=False)  # Paybill / till number
+    business_id = Column(Integer, ForeignKey("businesses.id", ondelete="CASCADE"), nullable=False, index=True)
+    category = Column(String, nullable=False, default="Sales")  # category for incoming payments
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<MpesaAccount {self.shortcode} -> {self.business_id}>"
+
+
+class MpesaCallback(Base):
+    __tablename__ = "mpesa_callbacks"
+    # Durable inbox - raw payloads as received, consumed in id order by app.mpesa
+    __table_args__ = (
+        Index("ix_mpesa_callbacks_status_id", "status", "id"),
+        {'extend_existing': True}
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    shortcode = Column(String, index=True)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, processed, duplicate, rejected, unmatched, invalid, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String)
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="SET NULL"))
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"<MpesaCallback {self.id} {self.status}>"
+
+
+class MpesaPayment(Base):
+    __tablename__ = "mpesa_payments"
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    receipt_number = Column(String, unique=True, index=True, nullable=False)  # de-duplication key
+    business_id = Column(Integer, ForeignKey("businesses.id", ondelete="CASCADE"), nullable=False)
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="SET NULL"))
+    callback_id = Column(Integer, ForeignKey("mpesa_callbacks.id", ondelete="SET NULL"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<MpesaPayment {self.receipt_number}>"
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    # A retried POST /transactions/ with the same key returns the stored response
+    __table_args__ = (
+        UniqueConstraint("business_id", "key", name="uq_idempotency_business_key"),
+        {'extend_existing': True}
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    fingerprint = Column(String, nullable=False)  # hash of the request body the key was first used with
+    status_code = Column(Integer, nullable=False)
+    response = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.business_id}:{self.key}>"
+
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    # Append-only change sequence for delta sync (app.sync) - id is the client's cursor
+    __table_args__ = (
+        Index("ix_change_log_business_entity_seq", "business_id", "entity", "id"),
+        Index("ix_change_log_entity_row", "entity", "entity_id"),
+        {'extend_existing': True}
+    )
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # transactions, inventory, suppliers
+    entity_id = Column(Integer, nullable=False)
+    business_id = Column(Integer, nullable=False)  # no FK - tombstones outlive their rows
+    op = Column(String, nullable=False)  # upsert or delete
+    changed_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<ChangeLog {self.id} {self.op} {self.entity}:{self.entity_id}>"
+
+
+# Every ORM write to a synced table appends to change_log
+import app.sync  # noqa: E402,F401
@@ -0,0 +1,329 @@
+# app/mpesa.py
+"""
+M-Pesa callback ingestion
+
+POST /webhooks/mpesa only appends the raw payload to the mpesa_callbacks inbox
+and acknowledges. This module drains the inbox in batches:
+
+    - parses C2B confirmations and STK push callbacks
+    - maps the paybill/till shortcode to a business through mpesa_accounts
+    - skips receipts already recorded in mpesa_payments (retried callbacks)
+    - bulk-inserts the new payments as income transactions
+
+Callbacks that can't be matched to a business stay in the inbox as
+"unmatched" and are requeued when the shortcode is registered. Anything else
+can be requeued with `replay` - receipts are de-duplicated, so replays are safe.
+
+    python -m app.mpesa consume              # run the consumer loop
+    python -m app.mpesa consume --once       # drain the inbox and exit
+    python -m app.mpesa replay --status failed unmatched
+    python -m app.mpesa stats
+    python -m app.mpesa purge --days 30
+
+Run one consumer per deployment with `consume`. MPESA_CONSUMER_IN_PROCESS=true runs it
+inside the API instead - only for a single-worker server, or each worker starts one.
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+from app.database import SessionLocal
+from app import models
+
+MPESA_BATCH_SIZE = int(os.getenv("MPESA_BATCH_SIZE", "500"))
+# Idle consumer checks the inbox this often
+MPESA_POLL_SECONDS = float(os.getenv("MPESA_POLL_SECONDS", "0.5"))
+# A batch that fails this many times marks its callbacks failed (replayable)
+MPESA_MAX_ATTEMPTS = int(os.getenv("MPESA_MAX_ATTEMPTS", "3"))
+
+# Daraja reports times in Kenyan local time (EAT, UTC+3 all year)
+NAIROBI = timezone(timedelta(hours=3))
+
+# Final states that `replay` may move back to pending by default
+REPLAYABLE_STATUSES = ("failed", "unmatched", "invalid")
+
+
+class InvalidCallback(ValueError):
+    pass
+
+
+def parse_time(value) -> datetime:
+    """Daraja timestamps are YYYYMMDDHHMMSS (string or number, Nairobi time) - returned Nairobi-aware"""
+    try:
+        return datetime.strptime(str(value), "%Y%m%d%H%M%S").replace(tzinfo=NAIROBI)
+    except ValueError:
+        raise InvalidCallback(f"Bad transaction time: {value!r}")
+
+
+def parse_callback(payload: dict, shortcode: str = None):
+    """Payment fields from a C2B confirmation or STK callback
+
+    Returns None for STK callbacks of payments that didn't go through
+    (cancelled, timed out, insufficient funds).
+    """
+    if not isinstance(payload, dict):
+        raise InvalidCallback("Payload is not an object")
+
+    stk = (payload.get("Body") or {}).get("stkCallback")
+    if stk is not None:
+        if stk.get("ResultCode") not in (0, "0"):
+            return None
+        items = {item.get("Name"): item.get("Value")
+                 for item in (stk.get("CallbackMetadata") or {}).get("Item", [])}
+        receipt, amount, when = items.get("MpesaReceiptNumber"), items.get("Amount"), items.get("TransactionDate")
+        reference = stk.get("CheckoutRequestID")
+    else:
+        receipt, amount, when = payload.get("TransID"), payload.get("TransAmount"), payload.get("TransTime")
+        shortcode = payload.get("BusinessShortCode") or shortcode
+        reference = payload.get("BillRefNumber")
+
+    if not receipt or amount is None or when is None:
+        raise InvalidCallback("Missing receipt number, amount or time")
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise InvalidCallback(f"Bad amount: {amount!r}")
+    if amount <= 0:
+        raise InvalidCallback(f"Non-positive amount: {amount}")
+
+    return {
+        'receipt': str(receipt),
+        'amount': amount,
+        'occurred_at': parse_time(when),
+        'shortcode': str(shortcode) if shortcode else None,
+        'reference': reference,
+    }
+
+
+def process_batch(db, limit: int = MPESA_BATCH_SIZE, callback_ids=None) -> dict:
+    """Consume up to `limit` pending callbacks (or just `callback_ids`) in one database transaction
+
+    If the batch fails, its callbacks are retried one per transaction, so a
+    single bad callback can't hold back - or exhaust the attempts of - the rest.
+    """
+    counts = {'processed': 0, 'duplicate': 0, 'rejected': 0, 'unmatched': 0, 'invalid': 0, 'failed': 0}
+    query = db.query(models.MpesaCallback).filter(models.MpesaCallback.status == "pending")
+    if callback_ids is not None:
+        query = query.filter(models.MpesaCallback.id.in_(callback_ids))
+    rows = query.order_by(
+        models.MpesaCallback.id
+    ).limit(limit).with_for_update(skip_locked=True).all()
+    if not rows:
+        return counts
+    ids = [row.id for row in rows]
+
+    try:
+        now = datetime.utcnow()
+        parsed = {}
+        for row in rows:
+            try:
+                payment = parse_callback(row.payload, row.shortcode)
+            except InvalidCallback as e:
+                row.status, row.error, row.processed_at = "invalid", str(e), now
+                continue
+            if payment is None:
+                row.status, row.processed_at = "rejected", now
+                continue
+            parsed[row.id] = payment
+
+        shortcodes = {p['shortcode'] for p in parsed.values() if p['shortcode']}
+        accounts = {
+            a.shortcode: a for a in db.query(models.MpesaAccount).filter(
+                models.MpesaAccount.shortcode.in_(shortcodes)
+            )
+        } if shortcodes else {}
+        receipts = {p['receipt'] for p in parsed.values()}
+        seen = dict(db.query(
+            models.MpesaPayment.receipt_number, models.MpesaPayment.transaction_id
+        ).filter(models.MpesaPayment.receipt_number.in_(receipts)).all()) if receipts else {}
+
+        new, repeated, created = [], [], {}
+        for row in rows:
+            payment = parsed.get(row.id)
+            if payment is None:
+                continue
+            account = accounts.get(payment['shortcode'])
+            if account is None:
+                row.status = "unmatched"
+                row.error = f"No business registered for shortcode {payment['shortcode']}"
+                continue
+            if payment['receipt'] in seen:
+                # Retried callback
+                row.status, row.transaction_id, row.processed_at = "duplicate", seen[payment['receipt']], now
+                continue
+            if payment['receipt'] in created:
+                # Same receipt twice within this batch
+                row.status, row.processed_at = "duplicate", now
+                repeated.append((row, payment['receipt']))
+                continue
+            transaction = models.Transaction(
+                amount=payment['amount'],
+                type="income",
+                category=account.category,
+                # The forecasting pipeline reads the transaction date from the description -
+                # the local business day the customer paid on
+                description=f"M-Pesa {payment['receipt']} ({payment['reference'] or 'no reference'})"
+                            f" - {payment['occurred_at']:%Y-%m-%d}",
+                business_id=account.business_id,
+                # Stored naive UTC, like every other created_at
+                created_at=payment['occurred_at'].astimezone(timezone.utc).replace(tzinfo=None),
+            )
+            created[payment['receipt']] = transaction
+            new.append((row, payment, account, transaction))
+
+        db.add_all([transaction for _, _, _, transaction in new])
+        db.flush()
+        db.add_all([
+            models.MpesaPayment(receipt_number=payment['receipt'], business_id=account.business_id,
+                                transaction_id=transaction.id, callback_id=row.id)
+            for row, payment, account, transaction in new
+        ])
+        for row, _, _, transaction in new:
+            row.status, row.transaction_id, row.processed_at, row.error = "processed", transaction.id, now, None
+        for row, receipt in repeated:
+            row.transaction_id = created[receipt].id
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        if len(ids) > 1:
+            print(f"⚠️ M-Pesa batch of {len(ids)} failed ({e}) - retrying one callback at a time")
+            for callback_id in ids:
+                for status, count in process_batch(db, callback_ids=[callback_id]).items():
+                    counts[status] += count
+            return counts
+        # Leave the callback pending for another try, then give up on it
+        db.query(models.MpesaCallback).filter(models.MpesaCallback.id.in_(ids)).update(
+            {models.MpesaCallback.attempts: models.MpesaCallback.attempts + 1,
+             models.MpesaCallback.error: str(e)[:500]},
+            synchronize_session=False
+        )
+        exhausted = db.query(models.MpesaCallback).filter(
+            models.MpesaCallback.id.in_(ids),
+            models.MpesaCallback.attempts >= MPESA_MAX_ATTEMPTS
+        ).update({models.MpesaCallback.status: "failed"}, synchronize_session=False)
+        db.commit()
+        print(f"❌ M-Pesa callback {ids[0]} failed: {e}")
+        counts['failed'] = exhausted
+        return counts
+
+    for row in rows:
+        if row.status in counts:
+            counts[row.status] += 1
+    return counts
+
+
+def drain(db, limit: int = MPESA_BATCH_SIZE) -> dict:
+    """Process batches until no pending callbacks are left"""
+    totals = {}
+    while True:
+        counts = process_batch(db, limit)
+        for status, count in counts.items():
+            totals[status] = totals.get(status, 0) + count
+        if not any(counts.values()):
+            return totals
+
+
+def replay(db, statuses=REPLAYABLE_STATUSES, since: datetime = None, shortcode: str = None) -> int:
+    """Move finished callbacks back to pending; returns how many"""
+    query = db.query(models.MpesaCallback).filter(models.MpesaCallback.status.in_(statuses))
+    if since is not None:
+        query = query.filter(models.MpesaCallback.received_at >= since)
+    if shortcode is not None:
+        query = query.filter(models.MpesaCallback.shortcode == shortcode)
+    count = query.update(
+        {models.MpesaCallback.status: "pending", models.MpesaCallback.attempts: 0},
+        synchronize_session=False
+    )
+    db.commit()
+    return count
+
+
+def stats(db) -> dict:
+    """Callback counts by status"""
+    return dict(db.query(
+        models.MpesaCallback.status, func.count(models.MpesaCallback.id)
+    ).group_by(models.MpesaCallback.status).all())
+
+
+def purge(db, older_than_days: int) -> int:
+    """Delete processed, duplicate and rejected callbacks older than the cutoff"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    count = db.query(models.MpesaCallback).filter(
+        models.MpesaCallback.status.in_(("processed", "duplicate", "rejected")),
+        models.MpesaCallback.received_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    return count
+
+
+def run_consumer(stop_event: threading.Event = None, batch_size: int = MPESA_BATCH_SIZE):
+    """Consume continuously - back to back while there's a backlog, polling when idle"""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        db = SessionLocal()
+        try:
+            counts = process_batch(db, batch_size)
+        except Exception as e:
+            print(f"❌ M-Pesa consumer error: {e}")
+            counts = {}
+        finally:
+            db.close()
+        if not any(counts.values()):
+            stop_event.wait(MPESA_POLL_SECONDS)
+
+
+_consumer_thread = None
+_consumer_stop = threading.Event()
+
+def start_background_consumer():
+    """Run the consumer in a daemon thread inside the API process"""
+    global _consumer_thread
+    if _consumer_thread is None:
+        _consumer_thread = threading.Thread(target=run_consumer, args=(_consumer_stop,), daemon=True, name="mpesa-consumer")
+        _consumer_thread.start()
+
+def stop_background_consumer():
+    _consumer_stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="M-Pesa callback inbox")
+    commands = parser.add_subparsers(dest="command", required=True)
+    consume = commands.add_parser("consume", help="Turn pending callbacks into transactions")
+    consume.add_argument("--once", action="store_true", help="Drain the inbox and exit")
+    consume.add_argument("--batch-size", type=int, default=MPESA_BATCH_SIZE)
+    replay_cmd = commands.add_parser("replay", help="Requeue finished callbacks")
+    replay_cmd.add_argument("--status", nargs="+", default=list(REPLAYABLE_STATUSES))
+    replay_cmd.add_argument("--since", type=datetime.fromisoformat, help="Only callbacks received since (ISO date)")
+    replay_cmd.add_argument("--shortcode")
+    commands.add_parser("stats", help="Callback counts by status")
+    purge_cmd = commands.add_parser("purge", help="Delete old finished callbacks")
+    purge_cmd.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "consume":
+            if args.once:
+                started = time.perf_counter()
+                totals = drain(db, args.batch_size)
+                print(f"✅ Inbox drained in {time.perf_counter() - started:.1f}s: {totals}")
+            else:
+                print(f"📥 M-Pesa consumer running (batch {args.batch_size})")
+                run_consumer(batch_size=args.batch_size)
+        elif args.command == "replay":
+            count = replay(db, args.status, args.since, args.shortcode)
+            print(f"🔁 Requeued {count} callbacks")
+        elif args.command == "stats":
+            for status, count in sorted(stats(db).items()):
+                print(f"  {status:<10} {count:>10,}")
+        elif args.command == "purge":
+            print(f"🧹 Deleted {purge(db, args.days)} callbacks older than {args.days} days")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+# app/partitions.py
+"""
+Time-partitioned storage for the transactions table
+
+PostgreSQL: `transactions` becomes a RANGE-partitioned table on created_at
+(one partition per month or year, plus a default partition). Queries that
+filter on created_at - every analytics, scoring and forecast query does -
+only scan the partitions inside the window.
+
+SQLite: no native partitioning, so cold rows are moved to a
+`transactions_archive` table with the same columns, and a
+`transactions_all` view unions both for full-history reporting.
+
+Archiving on either backend removes rows from `transactions` with raw SQL, so
+it logs a change_log delete for each one in the same transaction - offline
+clients (app.sync) drop them too.
+
+Every command lifts DB_STATEMENT_TIMEOUT_MS for its transactions - copying or
+moving a table legitimately outlasts a request-sized timeout.
+
+Management commands:
+    python -m app.partitions status
+    python -m app.partitions convert --interval month      # PostgreSQL, one-off
+    python -m app.partitions roll --ahead 3                # PostgreSQL, create upcoming partitions
+    python -m app.partitions archive --older-than-days 730 # both backends
+"""
+import argparse
+import os
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from app.database import engine
+from app.db_config import no_statement_timeout
+from app.sync import log_deletes
+
+PARENT_TABLE = "transactions"
+LEGACY_TABLE = "transactions_legacy"
+DEFAULT_PARTITION = "transactions_default"
+ARCHIVE_TABLE = "transactions_archive"
+ARCHIVE_VIEW = "transactions_all"
+ARCHIVE_SCHEMA = "archive"
+
+PARTITION_INTERVAL = os.getenv("TRANSACTION_PARTITION_INTERVAL", "month")
+ARCHIVE_BATCH_SIZE = int(os.getenv("TRANSACTION_ARCHIVE_BATCH_SIZE", "10000"))
+
+
+# ---------------------------------------------------------------------------
+# Period helpers
+
+def period_start(d: date, interval: str) -> date:
+    if interval == "year":
+        return date(d.year, 1, 1)
+    return date(d.year, d.month, 1)
+
+def next_period(d: date, interval: str) -> date:
+    if interval == "year":
+        return date(d.year + 1, 1, 1)
+    if d.month == 12:
+        return date(d.year + 1, 1, 1)
+    return date(d.year, d.month + 1, 1)
+
+def partition_name(start: date, interval: str) -> str:
+    if interval == "year":
+        return f"{PARENT_TABLE}_p{start.year}"
+    return f"{PARENT_TABLE}_p{start.year}_{start.month:02d}"
+
+def parse_partition_name(name: str):
+    """Return (start, end) for a partition created by this module, else None"""
+    suffix = name[len(PARENT_TABLE) + 2:] if name.startswith(f"{PARENT_TABLE}_p") else ""
+    parts = suffix.split("_")
+    try:
+        if len(parts) == 1:
+            start = date(int(parts[0]), 1, 1)
+            return start, next_period(start, "year")
+        if len(parts) == 2:
+            start = date(int(parts[0]), int(parts[1]), 1)
+            return start, next_period(start, "month")
+    except ValueError:
+        pass
+    return None
+
+
+# ---------------------------------------------------------------------------
+# PostgreSQL
+
+def is_postgres() -> bool:
+    return engine.url.get_backend_name() == "postgresql"
+
+def is_partitioned(conn) -> bool:
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name AND relnamespace = 'public'::regnamespace"),
+        {"name": PARENT_TABLE}
+    ).scalar()
+    return relkind == "p"
+
+def list_partitions(conn):
+    return [
+        row.name for row in conn.execute(text("""
+            SELECT c.relname AS name
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = :parent
+            ORDER BY c.relname
+        """), {"parent": PARENT_TABLE})
+    ]
+
+def create_partition(conn, start: date, interval: str) -> str:
+    name = partition_name(start, interval)
+    end = next_period(start, interval)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    return name
+
+def referencing_foreign_keys(conn):
+    """(table, constraint) of every foreign key pointing at transactions"""
+    return conn.execute(text(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        f"WHERE contype = 'f' AND confrelid = '{PARENT_TABLE}'::regclass"
+    )).all()
+
+def convert_to_partitioned(interval: str, ahead: int, keep_legacy: bool):
+    """Rebuild transactions as a RANGE-partitioned table and copy the rows across"""
+    with engine.begin() as conn, no_statement_timeout(conn):
+        if is_partitioned(conn):
+            print("ℹ️  transactions is already partitioned")
+            return
+
+        bounds = conn.execute(text(f"SELECT min(created_at), max(created_at) FROM {PARENT_TABLE}")).first()
+        today = datetime.utcnow().date()
+        first = period_start((bounds[0] or datetime.utcnow()).date(), interval)
+        last = period_start(max((bounds[1] or datetime.utcnow()).date(), today), interval)
+
+        # The partition key must be part of every unique constraint, so the
+        # primary key becomes (id, created_at) and single-column foreign keys to
+        # transactions.id (supplier_payments, mpesa_callbacks, mpesa_payments)
+        # can no longer be enforced. Drop them all - left in place they would
+        # block dropping the legacy table, or keep pointing at it.
+        for table, constraint in referencing_foreign_keys(conn):
+            conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"'))
+        conn.execute(text(f"UPDATE {PARENT_TABLE} SET created_at = now() WHERE created_at IS NULL"))
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_TABLE}"))
+        conn.execute(text(f"ALTER SEQUENCE IF EXISTS {PARENT_TABLE}_id_seq OWNED BY NONE"))
+
+        conn.execute(text(
+            f"CREATE TABLE {PARENT_TABLE} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE (created_at)"
+        ))
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ALTER COLUMN created_at SET NOT NULL"))
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ADD PRIMARY KEY (id, created_at)"))
+        conn.execute(text(
+            f"ALTER TABLE {PARENT_TABLE} ADD FOREIGN KEY (business_id) "
+            f"REFERENCES businesses (id) ON DELETE CASCADE"
+        ))
+        conn.execute(text(f"ALTER SEQUENCE IF EXISTS {PARENT_TABLE}_id_seq OWNED BY {PARENT_TABLE}.id"))
+        conn.execute(text(f"CREATE INDEX ix_transactions_business_created ON {PARENT_TABLE} (business_id, created_at)"))
+        conn.execute(text(f"CREATE INDEX ix_transactions_id ON {PARENT_TABLE} (id)"))
+
+        # One partition per period from the oldest row up to `ahead` periods in the future
+        start, created = first, 0
+        for _ in range(ahead):
+            last = next_period(last, interval)
+        while start <= last:
+            create_partition(conn, start, interval)
+            start = next_period(start, interval)
+            created += 1
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+
+        copied = conn.execute(text(f"INSERT INTO {PARENT_TABLE} SELECT * FROM {LEGACY_TABLE}")).rowcount
+        if not keep_legacy:
+            conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+
+    print(f"✅ Partitioned transactions by {interval}: {created} partitions, {copied} rows copied")
+
+def roll_partitions(interval: str, ahead: int):
+    """Make sure partitions exist for the current period and the next `ahead` periods"""
+    with engine.begin() as conn, no_statement_timeout(conn):
+        if not is_partitioned(conn):
+            print("❌ transactions is not partitioned - run `convert` first")
+            return
+        start = period_start(datetime.utcnow().date(), interval)
+        for _ in range(ahead + 1):
+            print(f"✅ {create_partition(conn, start, interval)}")
+            start = next_period(start, interval)
+
+def archive_partitions(cutoff: date, drop: bool):
+    """Detach partitions that end before the cutoff; move them to the archive schema or drop them"""
+    with engine.begin() as conn, no_statement_timeout(conn):
+        if not is_partitioned(conn):
+            print("❌ transactions is not partitioned - run `convert` first")
+            return
+        if not drop:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+        for name in list_partitions(conn):
+            bounds = parse_partition_name(name)
+            if not bounds or bounds[1] > cutoff:
+                continue
+            log_deletes(conn, "transactions", name)
+            conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            if drop:
+                conn.execute(text(f"DROP TABLE {name}"))
+                print(f"🗑️  Dropped {name}")
+            else:
+                conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+                print(f"📦 Archived {name} -> {ARCHIVE_SCHEMA}.{name}")
+
+
+# ---------------------------------------------------------------------------
+# SQLite
+
+def archive_rows(cutoff: date, batch_size: int = ARCHIVE_BATCH_SIZE):
+    """Move rows older than the cutoff into transactions_archive, in batches"""
+    cutoff_dt = datetime.combine(cutoff, datetime.min.time())
+    moved = 0
+    with engine.begin() as conn, no_statement_timeout(conn):
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} AS SELECT * FROM {PARENT_TABLE} WHERE 0"
+        ))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{ARCHIVE_TABLE}_business_created "
+            f"ON {ARCHIVE_TABLE} (business_id, created_at)"
+        ))
+        conn.execute(text(
+            f"CREATE VIEW IF NOT EXISTS {ARCHIVE_VIEW} AS "
+            f"SELECT * FROM {PARENT_TABLE} UNION ALL SELECT * FROM {ARCHIVE_TABLE}"
+        ))
+
+    while True:
+        # One short transaction per batch so writers are never blocked for long
+        with engine.begin() as conn, no_statement_timeout(conn):
+            ids = [row[0] for row in conn.execute(text(
+                f"SELECT id FROM {PARENT_TABLE} WHERE created_at < :cutoff ORDER BY id LIMIT :batch"
+            ), {"cutoff": cutoff_dt, "batch": batch_size})]
+            if not ids:
+                break
+            params = {"first": ids[0], "last": ids[-1], "cutoff": cutoff_dt}
+            where = "id BETWEEN :first AND :last AND created_at < :cutoff"
+            conn.execute(text(f"INSERT INTO {ARCHIVE_TABLE} SELECT * FROM {PARENT_TABLE} WHERE {where}"), params)
+            log_deletes(conn, "transactions", PARENT_TABLE, where, params)
+            moved += conn.execute(text(f"DELETE FROM {PARENT_TABLE} WHERE {where}"), params).rowcount
+
+    print(f"📦 Archived {moved} transactions older than {cutoff.isoformat()} into {ARCHIVE_TABLE}")
+
+
+# ---------------------------------------------------------------------------
+# Commands
+
+def ensure_indexes():
+    """Databases created before the composite index existed need it added once"""
+    with engine.begin() as conn, no_statement_timeout(conn):
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_transactions_business_created "
+            f"ON {PARENT_TABLE} (business_id, created_at)"
+        ))
+
+def status():
+    with engine.connect() as conn, no_statement_timeout(conn):
+        if is_postgres():
+            if not is_partitioned(conn):
+                print("transactions: plain table (not partitioned)")
+                return
+            print("transactions: partitioned by RANGE (created_at)")
+            for name in list_partitions(conn):
+                rows = conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+                print(f"  {name}: {rows} rows")
+        else:
+            live = conn.execute(text(f"SELECT count(*) FROM {PARENT_TABLE}")).scalar()
+            has_archive = conn.execute(text(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {"name": ARCHIVE_TABLE}).scalar()
+            archived = conn.execute(text(f"SELECT count(*) FROM {ARCHIVE_TABLE}")).scalar() if has_archive else 0
+            print(f"{PARENT_TABLE}: {live} rows")
+            print(f"{ARCHIVE_TABLE}: {archived} rows")
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage time-partitioned transactions storage")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("status", help="Show partitions / archive row counts")
+
+    convert = sub.add_parser("convert", help="PostgreSQL: convert transactions to a partitioned table")
+    convert.add_argument("--interval", choices=["month", "year"], default=PARTITION_INTERVAL)
+    convert.add_argument("--ahead", type=int, default=3, help="Future periods to pre-create")
+    convert.add_argument("--keep-legacy", action="store_true", help=f"Keep {LEGACY_TABLE} after copying")
+
+    roll = sub.add_parser("roll", help="PostgreSQL: create partitions for upcoming periods")
+    roll.add_argument("--interval", choices=["month", "year"], default=PARTITION_INTERVAL)
+    roll.add_argument("--ahead", type=int, default=3)
+
+    archive = sub.add_parser("archive", help="Move cold data out of the live table")
+    archive.add_argument("--older-than-days", type=int, default=730)
+    archive.add_argument("--drop", action="store_true", help="PostgreSQL: drop instead of archiving")
+
+    args = parser.parse_args()
+
+    if args.command != "convert":
+        ensure_indexes()
+
+    if args.command == "status":
+        status()
+    elif args.command in ("convert", "roll") and not is_postgres():
+        print("❌ Range partitioning needs PostgreSQL - on SQLite use `archive`")
+    elif args.command == "convert":
+        convert_to_partitioned(args.interval, args.ahead, args.keep_legacy)
+    elif args.command == "roll":
+        roll_partitions(args.interval, args.ahead)
+    elif args.command == "archive":
+        cutoff = datetime.utcnow().date() - timedelta(days=args.older_than_days)
+        if is_postgres():
+            archive_partitions(cutoff, args.drop)
+        else:
+            archive_rows(cutoff)
+
+if __name__ == "__main__":
+    main()
@@ -1,96 +1,120 @@
 # app/routes/businesses.py
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
 from app import models, schemas, auth
-from app.database import get_db
+from app.database import get_async_db
+from app.cache import get_cache
 
 router = APIRouter(prefix="/businesses", tags=["businesses"])
 
 # Get current user dependency
-def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Depends(get_db)):
-    return auth.get_current_user(token, db)
+async def get_current_user(token: str = Depends(auth.oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await auth.get_current_user_async(token, db)
+
+# Load a business owned by the user (transactions eager-loaded for the response model)
+async def get_owned_business(db: AsyncSession, business_id: int, owner_id: int):
+    result = await db.execute(
+        select(models.Business).options(
+            selectinload(models.Business.transactions)
+        ).filter(
+            models.Business.id == business_id,
+            models.Business.owner_id == owner_id
+        )
+    )
+    return result.scalars().first()
 
 # Create business
 @router.post("/", response_model=schemas.Business)
-def create_business(
+async def create_business(
     business: schemas.BusinessCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     db_business = models.Business(**business.dict(), owner_id=current_user.id)
     db.add(db_business)
-    db.commit()
-    db.refresh(db_business)
+    await db.commit()
+    await db.refresh(db_business, ["id", "name", "owner_id", "created_at", "transactions"])
     return db_business
 
 # Get all businesses for current user
 @router.get("/", response_model=List[schemas.Business])
-def get_businesses(
+async def get_businesses(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    businesses = db.query(models.Business).filter(
-        models.Business.owner_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return businesses
+    result = await db.execute(
+        select(models.Business).options(
+            selectinload(models.Business.transactions)
+        ).filter(
+            models.Business.owner_id == current_user.id
+        ).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
 
 # Get single business
 @router.get("/{business_id}", response_model=schemas.Business)
-def get_business(
+async def get_business(
     business_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    business = db.query(models.Business).filter(
-        models.Business.id == business_id,
-        models.Business.owner_id == current_user.id
-    ).first()
-    
+    business = await get_owned_business(db, business_id, current_user.id)
+
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     return business
 
 # Update business
 @router.put("/{business_id}", response_model=schemas.Business)
-def update_business(
+async def update_business(
     business_id: int,
     business_update: schemas.BusinessUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    business = db.query(models.Business).filter(
-        models.Business.id == business_id,
-        models.Business.owner_id == current_user.id
-    ).first()
-    
+    business = await get_owned_business(db, business_id, current_user.id)
+
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
-    
+
     for key, value in business_update.dict(exclude_unset=True).items():
         setattr(business, key, value)
-    
-    db.commit()
-    db.refresh(business)
+
+    await db.commit()
+    await db.refresh(business, ["id", "name", "owner_id", "created_at", "transactions"])
     return business
 
 # Delete business
 @router.delete("/{business_id}")
-def delete_business(
+async def delete_business(
     business_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    business = db.query(models.Business).filter(
-        models.Business.id == business_id,
-        models.Business.owner_id == current_user.id
-    ).first()
-    
+    # ORM cascades need every child collection loaded up front (no lazy loads on AsyncSession)
+    result = await db.execute(
+        select(models.Business).options(
+            selectinload(models.Business.transactions),
+            selectinload(models.Business.inventory).selectinload(models.Inventory.transactions),
+            selectinload(models.Business.suppliers).selectinload(models.Supplier.payments),
+            selectinload(models.Business.credit_scores)
+        ).filter(
+            models.Business.id == business_id,
+            models.Business.owner_id == current_user.id
+        )
+    )
+    business = result.scalars().first()
+
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
-    
-    db.delete(business)
-    db.commit()
-    return {"message": "Business deleted successfully"}
\ No newline at end of file
+
+    await db.delete(business)
+    await db.commit()
+    # Ids can be reused (SQLite) - drop anything cached under this one
+    get_cache().invalidate_business(business_id)
+    return {"message": "Business deleted successfully"}
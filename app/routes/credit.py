@@ -2,10 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
-from app.database import get_db
-from app import auth, models
+from app.database import get_db, get_primary_db, get_read_db
+from app import auth, models, fast_json
 from app.schemas import credit as schemas
-from app.credit.scoring import CreditScoringEngine
+from app.ml.snapshots import touch_access
+from app.middleware.rate_limit import rate_limit
+from app.middleware.admission import admission, admitted
 
 router = APIRouter(prefix="/credit", tags=["credit"])
 
@@ -14,10 +16,12 @@ def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Dep
 
 # Get current credit score for a business
 @router.get("/business/{business_id}", response_model=schemas.CreditScore)
+@rate_limit(cost=20)
 def get_credit_score(
     business_id: int,
     force_refresh: bool = False,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_primary_db),
+    read_db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Get the latest credit score for a business"""
@@ -33,7 +37,9 @@ def get_credit_score(
             detail="Business not found"
         )
     
-    # Check for existing valid score (less than 30 days old)
+    touch_access(business_id)
+    
+    # Check for existing valid score (less than 30 days old) - the worker refreshes these before expiry
     if not force_refresh:
         valid_score = db.query(models.CreditScore).filter(
             models.CreditScore.business_id == business_id,
@@ -43,9 +49,12 @@ def get_credit_score(
         if valid_score:
             return valid_score
     
-    # Calculate new score
-    engine = CreditScoringEngine(db)
-    new_score = engine.calculate_credit_score(business_id, current_user.id)
+    # Calculate new score (aggregate reads from the replica, insert on the primary) -
+    # only the scoring takes a "credit" slot, a stored score is served without one
+    from app.credit.scoring import CreditScoringEngine
+    engine = CreditScoringEngine(db, read_db)
+    with admitted("credit"):
+        new_score = engine.calculate_credit_score(business_id, current_user.id)
     
     if not new_score:
         raise HTTPException(
@@ -84,10 +93,11 @@ def get_credit_score_history(
 
 # Lender API - Get risk profile (simulated authentication)
 @router.get("/lender/business/{business_id}", response_model=schemas.LenderRiskProfile)
+@rate_limit(cost=20)
 def get_lender_risk_profile(
     business_id: int,
     api_key: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Lender API endpoint to get risk profile for a business"""
     # Simple API key check (in production, use proper authentication)
@@ -121,8 +131,10 @@ def get_lender_risk_profile(
         )
     
     # Generate lender profile
+    from app.credit.scoring import CreditScoringEngine
     engine = CreditScoringEngine(db)
-    profile = engine.get_lender_risk_profile(business_id, credit_score)
+    with admitted("credit"):
+        profile = engine.get_lender_risk_profile(business_id, credit_score)
     
     return profile
 
@@ -133,7 +145,7 @@ def get_all_business_scores(
     max_score: Optional[int] = None,
     risk_level: Optional[str] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Lender API to get all businesses with credit scores"""
     query = db.query(
@@ -184,15 +196,20 @@ def get_all_business_scores(
             "valid_until": b.valid_until
         })
     
-    return {
+    listing = {
         "total": len(businesses),
         "businesses": businesses
     }
+    if fast_json.FAST_JSON_LISTS:
+        return fast_json.response(listing, utc_z=False)
+    return listing
 
 # Calculate credit score for all businesses (admin function)
-@router.post("/calculate-all")
+@router.post("/calculate-all", dependencies=[admission("bulk")])
+@rate_limit(cost=500)  # scores every business
 def calculate_all_scores(
     db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Calculate credit scores for all businesses belonging to the user"""
@@ -200,7 +217,8 @@ def calculate_all_scores(
         models.Business.owner_id == current_user.id
     ).all()
     
-    engine = CreditScoringEngine(db)
+    from app.credit.scoring import CreditScoringEngine
+    engine = CreditScoringEngine(db, read_db)
     results = []
     
     for business in businesses:
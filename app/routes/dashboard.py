@@ -0,0 +1,316 @@
+# app/routes/dashboard.py
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app import models, auth
+from app.database import get_async_db, use_replica, AsyncSessionLocal, AsyncReplicaSessionLocal
+from app.ml.snapshots import snapshot_version, get_snapshot
+from app.worker import PRECOMPUTE_MODE
+from app.middleware.rate_limit import rate_limit
+from app.routes.transactions import analytics_window
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+# Widget queries one request may run at once (each holds its own connection)
+DASHBOARD_PARALLEL_QUERIES = int(os.getenv("DASHBOARD_PARALLEL_QUERIES", "4"))
+# Rows returned by list widgets
+DASHBOARD_LIST_LIMIT = 20
+
+# Get current user dependency
+async def get_current_user(token: str = Depends(auth.oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await auth.get_current_user_async(token, db)
+
+
+# ----------------------------------------------------------------------
+# Widgets - each takes its own session, the business id and the window in days
+
+async def transaction_rollup(db: AsyncSession, business_id: int, days: int):
+    """summary, daily and categories from one grouped query"""
+    # Whole UTC days, so the body (and its ETag) only changes when the data does
+    start_date, end_date = analytics_window(days)
+    rows = (await db.execute(
+        select(
+            func.date(models.Transaction.created_at).label('date'),
+            models.Transaction.type,
+            models.Transaction.category,
+            func.sum(models.Transaction.amount).label('total'),
+            func.count(models.Transaction.id).label('count')
+        ).filter(
+            models.Transaction.business_id == business_id,
+            models.Transaction.created_at >= start_date,
+            models.Transaction.created_at < end_date
+        ).group_by('date', models.Transaction.type, models.Transaction.category)
+    )).all()
+
+    totals = {'income': 0, 'expense': 0}
+    counts = {'income': 0, 'expense': 0}
+    daily = defaultdict(lambda: {'income': 0, 'expense': 0})
+    categories = defaultdict(lambda: {'total': 0, 'count': 0})
+    for r in rows:
+        if r.type in totals:
+            totals[r.type] += r.total or 0
+            counts[r.type] += r.count
+            daily[str(r.date)][r.type] += r.total or 0
+        categories[r.category]['total'] += r.total or 0
+        categories[r.category]['count'] += r.count
+
+    return {
+        'summary': {
+            "period": f"Last {days} days",
+            "total_income": totals['income'],
+            "total_expense": totals['expense'],
+            "net_cashflow": totals['income'] - totals['expense'],
+            "transaction_count": sum(r.count for r in rows),
+            "income_count": counts['income'],
+            "expense_count": counts['expense'],
+            "income_expense_ratio": round(totals['income'] / totals['expense'], 2) if totals['expense'] > 0 else None
+        },
+        'daily': [
+            {"date": date, "income": t['income'], "expense": t['expense'], "net": t['income'] - t['expense']}
+            for date, t in sorted(daily.items())
+        ],
+        'categories': [
+            {"category": category, "total": c['total'], "count": c['count'],
+             "average": c['total'] / c['count'] if c['count'] else 0}
+            for category, c in sorted(categories.items(), key=lambda item: -item[1]['total'])
+        ]
+    }
+
+
+async def recent_widget(db: AsyncSession, business_id: int, days: int):
+    """Latest transactions, newest first"""
+    transactions = (await db.execute(
+        select(models.Transaction).filter(
+            models.Transaction.business_id == business_id
+        ).order_by(models.Transaction.created_at.desc(), models.Transaction.id.desc()).limit(DASHBOARD_LIST_LIMIT)
+    )).scalars().all()
+    return [
+        {"id": t.id, "created_at": t.created_at, "description": t.description,
+         "category": t.category, "amount": t.amount, "type": t.type}
+        for t in transactions
+    ]
+
+
+async def inventory_widget(db: AsyncSession, business_id: int, days: int):
+    """Item count, stock value and low-stock items"""
+    totals = (await db.execute(
+        select(
+            func.count(models.Inventory.id).label('item_count'),
+            func.coalesce(func.sum(models.Inventory.quantity * models.Inventory.price_per_unit), 0).label('stock_value')
+        ).filter(models.Inventory.business_id == business_id)
+    )).first()
+    low_stock = (await db.execute(
+        select(models.Inventory).filter(
+            models.Inventory.business_id == business_id,
+            models.Inventory.quantity <= models.Inventory.reorder_level
+        ).order_by(models.Inventory.quantity - models.Inventory.reorder_level).limit(DASHBOARD_LIST_LIMIT)
+    )).scalars().all()
+    return {
+        "item_count": totals.item_count,
+        "stock_value": totals.stock_value,
+        "low_stock": [
+            {"inventory_id": item.id, "name": item.name, "sku": item.sku,
+             "current_quantity": item.quantity, "reorder_level": item.reorder_level,
+             "deficit": item.reorder_level - item.quantity}
+            for item in low_stock
+        ]
+    }
+
+
+async def suppliers_widget(db: AsyncSession, business_id: int, days: int):
+    """Outstanding balance per supplier (one grouped query)"""
+    now = datetime.utcnow()
+    rows = (await db.execute(
+        select(
+            models.Supplier.id,
+            models.Supplier.name,
+            func.sum(models.SupplierPayment.amount).label('total'),
+            func.sum(models.SupplierPayment.amount).filter(models.SupplierPayment.due_date < now).label('overdue'),
+            func.count(models.SupplierPayment.id).label('count')
+        ).join(
+            models.SupplierPayment, models.SupplierPayment.supplier_id == models.Supplier.id
+        ).filter(
+            models.Supplier.business_id == business_id,
+            models.SupplierPayment.status == "pending"
+        ).group_by(models.Supplier.id, models.Supplier.name).order_by(func.sum(models.SupplierPayment.amount).desc())
+    )).all()
+    return {
+        "total_outstanding": sum(r.total or 0 for r in rows),
+        "overdue_total": sum(r.overdue or 0 for r in rows),
+        "by_supplier": [
+            {"supplier_id": r.id, "supplier_name": r.name, "total_outstanding": r.total or 0,
+             "overdue_amount": r.overdue or 0, "payment_count": r.count}
+            for r in rows[:DASHBOARD_LIST_LIMIT]
+        ]
+    }
+
+
+async def payments_widget(db: AsyncSession, business_id: int, days: int):
+    """Pending supplier payments, soonest due first"""
+    payments = (await db.execute(
+        select(models.SupplierPayment, models.Supplier.name).join(
+            models.Supplier, models.Supplier.id == models.SupplierPayment.supplier_id
+        ).filter(
+            models.Supplier.business_id == business_id,
+            models.SupplierPayment.status == "pending"
+        ).order_by(models.SupplierPayment.due_date).limit(DASHBOARD_LIST_LIMIT)
+    )).all()
+    now = datetime.utcnow()
+    return [
+        {"id": p.id, "supplier_id": p.supplier_id, "supplier_name": name, "amount": p.amount,
+         "due_date": p.due_date, "overdue": p.due_date.replace(tzinfo=None) < now, "notes": p.notes}
+        for p, name in payments
+    ]
+
+
+async def forecast_widget(db: AsyncSession, business_id: int, days: int):
+    """Stored 7- and 30-day forecasts - never computed here; current=False means /forecast has newer data"""
+    def read(session):
+        version = snapshot_version(session, business_id)
+        result = {}
+        for horizon in (7, 30):
+            snapshot = get_snapshot(session, business_id, horizon, PRECOMPUTE_MODE)
+            result[f"{horizon}days"] = None if snapshot is None else {
+                **snapshot.payload,
+                "computed_at": snapshot.computed_at,
+                "current": snapshot.watermark == version
+            }
+        return result
+    return await db.run_sync(read)
+
+
+async def credit_widget(db: AsyncSession, business_id: int, days: int):
+    """Latest valid credit score, if one has been calculated"""
+    score = (await db.execute(
+        select(models.CreditScore).filter(
+            models.CreditScore.business_id == business_id,
+            models.CreditScore.valid_until > datetime.utcnow()
+        ).order_by(models.CreditScore.calculation_date.desc())
+    )).scalars().first()
+    if score is None:
+        return None
+    return {
+        "smartpesa_score": score.smartpesa_score,
+        "calculation_date": score.calculation_date,
+        "valid_until": score.valid_until,
+        "components": {
+            "revenue_consistency": score.revenue_consistency_score,
+            "volatility": score.volatility_index,
+            "expense_ratio": score.expense_ratio,
+            "cash_buffer": score.cash_buffer_ratio,
+            "debt_coverage": score.debt_coverage_capacity,
+            "inventory_health": score.inventory_health_score,
+            "business_age": score.business_age_score,
+            "transaction_volume": score.transaction_volume_score
+        }
+    }
+
+
+# widget name -> loader; widgets sharing a loader are fetched once
+WIDGETS = {
+    "summary": transaction_rollup,
+    "daily": transaction_rollup,
+    "categories": transaction_rollup,
+    "recent": recent_widget,
+    "inventory": inventory_widget,
+    "suppliers": suppliers_widget,
+    "payments": payments_widget,
+    "forecast": forecast_widget,
+    "credit": credit_widget,
+}
+# Loaders that return several widgets at once
+_MULTI_WIDGET_LOADERS = {transaction_rollup}
+# Forecast payloads are large - without ?fields=forecast.x only these keys are sent
+FORECAST_DEFAULT_FIELDS = ("days_forward", "mode", "forecast_date", "risk_analysis", "computed_at", "current")
+
+
+def parse_fields(fields: Optional[str]):
+    """'summary.net_cashflow,inventory.low_stock' -> {'summary': {'net_cashflow'}, 'inventory': {'low_stock'}}"""
+    selected = defaultdict(set)
+    for item in (fields or "").split(","):
+        widget, _, field = item.strip().partition(".")
+        if widget not in WIDGETS or not field:
+            if item.strip():
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"fields entries look like widget.field, widgets: {', '.join(WIDGETS)}"
+                )
+            continue
+        selected[widget].add(field)
+    return selected
+
+
+def pick(value, keep):
+    """Keep only `keep` keys of a dict, or of each dict in a list"""
+    if isinstance(value, list):
+        return [pick(item, keep) for item in value]
+    if isinstance(value, dict):
+        return {key: item for key, item in value.items() if key in keep}
+    return value
+
+
+# Everything the dashboard shows, in one request - frontend/js/app.js renders it
+# ?widgets=summary,daily limits the widgets; ?fields=summary.net_cashflow,inventory.low_stock limits their fields
+# The body carries no request timestamp, so the body-hash ETag matches until the data changes
+@router.get("/{business_id}")
+@rate_limit(cost=5)  # several widget queries
+async def get_dashboard(
+    business_id: int,
+    request: Request,
+    days: int = Query(30, ge=1, le=366),
+    widgets: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    requested = [w.strip() for w in widgets.split(",") if w.strip()] if widgets else list(WIDGETS)
+    unknown = [w for w in requested if w not in WIDGETS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown widgets: {', '.join(unknown)}. Available: {', '.join(WIDGETS)}"
+        )
+    selected = parse_fields(fields)
+
+    # Ownership and the business switcher list in one query
+    businesses = (await db.execute(
+        select(models.Business.id, models.Business.name).filter(
+            models.Business.owner_id == current_user.id
+        ).order_by(models.Business.id)
+    )).all()
+    if not any(b.id == business_id for b in businesses):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Business not found or doesn't belong to you"
+        )
+
+    # Independent loaders run concurrently, each on its own session
+    session_factory = AsyncReplicaSessionLocal if use_replica(request) else AsyncSessionLocal
+    limiter = asyncio.Semaphore(DASHBOARD_PARALLEL_QUERIES)
+
+    async def run(loader):
+        async with limiter, session_factory() as session:
+            return await loader(session, business_id, days)
+
+    loaders = list(dict.fromkeys(WIDGETS[w] for w in requested))
+    results = dict(zip(loaders, await asyncio.gather(*(run(loader) for loader in loaders))))
+
+    document = {
+        "business_id": business_id,
+        "businesses": [{"id": b.id, "name": b.name} for b in businesses],
+    }
+    for widget in requested:
+        loader = WIDGETS[widget]
+        value = results[loader][widget] if loader in _MULTI_WIDGET_LOADERS else results[loader]
+        if widget == "forecast" and value:
+            keep = selected.get("forecast", FORECAST_DEFAULT_FIELDS)
+            value = {horizon: pick(forecast, keep) for horizon, forecast in value.items()}
+        elif widget in selected:
+            value = pick(value, selected[widget])
+        document[widget] = value
+    return document
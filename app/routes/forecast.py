@@ -1,22 +1,122 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from concurrent.futures import wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from typing import Optional
-from app.database import get_db
+import json
+from app.database import get_db, get_read_db
 from app import auth, models
-from app.ml.forecast_service import ForecastService
+from app.schemas.forecast import ForecastBatchRequest
+from app.middleware.etag import etag_matches
+from app.ml.snapshots import (
+    cached_forecast, touch_access, snapshot_version, forecast_etag, cached_response
+)
+# app.ml.forecast_service (pandas, Prophet, scikit-learn) is imported inside the
+# handlers, so workers that never forecast don't load it
+from app.ml.config import (
+    FORECAST_MODES, FORECAST_BATCH_CONCURRENCY, FORECAST_BATCH_MAX_SIZE, FAST_LATENCY_BUDGET_MS
+)
+from app.middleware.rate_limit import rate_limit
+from app.middleware.admission import admission, admitted
 
 router = APIRouter(prefix="/forecast", tags=["forecast"])
 
 def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Depends(get_db)):
     return auth.get_current_user(token, db)
 
+def validate_mode(mode: str):
+    if mode not in FORECAST_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"mode must be one of: {', '.join(FORECAST_MODES)}"
+        )
+
+def stored_mode(mode: str, latency_budget_ms: Optional[int]) -> str:
+    """Mode the forecast is stored and tagged under
+
+    A latency budget too short for Prophet turns auto into a fast forecast - keep
+    it under 'fast' so it isn't served to auto requests without a budget.
+    """
+    if mode == "auto" and latency_budget_ms is not None and latency_budget_ms < FAST_LATENCY_BUDGET_MS:
+        return "fast"
+    return mode
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: datetime) -> bool:
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return last_modified.replace(microsecond=0) <= since
+
+def conditional_forecast(request: Request, db: Session, business_id: int, horizon: int, mode: str,
+                         compute, variant: str = "forecast", render=None):
+    """Forecast response with ETag / Last-Modified, 304 when the client's copy is current
+
+    The ETag is derived from the data watermark and model version, so a match is
+    answered before any payload is loaded. Rendered bodies are kept in the shared
+    cache; `render` turns the forecast payload into this variant's body. Only an
+    actual compute takes a "forecast" admission slot.
+    """
+    version = snapshot_version(db, business_id)
+    etag = forecast_etag(business_id, horizon, mode, variant, version)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization"
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    def admitted_compute():
+        with admitted("forecast"):
+            return compute()
+
+    def build():
+        forecast, source = cached_forecast(db, business_id, horizon, mode, admitted_compute, version=version)
+        if 'error' in forecast:
+            return forecast
+        content = render(forecast) if render else forecast
+        return {
+            'body': JSONResponse(content=jsonable_encoder(content)).body,
+            'computed_at': datetime.fromisoformat(forecast['snapshot']['computed_at']),
+            'source': source
+        }
+    
+    rendered, hit = cached_response(business_id, horizon, mode, variant, version, build)
+    if 'error' in rendered:
+        return rendered
+    body, computed_at = rendered['body'], rendered['computed_at']
+    source = "cache" if hit else rendered['source']
+    
+    if computed_at.tzinfo is None:
+        computed_at = computed_at.replace(tzinfo=timezone.utc)
+    headers["Last-Modified"] = format_datetime(computed_at.astimezone(timezone.utc), usegmt=True)
+    # If-Modified-Since only applies when the client sent no ETag
+    if "if-none-match" not in request.headers and not_modified_since(request.headers.get("if-modified-since"), computed_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    headers["X-Forecast-Source"] = source
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get("/{business_id}/7days")
+@rate_limit(cost=50)  # model fit when not precomputed
 def forecast_7_days(
     business_id: int,
+    request: Request,
+    mode: str = "auto",
+    latency_budget_ms: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Get 7-day cash flow forecast"""
+    """Get 7-day cash flow forecast - mode=auto uses the fast model unless mode=hybrid is requested"""
+    validate_mode(mode)
+    mode = stored_mode(mode, latency_budget_ms)
+    
     # Verify business ownership
     business = db.query(models.Business).filter(
         models.Business.id == business_id,
@@ -29,19 +129,28 @@ def forecast_7_days(
             detail="Business not found"
         )
     
-    # Generate forecast
+    # Cached / precomputed forecast if current, otherwise generate and store it
+    touch_access(business_id)
+    from app.ml.forecast_service import ForecastService
     service = ForecastService(db)
-    forecast = service.generate_forecast(business_id, days_forward=7)
-    
-    return forecast
+    return conditional_forecast(request, db, business_id, 7, mode, lambda: service.generate_forecast(
+        business_id, days_forward=7, mode=mode, latency_budget_ms=latency_budget_ms
+    ))
 
 @router.get("/{business_id}/30days")
+@rate_limit(cost=50)
 def forecast_30_days(
     business_id: int,
+    request: Request,
+    mode: str = "auto",
+    latency_budget_ms: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Get 30-day cash flow forecast"""
+    """Get 30-day cash flow forecast - mode=auto uses the hybrid model unless history or latency budget is short"""
+    validate_mode(mode)
+    mode = stored_mode(mode, latency_budget_ms)
+    
     # Verify business ownership
     business = db.query(models.Business).filter(
         models.Business.id == business_id,
@@ -54,19 +163,26 @@ def forecast_30_days(
             detail="Business not found"
         )
     
-    # Generate forecast
+    # Cached / precomputed forecast if current, otherwise generate and store it
+    touch_access(business_id)
+    from app.ml.forecast_service import ForecastService
     service = ForecastService(db)
-    forecast = service.generate_forecast(business_id, days_forward=30)
-    
-    return forecast
+    return conditional_forecast(request, db, business_id, 30, mode, lambda: service.generate_forecast(
+        business_id, days_forward=30, mode=mode, latency_budget_ms=latency_budget_ms
+    ))
 
 @router.get("/{business_id}/risk-alert")
+@rate_limit(cost=50)
 def get_risk_alert(
     business_id: int,
+    request: Request,
+    mode: str = "auto",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Get risk alert for business"""
+    validate_mode(mode)
+    
     # Verify business ownership
     business = db.query(models.Business).filter(
         models.Business.id == business_id,
@@ -79,13 +195,21 @@ def get_risk_alert(
             detail="Business not found"
         )
     
-    # Generate risk alert
+    # Generate risk alert from the (precomputed) 30-day forecast
+    touch_access(business_id)
+    from app.ml.forecast_service import ForecastService
     service = ForecastService(db)
-    alert = service.get_risk_alert(business_id)
-    
-    return alert
+    return conditional_forecast(
+        request, db, business_id, 30, mode,
+        lambda: service.generate_forecast(business_id, days_forward=30, mode=mode),
+        variant="risk-alert",
+        render=lambda forecast: service.risk_alert_from_forecast(
+            business_id, forecast, timestamp=forecast['snapshot']['computed_at']
+        )
+    )
 
 @router.get("/{business_id}/health")
+@rate_limit(cost=5)
 def forecast_health(
     business_id: int,
     db: Session = Depends(get_db),
@@ -105,9 +229,8 @@ def forecast_health(
         )
     
     # Check data sufficiency
-    from app.ml.data_pipeline import DataPipeline
-    pipeline = DataPipeline(db)
-    data = pipeline.prepare_daily_data(business_id, days=365)
+    from app.ml.feature_store import FeatureStore
+    data = FeatureStore(db).get_daily(business_id, days=365)
     
     if data.empty:
         return {
@@ -130,3 +253,73 @@ def forecast_health(
             'end': data['date'].max().isoformat()
         }
     }
+
+
+@router.post("/batch", dependencies=[admission("bulk")])
+@rate_limit(cost=500)  # up to FORECAST_BATCH_MAX_SIZE fits
+def forecast_batch(
+    request: ForecastBatchRequest,
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Forecast many businesses at once, streamed as NDJSON - one line per business as it finishes"""
+    business_ids = list(dict.fromkeys(request.business_ids))
+    
+    if not business_ids:
+        raise HTTPException(status_code=400, detail="business_ids must not be empty")
+    if len(business_ids) > FORECAST_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {FORECAST_BATCH_MAX_SIZE} businesses per batch"
+        )
+    if not 1 <= request.days_forward <= 365:
+        raise HTTPException(status_code=400, detail="days_forward must be between 1 and 365")
+    validate_mode(request.mode)
+    
+    # Owners get their own businesses; lenders and admins may forecast any business
+    query = db.query(models.Business.id).filter(models.Business.id.in_(business_ids))
+    if current_user.role not in ("lender", "admin"):
+        query = query.filter(models.Business.owner_id == current_user.id)
+    allowed = {row.id for row in query.all()}
+    
+    from app.ml.data_pipeline import DataPipeline
+    from app.ml.forecast_service import submit_forecast
+    
+    # One grouped query for every daily series - all DB work happens before streaming starts
+    daily_by_business = DataPipeline(db).prepare_daily_data_many(sorted(allowed))
+    
+    concurrency = min(request.concurrency or FORECAST_BATCH_CONCURRENCY, FORECAST_BATCH_CONCURRENCY)
+    concurrency = max(1, concurrency)
+    
+    def stream():
+        for business_id in business_ids:
+            if business_id not in allowed:
+                yield json.dumps({'business_id': business_id, 'error': 'Business not found'}) + "\n"
+        
+        queue = [business_id for business_id in business_ids if business_id in allowed]
+        in_flight = {}
+        try:
+            while queue or in_flight:
+                # Keep at most `concurrency` fits running for this request
+                while queue and len(in_flight) < concurrency:
+                    business_id = queue.pop(0)
+                    future = submit_forecast(
+                        business_id, daily_by_business[business_id], request.days_forward, request.mode
+                    )
+                    in_flight[future] = business_id
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    business_id = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                        result.setdefault('business_id', business_id)
+                    except Exception as e:
+                        result = {'business_id': business_id, 'error': f'Forecast failed: {e}'}
+                    yield json.dumps(result, default=str) + "\n"
+        finally:
+            # Client went away - don't leave queued fits behind
+            for future in in_flight:
+                future.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
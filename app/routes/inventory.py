@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 from app.database import get_db
-from app import auth, models
+from app import auth, models, fast_json
 from app.schemas.inventory import (
     Inventory, InventoryCreate, InventoryUpdate,
     InventoryTransaction, InventoryTransactionCreate,
@@ -38,6 +38,12 @@ def get_inventory(
         )
     
     # Get all inventory items for the business
+    if fast_json.FAST_JSON_LISTS:
+        rows = db.query(*fast_json.columns(Inventory, models.Inventory)).filter(
+            models.Inventory.business_id == business_id
+        ).offset(skip).limit(limit).all()
+        return fast_json.response(fast_json.rows(rows))
+    
     items = db.query(models.Inventory).filter(
         models.Inventory.business_id == business_id
     ).offset(skip).limit(limit).all()
@@ -6,6 +6,7 @@ import string
 from app.database import get_db
 from app import models, auth
 from app.schemas.password import PasswordResetRequest, PasswordResetConfirm, PasswordResetResponse
+from app.middleware.rate_limit import rate_limit
 import os
 from dotenv import load_dotenv
 
@@ -33,6 +34,7 @@ async def send_reset_email(email: str, token: str):
     # TODO: Integrate with a real email service like SendGrid, Mailgun, etc.
 
 @router.post("/reset-request", response_model=PasswordResetResponse)
+@rate_limit(cost=10)
 async def request_password_reset(
     request: PasswordResetRequest,
     background_tasks: BackgroundTasks,
@@ -74,6 +76,7 @@ async def request_password_reset(
     return {"message": "If your email exists, you will receive a reset link", "success": True}
 
 @router.post("/reset-confirm", response_model=PasswordResetResponse)
+@rate_limit(cost=10)
 def confirm_password_reset(
     request: PasswordResetConfirm,
     db: Session = Depends(get_db)
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.database import get_db
-from app import auth, models
+from app import auth, models, fast_json
 from app.schemas.supplier import (
     Supplier, SupplierCreate, SupplierUpdate,
     SupplierPayment, SupplierPaymentCreate, SupplierPaymentUpdate,
@@ -214,7 +214,8 @@ def get_all_payments(
             detail="Business not found"
         )
     
-    query = db.query(models.SupplierPayment).join(
+    entities = fast_json.columns(SupplierPayment, models.SupplierPayment) if fast_json.FAST_JSON_LISTS else [models.SupplierPayment]
+    query = db.query(*entities).join(
         models.Supplier, models.Supplier.id == models.SupplierPayment.supplier_id
     ).filter(
         models.Supplier.business_id == business_id
@@ -223,7 +224,10 @@ def get_all_payments(
     if status:
         query = query.filter(models.SupplierPayment.status == status)
     
-    return query.order_by(models.SupplierPayment.due_date).offset(skip).limit(limit).all()
+    payments = query.order_by(models.SupplierPayment.due_date).offset(skip).limit(limit).all()
+    if fast_json.FAST_JSON_LISTS:
+        return fast_json.response(fast_json.rows(payments))
+    return payments
 
 # Mark payment as paid
 @router.put("/payments/{payment_id}/pay", response_model=SupplierPayment)
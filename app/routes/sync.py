@@ -0,0 +1,39 @@
+# app/routes/sync.py
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app import models, auth
+from app.database import get_db, get_read_db
+from app.sync import changes_since, SYNC_PAGE_SIZE, SYNC_MAX_PAGE_SIZE
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+# Get current user dependency
+def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Depends(get_db)):
+    return auth.get_current_user(token, db)
+
+# Changes since the client's cursors - send back the returned cursors next time (0 = from the beginning)
+@router.get("/{business_id}")
+def sync_business(
+    business_id: int,
+    transactions: int = Query(0, ge=0),
+    inventory: int = Query(0, ge=0),
+    suppliers: int = Query(0, ge=0),
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    business = db.query(models.Business.id).filter(
+        models.Business.id == business_id,
+        models.Business.owner_id == current_user.id
+    ).first()
+    if not business:
+        raise HTTPException(status_code=404, detail="Business not found")
+
+    cursors = {"transactions": transactions, "inventory": inventory, "suppliers": suppliers}
+    changes = {entity: changes_since(db, business_id, entity, cursor, limit) for entity, cursor in cursors.items()}
+    return {
+        "business_id": business_id,
+        "cursors": {entity: page.pop("cursor") for entity, page in changes.items()},
+        "has_more": any(page["has_more"] for page in changes.values()),
+        **changes
+    }
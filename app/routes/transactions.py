@@ -1,29 +1,115 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, and_
 from typing import List, Optional
-from datetime import datetime, timedelta
-from app import models, schemas, auth
-from app.database import get_db
+import hashlib
+from datetime import datetime, time, timedelta
+from app import models, schemas, auth, idempotency, fast_json
+from app.database import get_async_db
+from app.middleware.etag import etag_matches
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
+def analytics_window(days: int):
+    """[start, end) of the last `days` days in whole UTC days (today included)
+
+    Fixed for the whole day, so repeat requests return identical bodies and the
+    ETag still matches - a window ending at utcnow() changed on every request.
+    """
+    end_date = datetime.combine(datetime.utcnow().date() + timedelta(days=1), time.min)
+    return end_date - timedelta(days=days), end_date
+
+async def analytics_not_modified(request: Request, response: Response, db: AsyncSession,
+                                 owner_id: int, business_id: Optional[int], *params):
+    """304 if the client's copy of this analytics response is current, else None (ETag set on `response`)
+
+    The ETag covers the request, the day's window and a version of the owner's
+    transaction data - newest id, row count and change_log sequence - so a match
+    is answered with two index lookups instead of the aggregate query.
+    """
+    businesses = select(models.Business.id).filter(models.Business.owner_id == owner_id)
+    if business_id:
+        businesses = businesses.filter(models.Business.id == business_id)
+    last_change = select(func.max(models.ChangeLog.id)).filter(
+        models.ChangeLog.entity == "transactions",
+        models.ChangeLog.business_id.in_(businesses)
+    ).scalar_subquery()
+    max_id, count, change = (await db.execute(
+        select(func.max(models.Transaction.id), func.count(models.Transaction.id), last_change).filter(
+            models.Transaction.business_id.in_(businesses)
+        )
+    )).one()
+
+    version = f"{request.url.path}:{owner_id}:{business_id}:{params}:{max_id}-{count}-{change}"
+    etag = f'"{hashlib.sha1(version.encode()).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
 # Get current user dependency
-def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Depends(get_db)):
-    return auth.get_current_user(token, db)
+async def get_current_user(token: str = Depends(auth.oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await auth.get_current_user_async(token, db)
+
+# Load a transaction that belongs to one of the user's businesses
+async def get_owned_transaction(db: AsyncSession, transaction_id: int, owner_id: int):
+    result = await db.execute(
+        select(models.Transaction).join(
+            models.Business, models.Business.id == models.Transaction.business_id
+        ).filter(
+            models.Transaction.id == transaction_id,
+            models.Business.owner_id == owner_id
+        )
+    )
+    return result.scalars().first()
+
+# Load a business owned by the user
+async def get_owned_business(db: AsyncSession, business_id: int, owner_id: int):
+    result = await db.execute(
+        select(models.Business).filter(
+            models.Business.id == business_id,
+            models.Business.owner_id == owner_id
+        )
+    )
+    return result.scalars().first()
+
+# Response for a retried request, or an error if the key was used differently
+def replay_response(record: dict, user_id: int, request_fingerprint: str):
+    if record['user_id'] != user_id or record['fingerprint'] != request_fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request"
+        )
+    return JSONResponse(
+        status_code=record['status_code'],
+        content=record['response'],
+        headers={"Idempotent-Replayed": "true"}
+    )
 
 # Create transaction
+# Send an Idempotency-Key header to make retries safe - a repeat returns the original response
 @router.post("/", response_model=schemas.Transaction)
-def create_transaction(
+async def create_transaction(
     transaction: schemas.TransactionCreate,
-    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key",
+                                            max_length=idempotency.IDEMPOTENCY_KEY_MAX_LENGTH),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    # Read before anything can expire the user object (rollback on a key conflict)
+    user_id = current_user.id
+    if idempotency_key:
+        request_fingerprint = idempotency.fingerprint(transaction.dict())
+        record = await idempotency.lookup(db, transaction.business_id, idempotency_key)
+        if record is not None:
+            return replay_response(record, user_id, request_fingerprint)
+
     # Verify business belongs to user
-    business = db.query(models.Business).filter(
-        models.Business.id == transaction.business_id,
-        models.Business.owner_id == current_user.id
-    ).first()
+    business = await get_owned_business(db, transaction.business_id, user_id)
     
     if not business:
         raise HTTPException(
@@ -41,13 +127,41 @@ def create_transaction(
     )
     
     db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
-    return db_transaction
+    if not idempotency_key:
+        await db.commit()
+        await db.refresh(db_transaction)
+        return db_transaction
+
+    # Store the response with the insert - the unique (business_id, key) index stops concurrent retries
+    await db.flush()
+    await db.refresh(db_transaction)
+    record = {
+        'user_id': user_id,
+        'fingerprint': request_fingerprint,
+        'status_code': status.HTTP_200_OK,
+        'response': jsonable_encoder(schemas.Transaction.model_validate(db_transaction)),
+    }
+    db.add(models.IdempotencyKey(business_id=transaction.business_id, key=idempotency_key,
+                                 expires_at=idempotency.expires_at(), **record))
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        # A concurrent retry with the same key won - answer with its response
+        await db.rollback()
+        record = await idempotency.lookup(db, transaction.business_id, idempotency_key)
+        if record is None:
+            # Not a key race (e.g. the business was deleted meanwhile)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Transaction could not be stored - it conflicts with the current data"
+            ) from e
+        return replay_response(record, user_id, request_fingerprint)
+    idempotency.remember(transaction.business_id, idempotency_key, record)
+    return record['response']
 
 # Get all transactions for user's businesses
 @router.get("/", response_model=List[schemas.Transaction])
-def get_transactions(
+async def get_transactions(
     skip: int = 0,
     limit: int = 100,
     business_id: Optional[int] = None,
@@ -55,11 +169,13 @@ def get_transactions(
     category: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Base query - only transactions from user's businesses
-    query = db.query(models.Transaction).join(
+    # (the fast path selects the schema's columns instead of ORM objects)
+    entities = fast_json.columns(schemas.Transaction, models.Transaction) if fast_json.FAST_JSON_LISTS else [models.Transaction]
+    query = select(*entities).join(
         models.Business, models.Business.id == models.Transaction.business_id
     ).filter(
         models.Business.owner_id == current_user.id
@@ -80,21 +196,19 @@ def get_transactions(
     # Order by most recent first
     query = query.order_by(models.Transaction.created_at.desc())
     
-    return query.offset(skip).limit(limit).all()
+    result = await db.execute(query.offset(skip).limit(limit))
+    if fast_json.FAST_JSON_LISTS:
+        return fast_json.response(fast_json.rows(result))
+    return result.scalars().all()
 
 # Get single transaction
 @router.get("/{transaction_id}", response_model=schemas.Transaction)
-def get_transaction(
+async def get_transaction(
     transaction_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    transaction = db.query(models.Transaction).join(
-        models.Business, models.Business.id == models.Transaction.business_id
-    ).filter(
-        models.Transaction.id == transaction_id,
-        models.Business.owner_id == current_user.id
-    ).first()
+    transaction = await get_owned_transaction(db, transaction_id, current_user.id)
     
     if not transaction:
         raise HTTPException(
@@ -105,19 +219,14 @@ def get_transaction(
 
 # Update transaction
 @router.put("/{transaction_id}", response_model=schemas.Transaction)
-def update_transaction(
+async def update_transaction(
     transaction_id: int,
     transaction_update: schemas.TransactionUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Get transaction and verify ownership
-    transaction = db.query(models.Transaction).join(
-        models.Business, models.Business.id == models.Transaction.business_id
-    ).filter(
-        models.Transaction.id == transaction_id,
-        models.Business.owner_id == current_user.id
-    ).first()
+    transaction = await get_owned_transaction(db, transaction_id, current_user.id)
     
     if not transaction:
         raise HTTPException(
@@ -127,10 +236,7 @@ def update_transaction(
     
     # If business_id is being updated, verify new business belongs to user
     if transaction_update.business_id:
-        new_business = db.query(models.Business).filter(
-            models.Business.id == transaction_update.business_id,
-            models.Business.owner_id == current_user.id
-        ).first()
+        new_business = await get_owned_business(db, transaction_update.business_id, current_user.id)
         
         if not new_business:
             raise HTTPException(
@@ -143,24 +249,19 @@ def update_transaction(
     for key, value in update_data.items():
         setattr(transaction, key, value)
     
-    db.commit()
-    db.refresh(transaction)
+    await db.commit()
+    await db.refresh(transaction)
     return transaction
 
 # Delete transaction
 @router.delete("/{transaction_id}")
-def delete_transaction(
+async def delete_transaction(
     transaction_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Get transaction and verify ownership
-    transaction = db.query(models.Transaction).join(
-        models.Business, models.Business.id == models.Transaction.business_id
-    ).filter(
-        models.Transaction.id == transaction_id,
-        models.Business.owner_id == current_user.id
-    ).first()
+    transaction = await get_owned_transaction(db, transaction_id, current_user.id)
     
     if not transaction:
         raise HTTPException(
@@ -168,24 +269,28 @@ def delete_transaction(
             detail="Transaction not found"
         )
     
-    db.delete(transaction)
-    db.commit()
+    await db.delete(transaction)
+    await db.commit()
     return {"message": "Transaction deleted successfully", "id": transaction_id}
 
 # Get transaction summary/stats
 @router.get("/summary/overview")
-def get_transaction_summary(
+async def get_transaction_summary(
+    request: Request,
+    response: Response,
     business_id: Optional[int] = None,
     days: int = 30,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Calculate date range
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
+    start_date, end_date = analytics_window(days)
+    not_modified = await analytics_not_modified(request, response, db, current_user.id, business_id, start_date, end_date)
+    if not_modified:
+        return not_modified
     
     # Base query
-    query = db.query(
+    query = select(
         func.sum(models.Transaction.amount).filter(models.Transaction.type == 'income').label('total_income'),
         func.sum(models.Transaction.amount).filter(models.Transaction.type == 'expense').label('total_expense'),
         func.count(models.Transaction.id).label('transaction_count'),
@@ -195,13 +300,14 @@ def get_transaction_summary(
         models.Business, models.Business.id == models.Transaction.business_id
     ).filter(
         models.Business.owner_id == current_user.id,
-        models.Transaction.created_at.between(start_date, end_date)
+        models.Transaction.created_at >= start_date,
+        models.Transaction.created_at < end_date
     )
     
     if business_id:
         query = query.filter(models.Transaction.business_id == business_id)
     
-    result = query.first()
+    result = (await db.execute(query)).first()
     
     # Calculate values (handle None)
     total_income = result.total_income or 0
@@ -223,19 +329,25 @@ def get_transaction_summary(
 
 # Get transactions by category
 @router.get("/analysis/by-category")
-def get_transactions_by_category(
+async def get_transactions_by_category(
+    request: Request,
+    response: Response,
     business_id: Optional[int] = None,
     days: int = 30,
     type: Optional[str] = None,  # income or expense
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Calculate date range
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
+    start_date, end_date = analytics_window(days)
+    not_modified = await analytics_not_modified(
+        request, response, db, current_user.id, business_id, start_date, end_date, type
+    )
+    if not_modified:
+        return not_modified
     
     # Base query
-    query = db.query(
+    query = select(
         models.Transaction.category,
         func.sum(models.Transaction.amount).label('total'),
         func.count(models.Transaction.id).label('count')
@@ -243,7 +355,8 @@ def get_transactions_by_category(
         models.Business, models.Business.id == models.Transaction.business_id
     ).filter(
         models.Business.owner_id == current_user.id,
-        models.Transaction.created_at.between(start_date, end_date)
+        models.Transaction.created_at >= start_date,
+        models.Transaction.created_at < end_date
     )
     
     if business_id:
@@ -253,7 +366,7 @@ def get_transactions_by_category(
     
     query = query.group_by(models.Transaction.category)
     
-    results = query.all()
+    results = (await db.execute(query)).all()
     
     return [
         {
@@ -267,18 +380,22 @@ def get_transactions_by_category(
 
 # Get daily totals for charts
 @router.get("/analysis/daily-totals")
-def get_daily_totals(
+async def get_daily_totals(
+    request: Request,
+    response: Response,
     business_id: Optional[int] = None,
     days: int = 30,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Calculate date range
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
+    start_date, end_date = analytics_window(days)
+    not_modified = await analytics_not_modified(request, response, db, current_user.id, business_id, start_date, end_date)
+    if not_modified:
+        return not_modified
     
     # Query daily totals
-    query = db.query(
+    query = select(
         func.date(models.Transaction.created_at).label('date'),
         func.sum(models.Transaction.amount).filter(models.Transaction.type == 'income').label('income'),
         func.sum(models.Transaction.amount).filter(models.Transaction.type == 'expense').label('expense')
@@ -286,7 +403,8 @@ def get_daily_totals(
         models.Business, models.Business.id == models.Transaction.business_id
     ).filter(
         models.Business.owner_id == current_user.id,
-        models.Transaction.created_at.between(start_date, end_date)
+        models.Transaction.created_at >= start_date,
+        models.Transaction.created_at < end_date
     )
     
     if business_id:
@@ -294,7 +412,7 @@ def get_daily_totals(
     
     query = query.group_by('date').order_by('date')
     
-    results = query.all()
+    results = (await db.execute(query)).all()
     
     return [
         {
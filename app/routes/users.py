@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app import models, schemas, auth
 from app.database import get_db
+from app.middleware.rate_limit import rate_limit
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -10,6 +11,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.post("/register", response_model=schemas.UserResponse)
+@rate_limit(cost=10)  # bcrypt hash
 def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # Check if user exists
     db_user = db.query(models.User).filter(models.User.email == user.email).first()
@@ -34,6 +36,7 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 @router.post("/login", response_model=schemas.Token)
+@rate_limit(cost=10)  # bcrypt check - also slows password guessing
 def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
     logger.info(f"Login attempt for email: {user.email}")
     
@@ -0,0 +1,165 @@
+# app/routes/webhooks.py
+import asyncio
+import hmac
+import json
+import os
+import time
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, insert, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app import models, auth
+from app.database import get_async_db, AsyncSessionLocal
+from app.middleware.compression import compression
+from app.middleware.rate_limit import rate_limit
+from app.schemas.mpesa import MpesaAccountCreate, MpesaAccount
+
+router = APIRouter(prefix="/webhooks", tags=["webhooks"])
+
+# Shared secret expected as ?token= on callback URLs (Daraja doesn't sign callbacks).
+# Required: without it callbacks are refused, or anyone could post income.
+MPESA_WEBHOOK_TOKEN = os.getenv("MPESA_WEBHOOK_TOKEN")
+# Refuse new callbacks (503, sender retries) while this many are waiting
+MPESA_QUEUE_HIGH_WATER = int(os.getenv("MPESA_QUEUE_HIGH_WATER", "50000"))
+# Recount the inbox at most this often
+MPESA_DEPTH_CHECK_SECONDS = 1.0
+
+ACCEPTED = {"ResultCode": 0, "ResultDesc": "Accepted"}
+
+# Get current user dependency
+async def get_current_user(token: str = Depends(auth.oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await auth.get_current_user_async(token, db)
+
+
+class CallbackInbox:
+    """Group commit for the callback inbox
+
+    Callbacks arriving while a write is in flight are queued and stored together
+    by the next INSERT + COMMIT. Each request still waits for its own row to be
+    committed before acknowledging, so nothing is acknowledged that isn't durable.
+    """
+
+    def __init__(self):
+        self._waiting = []
+        self._writer = None
+        self.pending = 0
+        self._counted_at = 0.0
+
+    async def append(self, shortcode: Optional[str], payload):
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append(({'shortcode': shortcode, 'payload': payload}, future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write())
+        await future
+
+    async def _write(self):
+        while self._waiting:
+            batch, self._waiting = self._waiting, []
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(models.MpesaCallback), [row for row, _ in batch])
+                    await db.commit()
+                    self.pending += len(batch)
+                    if time.monotonic() - self._counted_at >= MPESA_DEPTH_CHECK_SECONDS:
+                        self._counted_at = time.monotonic()
+                        self.pending = (await db.execute(
+                            select(func.count(models.MpesaCallback.id)).filter(models.MpesaCallback.status == "pending")
+                        )).scalar()
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for _, future in batch:
+                    future.set_result(None)
+
+
+inbox = CallbackInbox()
+
+# M-Pesa C2B confirmation / STK callback - store and acknowledge, processing happens in app.mpesa
+@router.post("/mpesa")
+@compression(enabled=False)  # tiny acknowledgements to Safaricom's servers
+@rate_limit(cost=0)  # bursts come from a few Safaricom IPs; the inbox high-water mark applies instead
+async def mpesa_callback(
+    request: Request,
+    shortcode: Optional[str] = None,  # STK callbacks don't carry it - put it in the CallbackURL
+    token: Optional[str] = None
+):
+    if not MPESA_WEBHOOK_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="M-Pesa callbacks are disabled until MPESA_WEBHOOK_TOKEN is configured"
+        )
+    if not hmac.compare_digest(token or "", MPESA_WEBHOOK_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid callback token")
+
+    try:
+        payload = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is not valid JSON")
+
+    if inbox.pending >= MPESA_QUEUE_HIGH_WATER:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"ResultCode": 1, "ResultDesc": "Busy, retry later"},
+            headers={"Retry-After": "30"}
+        )
+
+    if isinstance(payload, dict) and payload.get("BusinessShortCode"):
+        shortcode = str(payload["BusinessShortCode"])
+    await inbox.append(shortcode, payload)
+    return ACCEPTED
+
+# Register a paybill / till number for one of the user's businesses
+@router.post("/mpesa/accounts", response_model=MpesaAccount)
+async def create_mpesa_account(
+    account: MpesaAccountCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    business = (await db.execute(
+        select(models.Business).filter(
+            models.Business.id == account.business_id,
+            models.Business.owner_id == current_user.id
+        )
+    )).scalars().first()
+    if not business:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Business not found or doesn't belong to you"
+        )
+
+    db_account = models.MpesaAccount(**account.dict())
+    db.add(db_account)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Shortcode already registered")
+
+    # Payments that arrived before the shortcode was registered
+    await db.execute(
+        update(models.MpesaCallback).where(
+            models.MpesaCallback.status == "unmatched",
+            models.MpesaCallback.shortcode == account.shortcode
+        ).values(status="pending", attempts=0)
+    )
+    await db.commit()
+    await db.refresh(db_account)
+    return db_account
+
+# List the user's registered shortcodes
+@router.get("/mpesa/accounts", response_model=List[MpesaAccount])
+async def get_mpesa_accounts(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    result = await db.execute(
+        select(models.MpesaAccount).join(
+            models.Business, models.Business.id == models.MpesaAccount.business_id
+        ).filter(
+            models.Business.owner_id == current_user.id
+        )
+    )
+    return result.scalars().all()
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import Optional, List
+
+# Batch forecast schemas
+class ForecastBatchRequest(BaseModel):
+    business_ids: List[int]
+    days_forward: int = 30
+    concurrency: Optional[int] = None  # defaults to FORECAST_BATCH_CONCURRENCY
+    mode: str = "auto"  # auto, fast or hybrid
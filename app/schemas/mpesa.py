@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+# M-Pesa account schemas
+class MpesaAccountCreate(BaseModel):
+    shortcode: str
+    business_id: int
+    category: Optional[str] = "Sales"
+
+class MpesaAccount(MpesaAccountCreate):
+    id: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
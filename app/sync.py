@@ -0,0 +1,239 @@
+# app/sync.py
+"""
+Delta sync for offline clients
+
+Every ORM flush that inserts, updates or deletes a transaction, inventory item
+or supplier appends a row to change_log (listener below), so the log's id is a
+monotonically increasing change sequence. GET /sync takes the last sequence a
+client saw per entity and returns only what changed since: current rows for
+inserts/updates, ids (tombstones) for deletes. A reconnecting device downloads
+its changes instead of every list.
+
+Code that writes rows with raw SQL logs them itself in the same transaction:
+bulk loads (app.data_generator) with log_upserts(), archiving (app.partitions)
+with log_deletes(). Rows written before the log existed, or by other tools, are
+logged by `backfill`, which adds an upsert entry for every row without one.
+
+PostgreSQL hands out sequence numbers at flush but makes them visible at commit,
+so a slow transaction can commit a lower id after a higher one was served.
+Every change_log writer holds a shared advisory lock until it commits; a read
+briefly takes it exclusively to learn the highest id with nothing still in
+flight below it, and never serves past that.
+
+    python -m app.sync backfill
+    python -m app.sync compact     # drop log entries superseded by later ones
+"""
+import argparse
+import os
+from datetime import datetime
+from sqlalchemy import event, func, insert, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app import models, schemas
+from app.db_config import no_statement_timeout
+from app.schemas.inventory import Inventory as InventorySchema
+from app.schemas.supplier import Supplier as SupplierSchema
+
+# entity name -> (model, response schema)
+SYNC_ENTITIES = {
+    "transactions": (models.Transaction, schemas.Transaction),
+    "inventory": (models.Inventory, InventorySchema),
+    "suppliers": (models.Supplier, SupplierSchema),
+}
+_ENTITY_BY_MODEL = {model: name for name, (model, _) in SYNC_ENTITIES.items()}
+
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+SYNC_MAX_PAGE_SIZE = 5000
+# PostgreSQL: how long a read waits for in-flight change_log writers before it
+# returns no new changes (the client keeps its cursor and retries).
+# SQLite has a single writer, so nothing to wait for.
+SYNC_SETTLE_SECONDS = float(os.getenv("SYNC_SETTLE_SECONDS", "2"))
+# Advisory lock key shared by change_log writers and readers
+SYNC_LOCK_KEY = 0x53594E43  # "SYNC"
+
+
+# ----------------------------------------------------------------------
+# Change capture
+
+def lock_for_write(conn):
+    """PostgreSQL: hold the shared change_log lock until this transaction ends"""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock_shared(:key)"), {"key": SYNC_LOCK_KEY})
+
+
+def log_deletes(conn, entity: str, source: str, where: str = "1 = 1", params: dict = None) -> int:
+    """Tombstone rows of `source` matching `where` - for raw SQL that is about to remove them"""
+    lock_for_write(conn)
+    return conn.execute(text(
+        f"INSERT INTO change_log (entity, entity_id, business_id, op, changed_at) "
+        f"SELECT :entity, id, business_id, 'delete', :now FROM {source} WHERE {where} ORDER BY id"
+    ), {**(params or {}), 'entity': entity, 'now': datetime.utcnow()}).rowcount
+
+
+def log_upserts(conn, entity: str, source: str, where: str = "1 = 1", params: dict = None) -> int:
+    """Log upserts for rows of `source` matching `where` - for raw SQL that just wrote them"""
+    lock_for_write(conn)
+    return conn.execute(text(
+        f"INSERT INTO change_log (entity, entity_id, business_id, op, changed_at) "
+        f"SELECT :entity, id, business_id, 'upsert', :now FROM {source} WHERE {where} ORDER BY id"
+    ), {**(params or {}), 'entity': entity, 'now': datetime.utcnow()}).rowcount
+
+
+def _log_entry(entity, entity_id, business_id, op, now):
+    return {'entity': entity, 'entity_id': entity_id, 'business_id': business_id, 'op': op, 'changed_at': now}
+
+
+@event.listens_for(Session, "after_flush")
+def record_changes(session, flush_context):
+    """Append change_log entries for synced rows written by this flush"""
+    now = datetime.utcnow()
+    entries = []
+    for obj in session.new:
+        entity = _ENTITY_BY_MODEL.get(type(obj))
+        if entity:
+            entries.append(_log_entry(entity, obj.id, obj.business_id, "upsert", now))
+    for obj in session.dirty:
+        entity = _ENTITY_BY_MODEL.get(type(obj))
+        if entity and session.is_modified(obj, include_collections=False):
+            moved_from = inspect(obj).attrs.business_id.history.deleted
+            if moved_from and moved_from[0] is not None:
+                # Moved to another business - the old one sees a delete
+                entries.append(_log_entry(entity, obj.id, moved_from[0], "delete", now))
+            entries.append(_log_entry(entity, obj.id, obj.business_id, "upsert", now))
+    for obj in session.deleted:
+        entity = _ENTITY_BY_MODEL.get(type(obj))
+        if entity:
+            entries.append(_log_entry(entity, obj.id, obj.business_id, "delete", now))
+    if entries:
+        connection = session.connection()
+        lock_for_write(connection)
+        connection.execute(insert(models.ChangeLog.__table__), entries)
+
+
+# ----------------------------------------------------------------------
+# Reading changes
+
+def committed_bound(db):
+    """Highest change_log id a response may include - every lower id is committed
+
+    None on SQLite (single writer, ids become visible in order). On PostgreSQL,
+    0 when in-flight writers didn't finish within SYNC_SETTLE_SECONDS.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    try:
+        # Savepoint, so a lock timeout doesn't abort the request's transaction
+        with db.begin_nested():
+            db.execute(text(f"SET LOCAL lock_timeout = '{int(SYNC_SETTLE_SECONDS * 1000)}ms'"))
+            db.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SYNC_LOCK_KEY})
+    except OperationalError:
+        return 0
+    try:
+        # Writers that held the shared lock have committed or rolled back; later ones get higher ids
+        return db.query(func.max(models.ChangeLog.id)).scalar() or 0
+    finally:
+        db.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SYNC_LOCK_KEY})
+        db.execute(text("SET LOCAL lock_timeout = DEFAULT"))
+
+
+def changes_since(db, business_id: int, entity: str, cursor: int, limit: int = SYNC_PAGE_SIZE) -> dict:
+    """One page of changes for an entity: {'cursor', 'upserts', 'deletes', 'has_more'}"""
+    model, schema = SYNC_ENTITIES[entity]
+    query = db.query(
+        models.ChangeLog.id, models.ChangeLog.entity_id, models.ChangeLog.op
+    ).filter(
+        models.ChangeLog.business_id == business_id,
+        models.ChangeLog.entity == entity,
+        models.ChangeLog.id > cursor
+    )
+    bound = committed_bound(db)
+    if bound is not None:
+        query = query.filter(models.ChangeLog.id <= bound)
+    changes = query.order_by(models.ChangeLog.id).limit(limit + 1).all()
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    # Only the latest change per row matters
+    latest = {}
+    for change in changes:
+        latest[change.entity_id] = change.op
+
+    upsert_ids = [row_id for row_id, op in latest.items() if op == "upsert"]
+    rows = db.query(model).filter(
+        model.id.in_(upsert_ids), model.business_id == business_id
+    ).all() if upsert_ids else []
+    # Rows missing here were deleted or moved after this page - a later change covers them
+    return {
+        'cursor': changes[-1].id if changes else cursor,
+        'upserts': [schema.model_validate(row).model_dump(mode="json") for row in rows],
+        'deletes': [row_id for row_id, op in latest.items() if op == "delete"],
+        'has_more': has_more,
+    }
+
+
+# ----------------------------------------------------------------------
+# Maintenance
+
+def backfill(db) -> int:
+    """Log an upsert for every synced row that has no change_log entry yet"""
+    total = 0
+    now = datetime.utcnow()
+    with no_statement_timeout(db.connection()) as conn:
+        lock_for_write(conn)
+        for entity, (model, _) in SYNC_ENTITIES.items():
+            table = model.__tablename__
+            result = db.execute(text(
+                f"INSERT INTO change_log (entity, entity_id, business_id, op, changed_at) "
+                f"SELECT :entity, t.id, t.business_id, 'upsert', :now FROM {table} t "
+                f"WHERE NOT EXISTS (SELECT 1 FROM change_log c WHERE c.entity = :entity AND c.entity_id = t.id) "
+                f"ORDER BY t.id"
+            ), {'entity': entity, 'now': now})
+            total += result.rowcount
+    db.commit()
+    return total
+
+
+def backfill_if_empty(db) -> int:
+    """First start with delta sync: log existing rows once"""
+    if db.query(models.ChangeLog.id).first() is not None:
+        return 0
+    return backfill(db)
+
+
+def compact(db) -> int:
+    """Delete entries superseded by a later entry for the same row and business
+
+    Safe for every cursor: a client past the later entry needs neither, a
+    client before it still receives the later one.
+    """
+    with no_statement_timeout(db.connection()):
+        result = db.execute(text(
+            "DELETE FROM change_log WHERE EXISTS ("
+            "SELECT 1 FROM change_log newer WHERE newer.entity = change_log.entity "
+            "AND newer.entity_id = change_log.entity_id AND newer.business_id = change_log.business_id "
+            "AND newer.id > change_log.id)"
+        ))
+    db.commit()
+    return result.rowcount
+
+
+def main():
+    from app.database import SessionLocal, engine, Base
+
+    parser = argparse.ArgumentParser(description="Delta sync change log")
+    parser.add_argument("command", choices=["backfill", "compact"])
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.command == "backfill":
+            print(f"✅ Logged {backfill(db):,} existing rows")
+        else:
+            print(f"🧹 Removed {compact(db):,} superseded change log entries")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# app/worker.py
+"""
+Background precomputation worker
+
+During off-peak hours, walks businesses in order of most recent access and
+    - refreshes forecast snapshots whose data watermark or model version is out of date
+    - recalculates credit scores that are missing, expiring soon, or older
+      than the business's latest transaction
+so request handlers mostly read precomputed results.
+
+Every poll, in or out of the window, it also deletes expired idempotency keys.
+
+    python -m app.worker            # run forever, working only in the off-peak window
+    python -m app.worker --once     # one full pass now, ignoring the window
+
+Set WORKER_IN_PROCESS=true to run the same loop in a daemon thread inside the API.
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app.database import SessionLocal
+from app import models
+from app.ml.snapshots import snapshot_version, get_snapshot, save_snapshot
+from app.idempotency import purge_expired
+
+# Off-peak window in server-local hours, [start, end)
+WORKER_OFFPEAK_START = int(os.getenv("WORKER_OFFPEAK_START", "1"))
+WORKER_OFFPEAK_END = int(os.getenv("WORKER_OFFPEAK_END", "5"))
+WORKER_POLL_SECONDS = int(os.getenv("WORKER_POLL_SECONDS", "300"))
+# Forecast horizons precomputed with the endpoints' default mode
+PRECOMPUTE_HORIZONS = [int(h) for h in os.getenv("PRECOMPUTE_HORIZONS", "7,30").split(",")]
+PRECOMPUTE_MODE = "auto"
+# Recalculate credit scores this many days before they expire
+CREDIT_REFRESH_BEFORE_DAYS = int(os.getenv("CREDIT_REFRESH_BEFORE_DAYS", "3"))
+
+
+def in_offpeak_window(now: datetime = None) -> bool:
+    hour = (now or datetime.now()).hour
+    if WORKER_OFFPEAK_START <= WORKER_OFFPEAK_END:
+        return WORKER_OFFPEAK_START <= hour < WORKER_OFFPEAK_END
+    # Window wraps midnight, e.g. 22-4
+    return hour >= WORKER_OFFPEAK_START or hour < WORKER_OFFPEAK_END
+
+
+def prioritized_businesses(db):
+    """Businesses with transactions, most recently accessed first (never-accessed last)"""
+    return db.query(
+        models.Business.id,
+        models.Business.owner_id
+    ).outerjoin(
+        models.BusinessActivity, models.BusinessActivity.business_id == models.Business.id
+    ).filter(
+        models.Business.transactions.any()
+    ).order_by(
+        models.BusinessActivity.last_accessed_at.desc().nullslast(),
+        models.Business.id
+    ).all()
+
+
+def credit_score_due(db, business_id: int) -> bool:
+    """No score that is valid for a few more days and newer than the latest transaction"""
+    last_transaction = db.query(func.max(models.Transaction.created_at)).filter(
+        models.Transaction.business_id == business_id
+    ).scalar_subquery()
+
+    fresh = db.query(models.CreditScore.id).filter(
+        models.CreditScore.business_id == business_id,
+        models.CreditScore.valid_until > datetime.utcnow() + timedelta(days=CREDIT_REFRESH_BEFORE_DAYS),
+        models.CreditScore.calculation_date >= last_transaction
+    ).first()
+    return fresh is None
+
+
+def precompute_business(db, business_id: int, owner_id: int) -> dict:
+    """Bring one business's snapshots and credit score up to date"""
+    # ML stack loaded on first use - importing the worker module (API startup) stays cheap
+    from app.credit.scoring import CreditScoringEngine
+    from app.ml.forecast_service import ForecastService
+
+    done = {'forecasts': 0, 'credit': 0}
+    version = snapshot_version(db, business_id)
+
+    for horizon in PRECOMPUTE_HORIZONS:
+        snapshot = get_snapshot(db, business_id, horizon, PRECOMPUTE_MODE)
+        if snapshot is not None and snapshot.watermark == version:
+            continue
+        started = time.perf_counter()
+        payload = ForecastService(db).generate_forecast(business_id, days_forward=horizon, mode=PRECOMPUTE_MODE)
+        if 'error' not in payload:
+            save_snapshot(db, business_id, horizon, PRECOMPUTE_MODE, version, payload,
+                          time.perf_counter() - started)
+            done['forecasts'] += 1
+
+    if credit_score_due(db, business_id):
+        if CreditScoringEngine(db).calculate_credit_score(business_id, owner_id):
+            done['credit'] += 1
+
+    activity = db.query(models.BusinessActivity).filter(
+        models.BusinessActivity.business_id == business_id
+    ).first()
+    if activity is None:
+        activity = models.BusinessActivity(business_id=business_id)
+        db.add(activity)
+    activity.last_precomputed_at = datetime.utcnow()
+    db.commit()
+    return done
+
+
+def run_pass(respect_window: bool = True, stop_event: threading.Event = None):
+    """One pass over all businesses; stops early if the off-peak window closes"""
+    db = SessionLocal()
+    totals = {'businesses': 0, 'forecasts': 0, 'credit': 0, 'errors': 0}
+    started = time.perf_counter()
+    try:
+        for business_id, owner_id in prioritized_businesses(db):
+            if stop_event is not None and stop_event.is_set():
+                break
+            if respect_window and not in_offpeak_window():
+                print("⏸️  Off-peak window closed - stopping pass")
+                break
+            try:
+                done = precompute_business(db, business_id, owner_id)
+            except Exception as e:
+                db.rollback()
+                totals['errors'] += 1
+                print(f"❌ Precompute failed for business {business_id}: {e}")
+                continue
+            totals['businesses'] += 1
+            totals['forecasts'] += done['forecasts']
+            totals['credit'] += done['credit']
+    finally:
+        db.close()
+
+    print(f"✅ Precompute pass in {time.perf_counter() - started:.1f}s: {totals}")
+    return totals
+
+
+def run_housekeeping():
+    """Cheap cleanup that doesn't wait for the off-peak window"""
+    db = SessionLocal()
+    try:
+        purged = purge_expired(db)
+        if purged:
+            print(f"🧹 Purged {purged} expired idempotency keys")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Housekeeping failed: {e}")
+    finally:
+        db.close()
+
+
+def run_forever(stop_event: threading.Event = None):
+    """Poll loop - one pass per off-peak window"""
+    stop_event = stop_event or threading.Event()
+    last_pass_date = None
+    while not stop_event.is_set():
+        run_housekeeping()
+        today = datetime.now().date()
+        if in_offpeak_window() and last_pass_date != today:
+            run_pass(stop_event=stop_event)
+            last_pass_date = today
+        stop_event.wait(WORKER_POLL_SECONDS)
+
+
+_worker_thread = None
+_worker_stop = threading.Event()
+
+def start_background_worker():
+    """Run the worker loop in a daemon thread (WORKER_IN_PROCESS=true)"""
+    global _worker_thread
+    if _worker_thread is None:
+        _worker_thread = threading.Thread(target=run_forever, args=(_worker_stop,), daemon=True, name="precompute-worker")
+        _worker_thread.start()
+
+def stop_background_worker():
+    _worker_stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute forecasts and credit scores off-peak")
+    parser.add_argument("--once", action="store_true", help="Run one full pass now, ignoring the off-peak window")
+    args = parser.parse_args()
+
+    if args.once:
+        run_housekeeping()
+        run_pass(respect_window=False)
+    else:
+        print(f"🕐 Worker running - off-peak window {WORKER_OFFPEAK_START}:00-{WORKER_OFFPEAK_END}:00")
+        run_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Load benchmark: sync (threadpool) vs async (connection pool) database routes
+
+Seeds a throwaway database, then fires concurrent requests at two versions of
+the daily-totals analytics query:
+  - sync:  def route + Session, runs on Starlette's threadpool
+  - async: the real async route in app/routes/transactions.py (AsyncSession)
+
+Usage:
+    python benchmarks/async_db_load.py --requests 2000 --concurrency 200
+    DATABASE_URL=postgresql://... python benchmarks/async_db_load.py
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use a throwaway SQLite database unless one is configured
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_async.db"
+# Measure the app, not the per-user request budget (RATE_LIMIT_ENABLED=true to include it)
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+from fastapi import Depends
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import auth, models
+from app.database import Base, engine, SessionLocal, get_db
+from app.main import app
+
+
+def seed(num_transactions: int):
+    """Create a user, a business and some transactions"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = models.User(email="bench@smartpesa.test", hashed_password=auth.hash_password("bench"))
+        db.add(user)
+        db.flush()
+        business = models.Business(name="Bench Shop", owner_id=user.id)
+        db.add(business)
+        db.flush()
+
+        now = datetime.utcnow()
+        db.bulk_insert_mappings(models.Transaction, [
+            {
+                "amount": 100 + (i % 50),
+                "type": "income" if i % 3 else "expense",
+                "category": "Sales" if i % 3 else "Supplies",
+                "description": "bench",
+                "business_id": business.id,
+                "created_at": now - timedelta(minutes=i * 7),
+            }
+            for i in range(num_transactions)
+        ])
+        db.commit()
+        return business.id, auth.create_access_token({"sub": user.email})
+    finally:
+        db.close()
+
+
+def sync_daily_totals(
+    business_id: int,
+    days: int = 30,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Reference sync version of /transactions/analysis/daily-totals"""
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=days)
+
+    results = db.query(
+        func.date(models.Transaction.created_at).label('date'),
+        func.sum(models.Transaction.amount).filter(models.Transaction.type == 'income').label('income'),
+        func.sum(models.Transaction.amount).filter(models.Transaction.type == 'expense').label('expense')
+    ).join(
+        models.Business, models.Business.id == models.Transaction.business_id
+    ).filter(
+        models.Business.owner_id == current_user.id,
+        models.Transaction.business_id == business_id,
+        models.Transaction.created_at.between(start_date, end_date)
+    ).group_by('date').order_by('date').all()
+
+    return [
+        {"date": r.date, "income": r.income or 0, "expense": r.expense or 0}
+        for r in results
+    ]
+
+
+async def run(path: str, token: str, total: int, concurrency: int):
+    """Fire `total` requests with at most `concurrency` in flight"""
+    # App errors (e.g. pool checkout timeouts) are counted, not raised
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async database route load benchmark")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--transactions", type=int, default=5000)
+    args = parser.parse_args()
+
+    business_id, token = seed(args.transactions)
+    app.add_api_route("/bench/sync/daily-totals", sync_daily_totals, methods=["GET"])
+
+    paths = {
+        "sync": f"/bench/sync/daily-totals?business_id={business_id}",
+        "async": f"/transactions/analysis/daily-totals?business_id={business_id}",
+    }
+
+    print(f"Database: {engine.url.get_backend_name()} | requests={args.requests} concurrency={args.concurrency}")
+    print(f"{'path':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+
+    # One event loop for everything - the async engine's pool is bound to it
+    async def run_all():
+        for name, path in paths.items():
+            await run(path, token, min(50, args.requests), args.concurrency)  # warm-up
+            stats = await run(path, token, args.requests, args.concurrency)
+            print(
+                f"{name:<8}{stats['rps']:>10.1f}{stats['p50_ms']:>10.1f}"
+                f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['errors']:>8}"
+            )
+
+    asyncio.run(run_all())
+
+if __name__ == "__main__":
+    main()
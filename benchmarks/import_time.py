@@ -0,0 +1,75 @@
+"""
+API cold-start guard: import time of app.main without the ML stack
+
+Imports app.main in fresh interpreters under `python -X importtime` and fails
+(exit 1) if the best run exceeds the budget, or if any heavy module - pandas,
+Prophet, scikit-learn, ... - was loaded. Those belong to forecast and credit
+requests (imported on first use), not to every worker's startup.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --max-ms 1200 --runs 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must not be imported by `import app.main`
+HEAVY_MODULES = ("prophet", "cmdstanpy", "sklearn", "scipy", "pandas", "numpy", "matplotlib", "joblib")
+
+PROBE = (
+    "import sys, app.main; "
+    f"print('loaded:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+
+def measure():
+    """(cumulative import time of app.main in ms, heavy modules loaded) for one fresh interpreter"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    # Use a throwaway SQLite database unless one is configured
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/import_time.db")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if line.startswith("import time:") and line.rsplit("|", 1)[-1].strip() == "app.main":
+            cumulative_us = int(line.split("|")[1])
+    # The app prints its own startup lines - find ours
+    report = next(line for line in result.stdout.splitlines() if line.startswith("loaded:"))
+    loaded = [m for m in report[len("loaded:"):].split(",") if m]
+    return cumulative_us / 1000, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if the API's import time regresses")
+    parser.add_argument("--max-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=3, help="Best of N (first run also warms the disk cache)")
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    best_ms = min(ms for ms, _ in runs)
+    loaded = sorted({m for _, modules in runs for m in modules})
+
+    print(f"import app.main: best {best_ms:.0f} ms of {args.runs} runs (budget {args.max_ms:.0f} ms)")
+    failed = False
+    if loaded:
+        print(f"❌ heavy modules imported at startup: {', '.join(loaded)}")
+        failed = True
+    if best_ms > args.max_ms:
+        print(f"❌ over budget by {best_ms - args.max_ms:.0f} ms - run `python -X importtime -c 'import app.main'` to see why")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ no ML modules at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Large list responses: regular path vs the FAST_JSON_LISTS fast path
+
+Seeds a throwaway database with --rows transactions, inventory items, supplier
+payments and credit-scored businesses, then requests each list endpoint with
+limit=--rows through the app in-process, once per path, and reports latency
+and response size. Both paths must return the same JSON - the run fails if
+they don't.
+
+Usage:
+    python benchmarks/json_lists.py --rows 10000 --repeat 10
+    DATABASE_URL=postgresql://... python benchmarks/json_lists.py
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use a throwaway SQLite database unless one is configured
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_json.db"
+# Measure the app, not the per-user request budget (RATE_LIMIT_ENABLED=true to include it)
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+
+from app import auth, models, fast_json
+from app.database import Base, engine, SessionLocal
+from app.main import app
+
+
+def seed(rows: int):
+    """One owner with `rows` of everything; returns (business_id, token)"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = models.User(email=f"json-{time.time_ns()}@bench.test", hashed_password=auth.hash_password("bench"))
+        db.add(user)
+        db.flush()
+        business = models.Business(name="Bench Shop", owner_id=user.id)
+        db.add(business)
+        db.flush()
+        supplier = models.Supplier(name="Bench Supplier", business_id=business.id)
+        db.add(supplier)
+        db.flush()
+
+        now = datetime.utcnow()
+        db.bulk_insert_mappings(models.Transaction, [
+            {"amount": 100 + (i % 500) * 1.25, "type": "income" if i % 3 else "expense",
+             "category": "Sales" if i % 3 else "Supplies", "description": f"bench row {i}",
+             "business_id": business.id, "created_at": now - timedelta(minutes=i * 7)}
+            for i in range(rows)
+        ])
+        db.bulk_insert_mappings(models.Inventory, [
+            {"name": f"Item {i}", "sku": f"SKU{i:06d}", "quantity": i % 40, "unit": "pieces",
+             "price_per_unit": 10 + i % 90, "reorder_level": 10, "business_id": business.id,
+             "created_at": now - timedelta(hours=i)}
+            for i in range(rows)
+        ])
+        db.bulk_insert_mappings(models.SupplierPayment, [
+            {"supplier_id": supplier.id, "amount": 500 + i % 1000, "due_date": now + timedelta(hours=i - rows // 2),
+             "status": "pending", "notes": f"invoice {i}", "created_at": now - timedelta(days=1)}
+            for i in range(rows)
+        ])
+
+        # Lender listing: scored businesses
+        db.bulk_insert_mappings(models.Business, [
+            {"name": f"Scored {i}", "owner_id": user.id} for i in range(rows)
+        ])
+        scored = db.query(models.Business.id).filter(models.Business.name.like("Scored %")).all()
+        db.bulk_insert_mappings(models.CreditScore, [
+            {"user_id": user.id, "business_id": b.id, "smartpesa_score": 300 + b.id % 600,
+             "calculation_date": now, "valid_until": now + timedelta(days=30)}
+            for b in scored
+        ])
+        db.commit()
+        return business.id, auth.create_access_token({"sub": user.email})
+    finally:
+        db.close()
+
+
+async def measure(client, path: str, headers: dict, repeat: int):
+    """Median latency in ms, body size and parsed body of `repeat` sequential requests"""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return statistics.median(latencies), len(response.content), response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regular vs fast JSON path for list endpoints")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    business_id, token = seed(args.rows)
+    headers = {"Authorization": f"Bearer {token}"}
+    paths = {
+        "transactions": f"/transactions/?business_id={business_id}&limit={args.rows}",
+        "inventory": f"/inventory/?business_id={business_id}&limit={args.rows}",
+        "payments": f"/suppliers/payments/all?business_id={business_id}&limit={args.rows}",
+        "lender": f"/credit/lender/businesses?limit={args.rows}",
+    }
+
+    print(f"Database: {engine.url.get_backend_name()} | rows={args.rows} repeat={args.repeat} | "
+          f"encoder: {'orjson' if fast_json.orjson else 'stdlib json'}")
+    print(f"{'endpoint':<14}{'regular ms':>12}{'fast ms':>10}{'speedup':>9}{'size KB':>10}  same JSON")
+
+    async def run_all():
+        mismatches = 0
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name, path in paths.items():
+                results = {}
+                for fast in (False, True):
+                    fast_json.FAST_JSON_LISTS = fast
+                    await measure(client, path, headers, 1)  # warm-up
+                    results[fast] = await measure(client, path, headers, args.repeat)
+                (regular_ms, size, regular_body), (fast_ms, _, fast_body) = results[False], results[True]
+                same = regular_body == fast_body
+                mismatches += not same
+                print(f"{name:<14}{regular_ms:>12.1f}{fast_ms:>10.1f}{regular_ms / fast_ms:>8.1f}x"
+                      f"{size / 1024:>10.0f}  {'✅' if same else '❌'}")
+        return mismatches
+
+    if asyncio.run(run_all()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
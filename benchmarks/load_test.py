@@ -0,0 +1,346 @@
+"""
+End-to-end load test with synthetic tenants
+
+Seeds N owners x M businesses x K transactions (plus lender accounts) straight
+into the database with bulk inserts, then runs virtual users that replay a mix
+of dashboard, transaction-entry, forecast and lender traffic for a fixed
+duration. Reports throughput and p50/p95/p99 per endpoint, and compares with a
+saved baseline.
+
+Requests go through the app in-process (httpx ASGI transport) unless --base-url
+points at a running server - in that case run the server against the same
+DATABASE_URL the seed step writes to.
+
+Usage:
+    python benchmarks/load_test.py --users 20 --businesses 2 --transactions 2000 --duration 30
+    python benchmarks/load_test.py --mix dashboard=60,entry=30,forecast=5,lender=5 --save base.json
+    python benchmarks/load_test.py --baseline base.json --fail-on-regression 20
+    DATABASE_URL=postgresql://... python benchmarks/load_test.py --base-url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use a throwaway SQLite database unless one is configured
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/load_test.db"
+# Measure the app, not the per-user request budget (RATE_LIMIT_ENABLED=true to include it)
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+import numpy as np
+from sqlalchemy import insert
+
+from app import auth, models
+from app.credit.scoring import CreditScoringEngine
+from app.database import Base, engine, SessionLocal
+from app.main import app
+
+INCOME_CATEGORIES = ["Sales", "Services", "M-Pesa Receipt"]
+EXPENSE_CATEGORIES = ["Supplies", "Rent", "Transport", "Salaries", "Utilities"]
+
+# Share of traffic per scenario - override with --mix
+DEFAULT_MIX = {"dashboard": 50, "entry": 30, "forecast": 12, "lender": 8}
+
+
+# ----------------------------------------------------------------------
+# Seeding
+
+def seed(num_users: int, businesses_per_user: int, transactions_per_business: int,
+         num_lenders: int, history_days: int, rng: np.random.Generator):
+    """Bulk-insert tenants and their history, returning what the virtual users need"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        # bcrypt is deliberately slow - every synthetic account shares one hash
+        password_hash = auth.hash_password("load-test")
+        run_tag = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+
+        owners = []
+        for i in range(num_users):
+            user = models.User(email=f"owner{i}-{run_tag}@load.test", hashed_password=password_hash)
+            db.add(user)
+            owners.append(user)
+        lenders = [
+            models.User(email=f"lender{i}-{run_tag}@load.test", hashed_password=password_hash, role="lender")
+            for i in range(num_lenders)
+        ]
+        db.add_all(lenders)
+        db.flush()
+
+        tenants = []
+        for user in owners:
+            for j in range(businesses_per_user):
+                business = models.Business(name=f"Load Shop {user.id}-{j}", owner_id=user.id)
+                db.add(business)
+                tenants.append((user, business))
+        db.flush()
+
+        now = datetime.utcnow()
+        batch = []
+        for _, business in tenants:
+            n = transactions_per_business
+            is_income = rng.random(n) < 0.6
+            amounts = np.where(is_income, rng.lognormal(7.0, 0.6, n), rng.lognormal(6.5, 0.8, n))
+            ages = rng.uniform(0, history_days * 86400, n)
+            income_cat = rng.integers(0, len(INCOME_CATEGORIES), n)
+            expense_cat = rng.integers(0, len(EXPENSE_CATEGORIES), n)
+            for k in range(n):
+                batch.append({
+                    "amount": round(float(amounts[k]), 2),
+                    "type": "income" if is_income[k] else "expense",
+                    "category": INCOME_CATEGORIES[income_cat[k]] if is_income[k] else EXPENSE_CATEGORIES[expense_cat[k]],
+                    "description": "load test",
+                    "business_id": business.id,
+                    "created_at": now - timedelta(seconds=float(ages[k])),
+                })
+            if len(batch) >= 20000:
+                db.execute(insert(models.Transaction), batch)
+                batch = []
+        if batch:
+            db.execute(insert(models.Transaction), batch)
+        db.commit()
+
+        # Lender endpoints need a current score per business
+        scoring = CreditScoringEngine(db)
+        for user, business in tenants:
+            scoring.calculate_credit_score(business.id, user.id)
+
+        print(f"🌱 Seeded {len(owners)} owners, {len(tenants)} businesses, "
+              f"{len(tenants) * transactions_per_business:,} transactions, {len(lenders)} lenders "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        tokens = {user.id: auth.create_access_token({"sub": user.email}) for user in owners + lenders}
+        return {
+            "tenants": [(tokens[user.id], business.id) for user, business in tenants],
+            "lenders": [tokens[user.id] for user in lenders],
+        }
+    finally:
+        db.close()
+
+
+# ----------------------------------------------------------------------
+# Scenarios - each picks one request: (endpoint name, method, path, token, json body)
+
+def dashboard(rng: random.Random, data):
+    token, business_id = rng.choice(data["tenants"])
+    name, path = rng.choice([
+        ("GET /transactions/summary/overview", f"/transactions/summary/overview?business_id={business_id}"),
+        ("GET /transactions/analysis/daily-totals", f"/transactions/analysis/daily-totals?business_id={business_id}"),
+        ("GET /transactions/analysis/by-category", f"/transactions/analysis/by-category?business_id={business_id}"),
+        ("GET /businesses/", "/businesses/"),
+        ("GET /credit/business/{id}", f"/credit/business/{business_id}"),
+    ])
+    return name, "GET", path, token, None
+
+def entry(rng: random.Random, data):
+    token, business_id = rng.choice(data["tenants"])
+    is_income = rng.random() < 0.6
+    body = {
+        "amount": round(rng.lognormvariate(7.0 if is_income else 6.5, 0.6), 2),
+        "type": "income" if is_income else "expense",
+        "category": rng.choice(INCOME_CATEGORIES if is_income else EXPENSE_CATEGORIES),
+        "description": "load test entry",
+        "business_id": business_id,
+    }
+    return "POST /transactions/", "POST", "/transactions/", token, body
+
+def forecast(rng: random.Random, data):
+    token, business_id = rng.choice(data["tenants"])
+    # Widgets ask for 7 days far more often than the full 30-day view
+    name, path = rng.choices([
+        ("GET /forecast/{id}/7days", f"/forecast/{business_id}/7days"),
+        ("GET /forecast/{id}/30days", f"/forecast/{business_id}/30days"),
+        ("GET /forecast/{id}/risk-alert", f"/forecast/{business_id}/risk-alert"),
+    ], weights=[6, 2, 2])[0]
+    return name, "GET", path, token, None
+
+def lender(rng: random.Random, data):
+    token = rng.choice(data["lenders"])
+    _, business_id = rng.choice(data["tenants"])
+    name, path = rng.choice([
+        ("GET /credit/lender/businesses", "/credit/lender/businesses?limit=50"),
+        ("GET /credit/lender/business/{id}", f"/credit/lender/business/{business_id}"),
+    ])
+    return name, "GET", path, token, None
+
+SCENARIOS = {"dashboard": dashboard, "entry": entry, "forecast": forecast, "lender": lender}
+
+
+# ----------------------------------------------------------------------
+# Driver
+
+def percentile(sorted_values, q: float):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+async def run_load(client: httpx.AsyncClient, data, mix: dict, virtual_users: int,
+                   duration: float, warmup: float, seed: int):
+    """Virtual users loop over the mix; only requests started after the warm-up are recorded"""
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    names, weights = list(mix), list(mix.values())
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    async def virtual_user(index: int):
+        rng = random.Random(seed + index)
+        while True:
+            request_started = time.perf_counter()
+            if request_started >= stop_at:
+                return
+            scenario = SCENARIOS[rng.choices(names, weights=weights)[0]]
+            name, method, path, token, body = scenario(rng, data)
+            try:
+                response = await client.request(method, path, json=body,
+                                                headers={"Authorization": f"Bearer {token}"})
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            if request_started >= measure_from:
+                latencies[name].append(time.perf_counter() - request_started)
+                if failed:
+                    errors[name] += 1
+
+    await asyncio.gather(*(virtual_user(i) for i in range(virtual_users)))
+    elapsed = time.perf_counter() - measure_from
+
+    report = {}
+    for name in sorted(latencies):
+        values = sorted(latencies[name])
+        report[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    everything = sorted(v for values in latencies.values() for v in values)
+    report["TOTAL"] = {
+        "requests": len(everything),
+        "errors": sum(errors.values()),
+        "rps": len(everything) / elapsed,
+        "p50_ms": percentile(everything, 50) * 1000,
+        "p95_ms": percentile(everything, 95) * 1000,
+        "p99_ms": percentile(everything, 99) * 1000,
+    }
+    return report
+
+
+def compare(report: dict, baseline: dict):
+    """Percent change in throughput and p95 per endpoint"""
+    changes = {}
+    for name, stats in report.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        changes[name] = {
+            "rps_change_pct": (stats["rps"] - before["rps"]) / (before["rps"] or 1e-9) * 100,
+            "p95_change_pct": (stats["p95_ms"] - before["p95_ms"]) / (before["p95_ms"] or 1e-9) * 100,
+        }
+    return changes
+
+
+def parse_mix(text: str):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r} - choose from {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test with synthetic tenants")
+    parser.add_argument("--users", type=int, default=20, help="Business owners to seed")
+    parser.add_argument("--businesses", type=int, default=2, help="Businesses per owner")
+    parser.add_argument("--transactions", type=int, default=2000, help="Transactions per business")
+    parser.add_argument("--lenders", type=int, default=3)
+    parser.add_argument("--history-days", type=int, default=180, help="Spread of seeded transactions")
+    parser.add_argument("--virtual-users", type=int, default=50, help="Concurrent simulated clients")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Scenario weights, e.g. dashboard=50,entry=30,forecast=12,lender=8")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for data and traffic")
+    parser.add_argument("--base-url", help="Running server to test instead of the in-process app")
+    parser.add_argument("--save", help="Write the report to this JSON file")
+    parser.add_argument("--baseline", help="Compare with a report saved by --save")
+    parser.add_argument("--fail-on-regression", type=float, metavar="PCT",
+                        help="Exit 1 if total p95 rises or throughput falls by more than PCT percent")
+    args = parser.parse_args()
+
+    data = seed(args.users, args.businesses, args.transactions, args.lenders,
+                args.history_days, np.random.default_rng(args.seed))
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=120)
+        target = args.base_url
+    else:
+        # App errors are counted, not raised
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        client = httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120)
+        target = "in-process"
+
+    print(f"Database: {engine.url.get_backend_name()} | target={target} | virtual users={args.virtual_users} "
+          f"| {args.duration:.0f}s after {args.warmup:.0f}s warm-up | mix={args.mix}")
+
+    async def run_all():
+        async with client:
+            return await run_load(client, data, args.mix, args.virtual_users,
+                                  args.duration, args.warmup, args.seed)
+
+    report = asyncio.run(run_all())
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["endpoints"]
+    changes = compare(report, baseline) if baseline else {}
+
+    print(f"\n{'endpoint':<42}{'reqs':>7}{'err':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          + (f"{'Δreq/s %':>10}{'Δp95 %':>9}" if baseline else ""))
+    for name, stats in report.items():
+        line = (f"{name:<42}{stats['requests']:>7}{stats['errors']:>6}{stats['rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+        if name in changes:
+            line += f"{changes[name]['rps_change_pct']:>+10.1f}{changes[name]['p95_change_pct']:>+9.1f}"
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+                "config": {key: value for key, value in vars(args).items()
+                           if key not in ("save", "baseline", "fail_on_regression")},
+                "database": engine.url.get_backend_name(),
+                "endpoints": report,
+            }, f, indent=2)
+        print(f"\n💾 Report saved to {args.save}")
+
+    if args.fail_on_regression is not None and "TOTAL" in changes:
+        total = changes["TOTAL"]
+        if total["p95_change_pct"] > args.fail_on_regression or -total["rps_change_pct"] > args.fail_on_regression:
+            print(f"⚠️ Regression beyond {args.fail_on_regression}% against {args.baseline}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
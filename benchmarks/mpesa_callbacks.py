@@ -0,0 +1,205 @@
+"""
+M-Pesa callback burst simulator
+
+Plays the part of Safaricom: fires a burst of C2B confirmations and STK
+callbacks at POST /webhooks/mpesa - including retried (duplicate) receipts,
+cancelled STK pushes and payments to unregistered shortcodes - and reports
+acknowledgement latency. In-process runs then drain the inbox and check that
+every unique, successful, matched receipt became exactly one transaction.
+
+Requests go through the app in-process (httpx ASGI transport) unless --base-url
+points at a running server; then run `python -m app.mpesa consume` (or the server with
+MPESA_CONSUMER_IN_PROCESS=true) to drain it.
+
+Usage:
+    python benchmarks/mpesa_callbacks.py --callbacks 20000 --concurrency 100
+    python benchmarks/mpesa_callbacks.py --duplicates 0.2 --stk 0.3
+    python benchmarks/mpesa_callbacks.py --base-url http://localhost:8000 --shortcode 600100
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use a throwaway SQLite database unless one is configured
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/mpesa_callbacks.db"
+# The in-process app refuses callbacks without a configured token
+os.environ.setdefault("MPESA_WEBHOOK_TOKEN", "bench-token")
+
+import httpx
+
+from app import auth, models, mpesa
+from app.database import Base, engine, SessionLocal
+from app.main import app
+
+UNKNOWN_SHORTCODE = "999999"
+
+
+def register_shortcode(shortcode: str) -> int:
+    """A business that owns the shortcode; returns its id"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        account = db.query(models.MpesaAccount).filter(models.MpesaAccount.shortcode == shortcode).first()
+        if account:
+            return account.business_id
+        user = models.User(email=f"mpesa-{shortcode}-{time.time_ns()}@load.test",
+                           hashed_password=auth.hash_password("load-test"))
+        db.add(user)
+        db.flush()
+        business = models.Business(name=f"Paybill {shortcode}", owner_id=user.id)
+        db.add(business)
+        db.flush()
+        db.add(models.MpesaAccount(shortcode=shortcode, business_id=business.id))
+        db.commit()
+        return business.id
+    finally:
+        db.close()
+
+
+def c2b_payload(receipt: str, amount: int, when: datetime, shortcode: str) -> dict:
+    return {
+        "TransactionType": "Pay Bill",
+        "TransID": receipt,
+        "TransTime": when.strftime("%Y%m%d%H%M%S"),
+        "TransAmount": str(amount),
+        "BusinessShortCode": shortcode,
+        "BillRefNumber": f"INV{random.randint(1000, 9999)}",
+        "MSISDN": "2547****" + str(random.randint(1000, 9999)),
+        "FirstName": "Test",
+    }
+
+
+def stk_payload(receipt: str, amount: int, when: datetime, success: bool) -> dict:
+    callback = {
+        "MerchantRequestID": f"{random.randint(10000, 99999)}-{random.randint(1000000, 9999999)}-1",
+        "CheckoutRequestID": f"ws_CO_{when:%d%m%Y%H%M%S}{random.randint(100, 999)}",
+        "ResultCode": 0 if success else 1032,
+        "ResultDesc": "The service request is processed successfully." if success else "Request cancelled by user",
+    }
+    if success:
+        callback["CallbackMetadata"] = {"Item": [
+            {"Name": "Amount", "Value": amount},
+            {"Name": "MpesaReceiptNumber", "Value": receipt},
+            {"Name": "TransactionDate", "Value": int(when.strftime("%Y%m%d%H%M%S"))},
+            {"Name": "PhoneNumber", "Value": 254700000000 + random.randint(0, 999999)},
+        ]}
+    return {"Body": {"stkCallback": callback}}
+
+
+def build_burst(count: int, shortcode: str, duplicates: float, stk: float, cancelled: float,
+                unknown: float, rng: random.Random):
+    """(url params, payload) per callback, plus the number of receipts that should be booked"""
+    now = datetime.now()
+    sent, expected = [], set()
+    for i in range(count):
+        if sent and rng.random() < duplicates:
+            # Retried delivery of an earlier callback
+            sent.append(rng.choice(sent))
+            continue
+        receipt = "".join(rng.choices(string.ascii_uppercase + string.digits, k=10))
+        amount = rng.randint(50, 20000)
+        when = now - timedelta(seconds=rng.randint(0, 3600))
+        if rng.random() < stk:
+            success = rng.random() >= cancelled
+            sent.append(({"shortcode": shortcode}, stk_payload(receipt, amount, when, success)))
+            if success:
+                expected.add(receipt)
+        else:
+            target = UNKNOWN_SHORTCODE if rng.random() < unknown else shortcode
+            sent.append(({}, c2b_payload(receipt, amount, when, target)))
+            if target == shortcode:
+                expected.add(receipt)
+    return sent, expected
+
+
+def percentile(sorted_values, q: float):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def fire(client: httpx.AsyncClient, burst, concurrency: int, token: str = None):
+    """Send the burst with `concurrency` callbacks in flight; returns latencies and status counts"""
+    queue = asyncio.Queue()
+    for item in burst:
+        queue.put_nowait(item)
+    latencies, statuses = [], {}
+
+    async def sender():
+        while not queue.empty():
+            params, payload = queue.get_nowait()
+            if token:
+                params = {**params, "token": token}
+            started = time.perf_counter()
+            response = await client.post("/webhooks/mpesa", params=params, json=payload)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+    return sorted(latencies), statuses, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate an M-Pesa callback burst")
+    parser.add_argument("--callbacks", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--shortcode", default="600100")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="Share of retried deliveries")
+    parser.add_argument("--stk", type=float, default=0.3, help="Share of STK callbacks (rest are C2B)")
+    parser.add_argument("--cancelled", type=float, default=0.1, help="Share of STK pushes that fail")
+    parser.add_argument("--unknown", type=float, default=0.02, help="Share of C2B to unregistered shortcodes")
+    parser.add_argument("--token", default=os.environ["MPESA_WEBHOOK_TOKEN"])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    business_id = register_shortcode(args.shortcode)
+    burst, expected = build_burst(args.callbacks, args.shortcode, args.duplicates, args.stk,
+                                  args.cancelled, args.unknown, rng)
+
+    async def run():
+        if args.base_url:
+            client = httpx.AsyncClient(base_url=args.base_url, timeout=30)
+        else:
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=30)
+        async with client:
+            return await fire(client, burst, args.concurrency, args.token)
+
+    latencies, statuses, elapsed = asyncio.run(run())
+    print(f"📨 {len(burst):,} callbacks in {elapsed:.1f}s ({len(burst) / elapsed:,.0f}/s), responses {statuses}")
+    print(f"   ack latency p50 {percentile(latencies, 0.5):.1f} ms, p95 {percentile(latencies, 0.95):.1f} ms, "
+          f"p99 {percentile(latencies, 0.99):.1f} ms")
+
+    db = SessionLocal()
+    try:
+        if not args.base_url:
+            started = time.perf_counter()
+            totals = mpesa.drain(db)
+            elapsed = time.perf_counter() - started
+            print(f"⚙️  Drained in {elapsed:.1f}s ({len(burst) / elapsed:,.0f} callbacks/s): {totals}")
+        print(f"   inbox: {mpesa.stats(db)}")
+
+        booked = db.query(models.MpesaPayment.receipt_number).filter(
+            models.MpesaPayment.business_id == business_id,
+            models.MpesaPayment.receipt_number.in_(expected)
+        ).count() if expected else 0
+        print(f"{'✅' if booked == len(expected) else '❌'} {booked:,} of {len(expected):,} unique receipts booked"
+              + (" (refused callbacks are not retried)" if statuses.get(503) else ""))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
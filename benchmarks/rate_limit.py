@@ -0,0 +1,115 @@
+"""
+Rate limiter overhead per check
+
+Times the memory backend's token-bucket check on one hot key and across many
+client keys, the cached token -> user lookup, and the whole enforce_rate_limit
+dependency (identity, cost lookup, bucket, headers) - all without HTTP.
+--redis also times the shared backend against RATE_LIMIT_URL.
+
+Two budgets, both enforced (exit 1 when over):
+    --max-ns             the bare MemoryBuckets.consume call only (sub-microsecond)
+    --max-dependency-ns  enforce_rate_limit per request - what a request actually
+                         pays, including Request construction and the await
+
+Usage:
+    python benchmarks/rate_limit.py --checks 1000000
+    python benchmarks/rate_limit.py --redis --checks 10000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use a throwaway SQLite database unless one is configured
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_rate_limit.db"
+
+from starlette.requests import Request
+
+from app import auth
+from app.middleware import rate_limit
+from app.middleware.rate_limit import MemoryBuckets, RedisBuckets, token_subject, enforce_rate_limit
+
+
+def per_check(label: str, checks: int, run, rounds: int = 3) -> float:
+    """ns per check of run(checks), best of `rounds` (scheduler noise only ever adds time)"""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run(checks)
+        best = min(best, time.perf_counter() - started)
+    ns = best / checks * 1e9
+    print(f"{label:<38}{ns:>10,.0f} ns/check")
+    return ns
+
+
+def bucket_loop(buckets, keys):
+    def run(checks):
+        consume = buckets.consume
+        for i in range(checks):
+            # Refill fast enough that nothing is refused - the allowed path is the common one
+            consume(keys[i % len(keys)], 1, 1e9, 1e9)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter overhead per check")
+    parser.add_argument("--checks", type=int, default=1_000_000)
+    parser.add_argument("--clients", type=int, default=10_000)
+    parser.add_argument("--max-ns", type=float, default=1000, help="Budget for one bare memory bucket check")
+    parser.add_argument("--max-dependency-ns", type=float, default=20000,
+                        help="Budget for one enforce_rate_limit call (the whole per-request cost)")
+    parser.add_argument("--redis", action="store_true", help="Also time RedisBuckets at RATE_LIMIT_URL")
+    args = parser.parse_args()
+
+    keys = [f"u:user{i}@bench.test" for i in range(args.clients)]
+    bucket_ns = max(
+        per_check("memory bucket, one client", args.checks, bucket_loop(MemoryBuckets(), keys[:1])),
+        per_check(f"memory bucket, {args.clients:,} clients", args.checks, bucket_loop(MemoryBuckets(), keys)),
+    )
+
+    header = f"Bearer {auth.create_access_token({'sub': 'bench@smartpesa.test'})}"
+    token_subject(header)
+    per_check("token -> user (cached)", args.checks, lambda n: [token_subject(header) for _ in range(n)])
+
+    # Whole dependency on a bare request - cost 1, signed-in user
+    rate_limit._buckets = MemoryBuckets()
+    rate_limit.RATE_LIMIT_USER_CAPACITY = rate_limit.RATE_LIMIT_USER_REFILL = 1e9
+    scope = {"type": "http", "method": "GET", "path": "/transactions/", "headers": [
+        (b"authorization", header.encode())
+    ], "client": ("10.0.0.1", 50000), "query_string": b""}
+
+    async def dependency(n):
+        for _ in range(n):
+            await enforce_rate_limit(Request(scope))
+    dependency_ns = per_check("enforce_rate_limit (dependency)", args.checks // 10,
+                              lambda n: asyncio.run(dependency(n)))
+
+    if args.redis:
+        async def redis_checks(n):
+            # A fresh client per run - redis.asyncio connections belong to one event loop
+            buckets = RedisBuckets()
+            for i in range(n):
+                await buckets.consume(keys[i % len(keys)], 1, 1e9, 1e9)
+        per_check("redis bucket (network round trip)", args.checks // 100,
+                  lambda n: asyncio.run(redis_checks(n)), rounds=1)
+
+    over = False
+    for label, ns, budget in (("memory bucket check (bucket only)", bucket_ns, args.max_ns),
+                              ("enforce_rate_limit per request", dependency_ns, args.max_dependency_ns)):
+        if ns > budget:
+            print(f"❌ {label} {ns:,.0f} ns is over the {budget:,.0f} ns budget")
+            over = True
+        else:
+            print(f"✅ {label} within {budget:,.0f} ns")
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+SQLite concurrent read/write throughput: default rollback journal vs tuned pragmas
+
+Runs reader threads (daily-totals style aggregate) and writer threads
+(single-row inserts, one commit each) against the same database file for a
+fixed duration, once with SQLite defaults and once with the pragmas from
+app/db_config.py.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py --readers 8 --writers 2 --seconds 10
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+
+from app.db_config import SQLITE_PRAGMAS, apply_sqlite_pragmas, engine_kwargs
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "busy_timeout": SQLITE_PRAGMAS["busy_timeout"],
+}
+
+SCHEMA = """
+CREATE TABLE transactions (
+    id INTEGER PRIMARY KEY,
+    amount FLOAT NOT NULL,
+    type VARCHAR NOT NULL,
+    category VARCHAR NOT NULL,
+    business_id INTEGER NOT NULL,
+    created_at DATETIME
+)
+"""
+
+READ_SQL = text("""
+    SELECT date(created_at) AS d,
+           SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END),
+           SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END)
+    FROM transactions
+    WHERE business_id = :business_id AND created_at >= :start
+    GROUP BY d
+""")
+
+WRITE_SQL = text("""
+    INSERT INTO transactions (amount, type, category, business_id, created_at)
+    VALUES (:amount, :type, 'Sales', :business_id, :created_at)
+""")
+
+
+def make_engine(path: str, pragmas: dict):
+    url = f"sqlite:///{path}"
+    engine = create_engine(url, **engine_kwargs(url))
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    return engine
+
+
+def seed(engine, rows: int):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA))
+        conn.execute(text("CREATE INDEX ix_tx_business_created ON transactions (business_id, created_at)"))
+        conn.execute(WRITE_SQL, [
+            {"amount": 100 + i % 50, "type": "income" if i % 3 else "expense",
+             "business_id": i % 10, "created_at": now - timedelta(minutes=i)}
+            for i in range(rows)
+        ])
+
+
+def run(engine, readers: int, writers: int, seconds: float):
+    stop = time.monotonic() + seconds
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    start = datetime.utcnow() - timedelta(days=30)
+
+    def reader(n):
+        done = errors = 0
+        while time.monotonic() < stop:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(READ_SQL, {"business_id": n % 10, "start": start}).all()
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counts["reads"] += done
+            counts["errors"] += errors
+
+    def writer(n):
+        done = errors = 0
+        while time.monotonic() < stop:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(WRITE_SQL, {"amount": 10, "type": "income", "business_id": n % 10,
+                                             "created_at": datetime.utcnow()})
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counts["writes"] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite journal mode concurrency benchmark")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"readers={args.readers} writers={args.writers} seconds={args.seconds} rows={args.rows}")
+    print(f"{'mode':<10}{'reads/s':>10}{'writes/s':>10}{'errors':>8}")
+    for name, pragmas in (("default", DEFAULT_PRAGMAS), ("tuned", SQLITE_PRAGMAS)):
+        path = os.path.join(tempfile.mkdtemp(), f"bench_{name}.db")
+        engine = make_engine(path, pragmas)
+        seed(engine, args.rows)
+        counts = run(engine, args.readers, args.writers, args.seconds)
+        engine.dispose()
+        print(
+            f"{name:<10}{counts['reads'] / args.seconds:>10.1f}"
+            f"{counts['writes'] / args.seconds:>10.1f}{counts['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-const API_BASE = "https://smartpesa-api.onrender.com";
+// API_BASE comes from js/config.js
 console.log('App starting');
 console.log('API:', API_BASE);
 
@@ -14,7 +14,7 @@ document.getElementById('login-form')?.addEventListener('submit', async (e) => {
         const data = await res.json();
         if (res.ok) {
             localStorage.setItem('authToken', data.access_token);
-            window.location.href = '/dashboard.html';
+            showDashboard();
         } else alert('Login failed');
     } catch (err) {
         alert('Network error');
@@ -32,3 +32,148 @@ document.getElementById('show-login')?.addEventListener('click', (e) => {
     document.getElementById('register-screen').classList.remove('active');
     document.getElementById('login-screen').classList.add('active');
 });
+
+// Dashboard - everything on the dashboard screen comes from one GET /dashboard/{id}
+const DASHBOARD_WIDGETS = 'summary,daily,recent,forecast';
+const charts = {};
+
+function formatKES(amount) {
+    return 'KES ' + Number(amount || 0).toLocaleString(undefined, {maximumFractionDigits: 2});
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text ?? '';
+    return div.innerHTML;
+}
+
+async function apiGet(path) {
+    const res = await fetch(API_BASE + path, {
+        headers: {'Authorization': 'Bearer ' + localStorage.getItem('authToken')}
+    });
+    if (res.status === 401) {
+        logout();
+        throw new Error('Session expired');
+    }
+    if (!res.ok) throw Object.assign(new Error(`${path}: ${res.status}`), {status: res.status});
+    return res.json();
+}
+
+function showDashboard() {
+    const screen = document.getElementById('dashboard-screen');
+    if (!screen) {
+        window.location.href = '/';
+        return;
+    }
+    document.querySelectorAll('.screen').forEach(s => s.classList.remove('active'));
+    screen.classList.add('active');
+    loadDashboard(localStorage.getItem('businessId'));
+}
+
+async function loadDashboard(businessId) {
+    try {
+        if (!businessId) {
+            // First visit - start with the user's first business
+            const businesses = await apiGet('/businesses/');
+            if (!businesses.length) {
+                renderRecent([]);
+                return;
+            }
+            businessId = businesses[0].id;
+        }
+        let dashboard;
+        try {
+            dashboard = await apiGet(`/dashboard/${businessId}?widgets=${DASHBOARD_WIDGETS}`);
+        } catch (err) {
+            // Remembered business was deleted or belongs to someone else
+            if (err.status !== 404 || !localStorage.getItem('businessId')) throw err;
+            localStorage.removeItem('businessId');
+            return loadDashboard(null);
+        }
+        localStorage.setItem('businessId', businessId);
+        renderDashboard(dashboard);
+    } catch (err) {
+        console.log('Dashboard load failed:', err);
+    }
+}
+
+function renderDashboard(dashboard) {
+    const select = document.getElementById('business-select');
+    select.innerHTML = dashboard.businesses
+        .map(b => `<option value="${b.id}">${escapeHtml(b.name)}</option>`).join('');
+    select.value = dashboard.business_id;
+
+    const summary = dashboard.summary;
+    document.getElementById('total-income').textContent = formatKES(summary.total_income);
+    document.getElementById('total-expense').textContent = formatKES(summary.total_expense);
+    document.getElementById('net-cashflow').textContent = formatKES(summary.net_cashflow);
+    const risk = dashboard.forecast?.['30days']?.risk_analysis;
+    document.getElementById('risk-score').textContent = risk ? risk.risk_score : 'N/A';
+
+    renderChart('cashflow-chart', {
+        type: 'line',
+        data: {
+            labels: dashboard.daily.map(d => d.date),
+            datasets: [{label: 'Net cash flow', data: dashboard.daily.map(d => d.net),
+                        borderColor: '#4F46E5', fill: false, tension: 0.3}]
+        },
+        options: {responsive: true, maintainAspectRatio: false}
+    });
+    renderChart('category-chart', {
+        type: 'doughnut',
+        data: {
+            labels: ['Income', 'Expenses'],
+            datasets: [{data: [summary.total_income, summary.total_expense],
+                        backgroundColor: ['#16a34a', '#dc2626']}]
+        },
+        options: {responsive: true, maintainAspectRatio: false}
+    });
+
+    renderRecent(dashboard.recent);
+}
+
+function renderChart(canvasId, config) {
+    if (typeof Chart === 'undefined') return;
+    charts[canvasId]?.destroy();
+    charts[canvasId] = new Chart(document.getElementById(canvasId), config);
+}
+
+function renderRecent(transactions) {
+    const body = document.getElementById('recent-transactions-body');
+    if (!transactions.length) {
+        body.innerHTML = '<tr><td colspan="5">No transactions yet</td></tr>';
+        return;
+    }
+    body.innerHTML = transactions.map(t => `
+        <tr>
+            <td>${new Date(t.created_at).toLocaleDateString()}</td>
+            <td>${escapeHtml(t.description)}</td>
+            <td>${escapeHtml(t.category)}</td>
+            <td>${formatKES(t.amount)}</td>
+            <td>${escapeHtml(t.type)}</td>
+        </tr>`).join('');
+}
+
+document.getElementById('business-select')?.addEventListener('change', (e) => {
+    if (e.target.value) loadDashboard(e.target.value);
+});
+
+if (localStorage.getItem('authToken') && document.getElementById('dashboard-screen')) {
+    showDashboard();
+}
+
+// Logout - drop the token and this user's cached API responses
+function logout() {
+    localStorage.removeItem('authToken');
+    localStorage.removeItem('businessId');
+    navigator.serviceWorker?.controller?.postMessage({type: 'logout'});
+    window.location.href = '/';
+}
+
+document.getElementById('logout-btn')?.addEventListener('click', logout);
+
+// Offline support and cached dashboard reads
+if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.register('/sw.js')
+        .catch(err => console.log('Service worker registration failed:', err));
+}
@@ -1,14 +1,36 @@
-// SmartPesa Service Worker - Fixed Version
-const CACHE_NAME = 'smartpesa-v1';
+// SmartPesa Service Worker
+const CACHE_NAME = 'smartpesa-v3';
+// One API cache per signed-in user: smartpesa-api-<user hash>
+const API_CACHE_PREFIX = 'smartpesa-api-';
 const urlsToCache = [
   '/',
   '/index.html',
-  '/css/styles.css',
+  '/js/config.js',
   '/js/app.js',
   'https://cdn.jsdelivr.net/npm/chart.js',
   'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css'
 ];
 
+// API routes - the API may live on another origin (port 8000, onrender.com)
+const API_PREFIXES = [
+  '/users/', '/businesses/', '/transactions/', '/forecast/', '/inventory/',
+  '/suppliers/', '/credit/', '/sync/', '/webhooks/', '/password/', '/dashboard/'
+];
+// Dashboard reads: answer from cache at once, revalidate with the ETag in the background
+const STALE_WHILE_REVALIDATE = [
+  /\/dashboard\/\d+$/,
+  /\/transactions\/summary\/overview$/,
+  /\/transactions\/analysis\/daily-totals$/,
+  /\/transactions\/analysis\/by-category$/,
+  /\/forecast\/\d+\/(7days|30days|risk-alert)$/
+];
+// Never cached
+const NO_CACHE = [/^\/users\/(login|register)/, /^\/password\//, /^\/webhooks\//];
+
+function isApiRequest(url) {
+  return url.port === '8000' || API_PREFIXES.some(prefix => url.pathname.startsWith(prefix));
+}
+
 // Install service worker
 self.addEventListener('install', event => {
   console.log('Service Worker installing...');
@@ -21,20 +43,115 @@ self.addEventListener('install', event => {
   );
 });
 
-// IMPORTANT: Only cache static assets, NEVER API calls
+// Cache name for the user behind the request's bearer token (null without one)
+async function userCacheName(request) {
+  const auth = request.headers.get('Authorization');
+  if (!auth) return null;
+  // Key by the token's subject so a fresh login reuses the same cache
+  let identity = auth;
+  try {
+    identity = JSON.parse(atob(auth.split(' ')[1].split('.')[1].replace(/-/g, '+').replace(/_/g, '/'))).sub || auth;
+  } catch (e) {
+    // Not a JWT - fall back to the header itself
+  }
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(identity));
+  const hex = Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+  return API_CACHE_PREFIX + hex.slice(0, 16);
+}
+
+async function clearApiCaches(only) {
+  const names = await caches.keys();
+  await Promise.all(
+    names.filter(name => name.startsWith(API_CACHE_PREFIX) && (!only || name === only))
+      .map(name => caches.delete(name))
+  );
+}
+
+async function notifyClients(message) {
+  const clients = await self.clients.matchAll({ type: 'window' });
+  clients.forEach(client => client.postMessage(message));
+}
+
+function cacheable(response) {
+  return response.status === 200 && !(response.headers.get('Cache-Control') || '').includes('no-store');
+}
+
+// Refresh a cached entry - a 304 keeps it, a 200 replaces it and tells the page
+async function revalidate(request, cache, cached) {
+  const headers = new Headers(request.headers);
+  const etag = cached && cached.headers.get('ETag');
+  if (etag) headers.set('If-None-Match', etag);
+  const response = await fetch(new Request(request, { headers }));
+  if (response.status === 401) {
+    await clearApiCaches(await userCacheName(request));
+  } else if (cacheable(response)) {
+    await cache.put(request, response.clone());
+    if (cached) notifyClients({ type: 'api-updated', url: request.url });
+  }
+  return response;
+}
+
+async function staleWhileRevalidate(event, cacheName) {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(event.request, { ignoreVary: true });
+  const refresh = revalidate(event.request, cache, cached);
+  if (cached) {
+    event.waitUntil(refresh.catch(() => {}));
+    return cached;
+  }
+  return refresh;
+}
+
+// Other reads: network first, cached copy when offline
+async function networkFirst(event, cacheName) {
+  const cache = await caches.open(cacheName);
+  try {
+    const response = await fetch(event.request);
+    if (response.status === 401) {
+      await clearApiCaches(cacheName);
+    } else if (cacheable(response)) {
+      await cache.put(event.request, response.clone());
+    }
+    return response;
+  } catch (err) {
+    const cached = await cache.match(event.request, { ignoreVary: true });
+    if (cached) return cached;
+    throw err;
+  }
+}
+
+// Writes go to the network; a successful one makes the user's cached reads stale
+async function networkWrite(event) {
+  const cacheName = await userCacheName(event.request);
+  const response = await fetch(event.request);
+  if (response.ok && cacheName) {
+    await clearApiCaches(cacheName);
+  }
+  return response;
+}
+
+async function handleApi(event, url) {
+  if (event.request.method !== 'GET') {
+    return networkWrite(event);
+  }
+  const cacheName = await userCacheName(event.request);
+  if (!cacheName || NO_CACHE.some(pattern => pattern.test(url.pathname))) {
+    return fetch(event.request);
+  }
+  if (STALE_WHILE_REVALIDATE.some(pattern => pattern.test(url.pathname))) {
+    return staleWhileRevalidate(event, cacheName);
+  }
+  return networkFirst(event, cacheName);
+}
+
 self.addEventListener('fetch', event => {
   const url = new URL(event.request.url);
-  
-  // Skip API calls - let them go to network
-  if (url.pathname.startsWith('/users/') || 
-      url.pathname.startsWith('/businesses/') || 
-      url.pathname.startsWith('/transactions/') || 
-      url.pathname.startsWith('/forecast/') ||
-      url.port === '8000') {
-    // Just pass through to network, don't cache
+
+  if (isApiRequest(url)) {
+    event.respondWith(handleApi(event, url));
     return;
   }
-  
+
   // For static assets, try cache first
   event.respondWith(
     caches.match(event.request)
@@ -47,6 +164,13 @@ self.addEventListener('fetch', event => {
   );
 });
 
+// The page posts {type: 'logout'} when the user signs out
+self.addEventListener('message', event => {
+  if (event.data && event.data.type === 'logout') {
+    event.waitUntil(clearApiCaches());
+  }
+});
+
 // Clean up old caches
 self.addEventListener('activate', event => {
   console.log('Service Worker activating...');
@@ -54,7 +178,7 @@ self.addEventListener('activate', event => {
     caches.keys().then(cacheNames => {
       return Promise.all(
         cacheNames.map(cacheName => {
-          if (cacheName !== CACHE_NAME) {
+          if (cacheName !== CACHE_NAME && !cacheName.startsWith(API_CACHE_PREFIX)) {
             return caches.delete(cacheName);
           }
         })
@@ -3,6 +3,7 @@ Database configuration for SmartPesa - XAMPP MySQL
 """
 
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -20,6 +21,9 @@ DB_NAME = os.getenv("DB_NAME", "smartpesa_db")
 # MySQL Connection URL
 DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Same database through the aiomysql driver, for async route handlers
+ASYNC_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
 print(f"🔌 Connecting to MySQL database: {DB_NAME} on {DB_HOST}:{DB_PORT} as {DB_USER}")
 
 # Create engine with MySQL-specific settings
@@ -32,8 +36,23 @@ engine = create_engine(
     echo=False
 )
 
+# Async engine - concurrency of async routes is bounded by this pool
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    pool_size=5,
+    max_overflow=10,
+    echo=False
+)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# expire_on_commit=False so committed objects can be serialized without a lazy reload
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -44,6 +63,11 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Get async database session - dependency for async FastAPI routes"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def check_connection():
     """Test MySQL database connection"""
     try:
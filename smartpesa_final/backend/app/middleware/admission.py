@@ -0,0 +1,48 @@
+"""
+Admission control for heavy endpoints
+
+Each endpoint class has a limit on requests in flight in this worker. Requests
+over the limit wait up to ADMISSION_MAX_WAIT_SECONDS for a slot and then get a
+fast 503 with Retry-After, instead of piling up and timing out together.
+
+    reports - CSV exports (whole tables read and encoded in memory)
+
+    @router.get(..., dependencies=[admission("reports")])
+"""
+import asyncio
+import os
+from fastapi import Depends, HTTPException, status
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# How long a request may wait for a slot before it gets 503
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "5"))
+# class: requests in flight per worker
+ADMISSION_LIMITS = {
+    "reports": int(os.getenv("ADMISSION_REPORTS_LIMIT", "2")),
+}
+
+_slots = {name: asyncio.Semaphore(max(1, limit)) for name, limit in ADMISSION_LIMITS.items()}
+
+
+def admission(name: str):
+    """Route dependency holding a slot of the named class for the whole request"""
+    slots = _slots[name]
+
+    async def admit():
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        try:
+            await asyncio.wait_for(slots.acquire(), ADMISSION_MAX_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Server busy: too many {name} requests in progress. Please retry later.",
+                headers={"Retry-After": str(max(1, int(ADMISSION_MAX_WAIT_SECONDS)))}
+            )
+        try:
+            yield
+        finally:
+            slots.release()
+
+    return Depends(admit)
@@ -3,16 +3,16 @@ Analytics routes for SmartPesa API
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
 from typing import Optional
 from datetime import datetime, timedelta
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
 from app.models.transaction import Transaction
 from app.models.business import Business
-from app.utils.auth import get_current_user
+from app.utils.auth import get_current_user_async
 from app.utils.validators import validate_business_access
 
 router = APIRouter()
@@ -21,8 +21,8 @@ router = APIRouter()
 async def revenue_trends(
     business_id: int = Query(...),
     months: int = 6,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Analyze revenue trends"""
     await validate_business_access(business_id, current_user.id, db)
@@ -30,12 +30,15 @@ async def revenue_trends(
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=30 * months)
     
-    transactions = db.query(Transaction).filter(
-        Transaction.business_id == business_id,
-        Transaction.type == 'income',
-        Transaction.created_at >= start_date,
-        Transaction.created_at <= end_date
-    ).all()
+    result = await db.execute(
+        select(Transaction.created_at, Transaction.amount).filter(
+            Transaction.business_id == business_id,
+            Transaction.type == 'income',
+            Transaction.created_at >= start_date,
+            Transaction.created_at <= end_date
+        )
+    )
+    transactions = result.all()
     
     # Group by month
     monthly_data = {}
@@ -57,8 +60,8 @@ async def revenue_trends(
 async def expense_analysis(
     business_id: int = Query(...),
     months: int = 6,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Analyze expense patterns"""
     await validate_business_access(business_id, current_user.id, db)
@@ -66,12 +69,15 @@ async def expense_analysis(
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=30 * months)
     
-    expenses = db.query(Transaction).filter(
-        Transaction.business_id == business_id,
-        Transaction.type == 'expense',
-        Transaction.created_at >= start_date,
-        Transaction.created_at <= end_date
-    ).all()
+    result = await db.execute(
+        select(Transaction.category, Transaction.amount).filter(
+            Transaction.business_id == business_id,
+            Transaction.type == 'expense',
+            Transaction.created_at >= start_date,
+            Transaction.created_at <= end_date
+        )
+    )
+    expenses = result.all()
     
     # By category
     by_category = {}
@@ -3,14 +3,15 @@ Notifications routes for SmartPesa API
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import datetime
 from pydantic import BaseModel
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import User, Notification
-from app.utils.auth import get_current_user
+from app.utils.auth import get_current_user_async
 from app.utils.validators import validate_business_access
 
 router = APIRouter()
@@ -30,20 +31,25 @@ async def get_notifications(
     unread_only: bool = Query(False),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Get notifications for a business"""
     # Verify business access
     business = await validate_business_access(business_id, current_user.id, db)
     
-    query = db.query(Notification).filter(Notification.business_id == business_id)
+    query = select(Notification).filter(Notification.business_id == business_id)
     
     if unread_only:
         query = query.filter(Notification.is_read == False)
     
-    total = query.count()
-    notifications = query.order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
+    total = (await db.execute(
+        select(func.count()).select_from(query.subquery())
+    )).scalar_one()
+    result = await db.execute(
+        query.order_by(Notification.created_at.desc()).offset(skip).limit(limit)
+    )
+    notifications = result.scalars().all()
     
     return {
         "success": True,
@@ -56,11 +62,12 @@ async def get_notifications(
 @router.get("/{notification_id}")
 async def get_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Get a specific notification"""
-    notification = db.query(Notification).filter(Notification.id == notification_id).first()
+    result = await db.execute(select(Notification).filter(Notification.id == notification_id))
+    notification = result.scalars().first()
     
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
@@ -75,8 +82,8 @@ async def get_notification(
 @router.post("/", status_code=201)
 async def create_notification(
     notification: NotificationCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Create a new notification"""
     await validate_business_access(notification.business_id, current_user.id, db)
@@ -92,8 +99,8 @@ async def create_notification(
     )
     
     db.add(db_notification)
-    db.commit()
-    db.refresh(db_notification)
+    await db.commit()
+    await db.refresh(db_notification)
     
     return {
         "success": True,
@@ -104,11 +111,12 @@ async def create_notification(
 @router.put("/{notification_id}/read")
 async def mark_notification_read(
     notification_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Mark a notification as read"""
-    notification = db.query(Notification).filter(Notification.id == notification_id).first()
+    result = await db.execute(select(Notification).filter(Notification.id == notification_id))
+    notification = result.scalars().first()
     
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
@@ -117,8 +125,8 @@ async def mark_notification_read(
     
     notification.is_read = True
     notification.read_at = datetime.utcnow()
-    db.commit()
-    db.refresh(notification)
+    await db.commit()
+    await db.refresh(notification)
     
     return {
         "success": True,
@@ -129,21 +137,24 @@ async def mark_notification_read(
 @router.post("/mark-all-read")
 async def mark_all_notifications_read(
     business_id: int = Query(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Mark all notifications as read for a business"""
     await validate_business_access(business_id, current_user.id, db)
     
-    result = db.query(Notification).filter(
-        Notification.business_id == business_id,
-        Notification.is_read == False
-    ).update({
-        "is_read": True,
-        "read_at": datetime.utcnow()
-    })
+    updated = await db.execute(
+        update(Notification).where(
+            Notification.business_id == business_id,
+            Notification.is_read == False
+        ).values(
+            is_read=True,
+            read_at=datetime.utcnow()
+        )
+    )
+    result = updated.rowcount
     
-    db.commit()
+    await db.commit()
     
     return {
         "success": True,
@@ -154,19 +165,20 @@ async def mark_all_notifications_read(
 @router.delete("/{notification_id}")
 async def delete_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Delete a notification"""
-    notification = db.query(Notification).filter(Notification.id == notification_id).first()
+    result = await db.execute(select(Notification).filter(Notification.id == notification_id))
+    notification = result.scalars().first()
     
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     
     await validate_business_access(notification.business_id, current_user.id, db)
     
-    db.delete(notification)
-    db.commit()
+    await db.delete(notification)
+    await db.commit()
     
     return {
         "success": True,
@@ -3,8 +3,8 @@ Reports routes for SmartPesa API
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, and_
 from typing import Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
@@ -12,14 +12,15 @@ import csv
 from io import StringIO
 from fastapi.responses import Response
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
 from app.models.business import Business
 from app.models.transaction import Transaction
 from app.models.inventory import Inventory
 from app.models.supplier import Supplier, Payment
-from app.utils.auth import get_current_user
+from app.utils.auth import get_current_user_async
 from app.utils.validators import validate_business_access
+from app.middleware.admission import admission
 
 router = APIRouter()
 
@@ -28,8 +29,8 @@ async def profit_loss_report(
     business_id: int = Query(...),
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Generate profit and loss report"""
     await validate_business_access(business_id, current_user.id, db)
@@ -42,11 +43,14 @@ async def profit_loss_report(
     start = datetime.fromisoformat(start_date)
     end = datetime.fromisoformat(end_date)
     
-    transactions = db.query(Transaction).filter(
-        Transaction.business_id == business_id,
-        Transaction.created_at >= start,
-        Transaction.created_at <= end
-    ).all()
+    result = await db.execute(
+        select(Transaction.type, Transaction.amount).filter(
+            Transaction.business_id == business_id,
+            Transaction.created_at >= start,
+            Transaction.created_at <= end
+        )
+    )
+    transactions = result.all()
     
     total_income = sum(t.amount for t in transactions if t.type == 'income')
     total_expense = sum(t.amount for t in transactions if t.type == 'expense')
@@ -63,12 +67,12 @@ async def profit_loss_report(
         }
     }
 
-@router.get("/export/csv")
+@router.get("/export/csv", dependencies=[admission("reports")])
 async def export_to_csv(
     report_type: str = Query(..., regex="^(transactions|inventory|suppliers)$"),
     business_id: int = Query(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Export data as CSV file"""
     await validate_business_access(business_id, current_user.id, db)
@@ -78,9 +82,12 @@ async def export_to_csv(
     
     if report_type == 'transactions':
         writer.writerow(['Date', 'Description', 'Category', 'Amount', 'Type'])
-        transactions = db.query(Transaction).filter(
-            Transaction.business_id == business_id
-        ).order_by(Transaction.created_at.desc()).all()
+        result = await db.execute(
+            select(Transaction).filter(
+                Transaction.business_id == business_id
+            ).order_by(Transaction.created_at.desc())
+        )
+        transactions = result.scalars().all()
         
         for t in transactions:
             writer.writerow([
@@ -94,7 +101,8 @@ async def export_to_csv(
     
     elif report_type == 'inventory':
         writer.writerow(['SKU', 'Name', 'Quantity', 'Unit', 'Price/Unit', 'Total Value'])
-        inventory = db.query(Inventory).filter(Inventory.business_id == business_id).all()
+        result = await db.execute(select(Inventory).filter(Inventory.business_id == business_id))
+        inventory = result.scalars().all()
         
         for i in inventory:
             writer.writerow([
@@ -109,7 +117,8 @@ async def export_to_csv(
     
     else:  # suppliers
         writer.writerow(['Supplier', 'Contact', 'Phone', 'Email', 'Payment Terms'])
-        suppliers = db.query(Supplier).filter(Supplier.business_id == business_id).all()
+        result = await db.execute(select(Supplier).filter(Supplier.business_id == business_id))
+        suppliers = result.scalars().all()
         
         for s in suppliers:
             writer.writerow([
@@ -4,6 +4,7 @@ Utils package for SmartPesa
 
 from app.utils.auth import (
     get_current_user,
+    get_current_user_async,
     get_current_user_http,
     get_current_active_user,
     require_admin,
@@ -14,6 +15,7 @@ from app.utils.auth import (
 
 __all__ = [
     'get_current_user',
+    'get_current_user_async',
     'get_current_user_http',
     'get_current_active_user',
     'require_admin',
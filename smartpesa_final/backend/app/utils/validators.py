@@ -3,7 +3,8 @@ Validation utilities for SmartPesa
 """
 
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import re
 
 from app.models import Business
@@ -11,13 +12,14 @@ from app.models import Business
 async def validate_business_access(
     business_id: int,
     user_id: int,
-    db: Session
+    db: AsyncSession
 ) -> Business:
     """
     Validate that a user has access to a business
     Returns the business if valid, raises HTTPException otherwise
     """
-    business = db.query(Business).filter(Business.id == business_id).first()
+    result = await db.execute(select(Business).filter(Business.id == business_id))
+    business = result.scalars().first()
     
     if not business:
         raise HTTPException(
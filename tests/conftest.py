@@ -0,0 +1,49 @@
+"""
+Test settings - a throwaway SQLite database and local stores, set before any
+app module reads its configuration.
+"""
+import os
+import tempfile
+import uuid
+
+_scratch = tempfile.mkdtemp(prefix="smartpesa-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["FEATURE_STORE_DIR"] = os.path.join(_scratch, "feature_store")
+os.environ["MODEL_REGISTRY_DIR"] = os.path.join(_scratch, "model_registry")
+os.environ["EVALUATION_DIR"] = os.path.join(_scratch, "evaluation")
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.database import Base, engine
+    from app.main import app as asgi
+    Base.metadata.create_all(bind=engine)
+    # Entered so startup hooks run, as under uvicorn
+    with TestClient(asgi) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def owner(client):
+    """A fresh user with one business: {'user_id', 'business_id', 'headers'}"""
+    from app import auth, models
+    from app.database import SessionLocal
+    email = f"owner-{uuid.uuid4().hex[:8]}@example.com"
+    db = SessionLocal()
+    try:
+        user = models.User(email=email, hashed_password="not-used")
+        db.add(user)
+        db.flush()
+        business = models.Business(name="Test shop", owner_id=user.id)
+        db.add(business)
+        db.commit()
+        token = auth.create_access_token({"sub": email})
+        return {'user_id': user.id, 'business_id': business.id,
+                'headers': {"Authorization": f"Bearer {token}"}}
+    finally:
+        db.close()
@@ -0,0 +1,252 @@
+"""
+Local stand-in for a Redis server, speaking RESP2 over TCP
+
+Real redis-py clients (sync and redis.asyncio) connect to it with from_url, so
+the cache and rate limiter run their actual network, serialization and
+RedisError paths without a redis-server binary:
+
+    with RedisStub(scripts={RedisCache.RELEASE_SCRIPT: release}) as server:
+        cache = RedisCache(url=server.url)
+
+Supported: PING, HELLO (RESP2 or 3 handshake), SELECT, CLIENT, GET, SET (EX / PX / NX), DEL, INCR, INCRBY, EXISTS,
+FLUSHALL, SCRIPT LOAD, EVAL, EVALSHA. Lua isn't interpreted - each script the
+code under test sends is registered with a Python equivalent taking
+(server, keys, args); any other script gets the NOSCRIPT error a server returns.
+stop() closes the listener and open connections, so clients see the same
+ConnectionError as during an outage.
+"""
+import hashlib
+import socket
+import socketserver
+import threading
+import time
+
+
+class RedisStub:
+    def __init__(self, scripts: dict = None, host: str = "127.0.0.1", port: int = 0):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+        self.commands = []
+        self.connections = set()
+        self.scripts = {hashlib.sha1(text.encode()).hexdigest(): fn for text, fn in (scripts or {}).items()}
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            protocol = 2
+
+            def setup(self):
+                super().setup()
+                stub.connections.add(self.connection)
+
+            def finish(self):
+                stub.connections.discard(self.connection)
+                super().finish()
+
+            def handle(self):
+                while True:
+                    try:
+                        command = stub._read_command(self.rfile)
+                    except (OSError, ValueError):
+                        return
+                    if command is None:
+                        return
+                    reply = stub.execute(command)
+                    if isinstance(reply, Map):
+                        self.protocol = reply["proto"]
+                    try:
+                        self.wfile.write(stub._encode(reply, self.protocol))
+                    except OSError:
+                        return
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((host, port), Handler)
+        self.host, self.port = self._server.server_address
+        self.url = f"redis://{self.host}:{self.port}/0"
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop listening and drop open connections, like a server going away"""
+        self._server.shutdown()
+        self._server.server_close()
+        for connection in list(self.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # Keyspace helpers (also used by registered scripts)
+
+    def live(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def expire_in(self, key, seconds):
+        self.expires[key] = time.monotonic() + seconds
+
+    def remove(self, key):
+        self.expires.pop(key, None)
+        return self.data.pop(key, None) is not None
+
+    # ------------------------------------------------------------------
+    # Commands
+
+    def execute(self, command):
+        name, args = command[0].upper().decode(), command[1:]
+        self.commands.append(name)
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            return RespError(f"ERR unknown command '{name}'")
+        with self.lock:
+            try:
+                return handler(*args)
+            except (TypeError, ValueError) as e:
+                return RespError(f"ERR {e}")
+
+    def _cmd_ping(self, *args):
+        return Simple("PONG")
+
+    def _cmd_hello(self, protocol=b"2", *args):
+        info = {"server": "redis", "version": "7.2.0", "proto": int(protocol), "mode": "standalone", "role": "master"}
+        # Newer redis-py clients switch to RESP3 - replies only differ in the
+        # handshake map and the null, which the connection encodes per protocol
+        return Map(info) if int(protocol) == 3 else [x for item in info.items() for x in item]
+
+    def _cmd_select(self, db):
+        return Simple("OK")
+
+    def _cmd_client(self, *args):
+        return Simple("OK")
+
+    def _cmd_flushall(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return Simple("OK")
+
+    def _cmd_get(self, key):
+        return self.live(key)
+
+    def _cmd_set(self, key, value, *options):
+        options = [o.upper() if isinstance(o, bytes) else o for o in options]
+        ttl, nx, i = None, False, 0
+        while i < len(options):
+            if options[i] == b"EX":
+                ttl, i = float(options[i + 1]), i + 2
+            elif options[i] == b"PX":
+                ttl, i = float(options[i + 1]) / 1000, i + 2
+            elif options[i] == b"NX":
+                nx, i = True, i + 1
+            else:
+                raise ValueError("syntax error")
+        if nx and self.live(key) is not None:
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if ttl is not None:
+            self.expire_in(key, ttl)
+        return Simple("OK")
+
+    def _cmd_del(self, *keys):
+        return sum(1 for key in keys if self.live(key) is not None and self.remove(key))
+
+    def _cmd_exists(self, *keys):
+        return sum(1 for key in keys if self.live(key) is not None)
+
+    def _cmd_incr(self, key):
+        return self._cmd_incrby(key, b"1")
+
+    def _cmd_incrby(self, key, amount):
+        value = int(self.live(key) or 0) + int(amount)
+        self.data[key] = str(value).encode()
+        return value
+
+    def _cmd_script(self, subcommand, *args):
+        if subcommand.upper() == b"LOAD":
+            return hashlib.sha1(args[0]).hexdigest().encode()
+        if subcommand.upper() == b"EXISTS":
+            return [1 if sha.decode() in self.scripts else 0 for sha in args]
+        return Simple("OK")
+
+    def _cmd_eval(self, script, numkeys, *rest):
+        return self._cmd_evalsha(hashlib.sha1(script).hexdigest().encode(), numkeys, *rest)
+
+    def _cmd_evalsha(self, sha, numkeys, *rest):
+        fn = self.scripts.get(sha.decode())
+        if fn is None:
+            return RespError("NOSCRIPT No matching script. Please use EVAL.")
+        numkeys = int(numkeys)
+        return fn(self, list(rest[:numkeys]), list(rest[numkeys:]))
+
+    # ------------------------------------------------------------------
+    # Wire format (RESP2, plus the RESP3 null and map after HELLO 3)
+
+    @staticmethod
+    def _read_command(rfile):
+        line = rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command
+            return line.strip().split()
+        parts = []
+        for _ in range(int(line[1:])):
+            header = rfile.readline()
+            if not header.startswith(b"$"):
+                raise ValueError("expected bulk string")
+            length = int(header[1:])
+            parts.append(rfile.read(length + 2)[:-2])
+        return parts
+
+    @classmethod
+    def _encode(cls, value, protocol: int = 2) -> bytes:
+        if value is None:
+            return b"_\r\n" if protocol == 3 else b"$-1\r\n"
+        if isinstance(value, Simple):
+            return f"+{value}\r\n".encode()
+        if isinstance(value, RespError):
+            return f"-{value}\r\n".encode()
+        if isinstance(value, bool):
+            return f":{int(value)}\r\n".encode()
+        if isinstance(value, int):
+            return f":{value}\r\n".encode()
+        if isinstance(value, Map):
+            return f"%{len(value)}\r\n".encode() + b"".join(
+                cls._encode(k, protocol) + cls._encode(v, protocol) for k, v in value.items())
+        if isinstance(value, (list, tuple)):
+            return f"*{len(value)}\r\n".encode() + b"".join(cls._encode(item, protocol) for item in value)
+        if isinstance(value, str):
+            value = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class Simple(str):
+    """RESP simple string (+OK)"""
+
+
+class Map(dict):
+    """RESP3 map (%), only sent as the HELLO 3 reply"""
+
+
+class RespError(str):
+    """RESP error reply (-ERR ...)"""
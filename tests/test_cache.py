@@ -0,0 +1,70 @@
+import logging
+import pytest
+from app.cache import RedisCache
+from tests.redis_stub import RedisStub
+
+
+def release(server, keys, args):
+    """RedisCache.RELEASE_SCRIPT"""
+    if server.live(keys[0]) == args[0]:
+        return int(server.remove(keys[0]))
+    return 0
+
+
+@pytest.fixture
+def server():
+    with RedisStub(scripts={RedisCache.RELEASE_SCRIPT: release}) as stub:
+        yield stub
+
+
+def test_values_round_trip_through_the_protocol(server):
+    cache = RedisCache(url=server.url, prefix="t:")
+    cache.set("report", {"total": 12.5, "rows": [1, 2]}, ttl=30)
+
+    assert cache.get("report") == {"total": 12.5, "rows": [1, 2]}
+    assert b"t:report" in server.expires
+    assert cache.get("missing") is None
+    cache.delete("report")
+    assert cache.get("report") is None
+    assert cache.failures == 0
+
+
+def test_invalidate_business_moves_its_namespace(server):
+    cache = RedisCache(url=server.url, prefix="t:")
+    before = cache.business_key(7, "forecast", 30)
+    cache.invalidate_business(7)
+
+    assert cache.business_key(7, "forecast", 30) != before
+    assert cache.business_key(8, "forecast", 30) == "b8:g0:forecast:30"
+    assert cache.failures == 0
+
+
+def test_get_or_compute_releases_its_lock(server):
+    cache = RedisCache(url=server.url, prefix="t:")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_compute("k", compute) == "value"
+    assert cache.get_or_compute("k", compute) == "value"
+    assert len(calls) == 1
+    assert b"t:lock:k" not in server.data
+    assert "EVALSHA" in server.commands
+    assert cache.failures == 0
+
+
+def test_outage_degrades_to_recomputation_with_one_warning(server, caplog):
+    cache = RedisCache(url=server.url, prefix="t:")
+    cache.set("k", "stale")
+    server.stop()
+
+    with caplog.at_level(logging.WARNING, logger="app.cache"):
+        assert cache.get("k") is None
+        cache.set("k", "fresh")
+        assert cache.incr("gen:b1") is None
+        assert cache.get_or_compute("k", lambda: "computed") == "computed"
+
+    assert cache.failures >= 4
+    assert len([r for r in caplog.records if r.name == "app.cache"]) == 1
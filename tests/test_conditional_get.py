@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from app import models
+from app.database import SessionLocal
+
+
+def add_history(business_id, days=60):
+    """Daily income and expense rows, enough for a fast forecast"""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        for day in range(days):
+            for kind, amount in (("income", 500.0 + day % 7 * 40), ("expense", 300.0 + day % 5 * 25)):
+                db.add(models.Transaction(business_id=business_id, amount=amount, type=kind, category="Sales",
+                                          description="History", created_at=now - timedelta(days=day)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def revalidate(client, path, headers):
+    first = client.get(path, headers=headers)
+    assert first.status_code == 200
+    assert first.headers.get("etag")
+    again = client.get(path, headers={**headers, "If-None-Match": first.headers["etag"]})
+    return first, again
+
+
+def test_analytics_summary_revalidates(client, owner):
+    add_history(owner['business_id'], days=5)
+    path = f"/transactions/summary/overview?business_id={owner['business_id']}"
+    first, again = revalidate(client, path, owner['headers'])
+    assert again.status_code == 304
+    assert again.headers["etag"] == first.headers["etag"]
+
+
+def test_dashboard_revalidates(client, owner):
+    add_history(owner['business_id'], days=5)
+    path = f"/dashboard/{owner['business_id']}?widgets=summary,daily,recent"
+    _, again = revalidate(client, path, owner['headers'])
+    assert again.status_code == 304
+
+
+def test_forecast_revalidates_until_the_data_changes(client, owner):
+    add_history(owner['business_id'])
+    path = f"/forecast/{owner['business_id']}/7days?mode=fast"
+    first, again = revalidate(client, path, owner['headers'])
+    assert again.status_code == 304
+
+    client.post("/transactions/", headers=owner['headers'], json={
+        "business_id": owner['business_id'], "amount": 50.0, "type": "income",
+        "category": "Sales", "description": "New sale"
+    })
+    after_write = client.get(path, headers={**owner['headers'], "If-None-Match": first.headers["etag"]})
+    assert after_write.status_code == 200
+    assert after_write.headers["etag"] != first.headers["etag"]
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import pytest
+from app.middleware.rate_limit import RedisBuckets
+from tests.redis_stub import RedisStub
+
+
+def consume(server, keys, args):
+    """RedisBuckets.CONSUME_SCRIPT"""
+    capacity, refill, now, cost = (float(arg) for arg in args)
+    bucket = server.live(keys[0]) or {}
+    tokens = min(capacity, bucket.get("t", capacity) + max(0.0, now - bucket.get("s", now)) * refill)
+    allowed = 0
+    if tokens >= cost:
+        tokens -= cost
+        allowed = 1
+    server.data[keys[0]] = {"t": tokens, "s": now}
+    return [allowed, repr(tokens)]
+
+
+@pytest.fixture
+def server():
+    with RedisStub(scripts={RedisBuckets.CONSUME_SCRIPT: consume}) as stub:
+        yield stub
+
+
+def checks(url, n, capacity=2, refill=0.001):
+    async def run():
+        # redis.asyncio connections belong to the loop that opened them
+        buckets = RedisBuckets(url=url)
+        results = [await buckets.consume("user:1", 1, capacity, refill) for _ in range(n)]
+        return buckets, results
+    return asyncio.run(run())
+
+
+def test_bucket_drains_and_refuses(server):
+    buckets, results = checks(server.url, 3)
+
+    assert buckets.failures == 0
+    assert [allowed for allowed, _ in results] == [True, True, False]
+    assert results[-1][1] < 1
+
+
+def test_outage_lets_traffic_through_with_one_warning(server, caplog):
+    server.stop()
+    with caplog.at_level(logging.WARNING, logger="app.middleware.rate_limit"):
+        buckets, results = checks(server.url, 3)
+
+    assert results == [(True, 2), (True, 2), (True, 2)]
+    assert buckets.failures == 3
+    assert len([r for r in caplog.records if r.name == "app.middleware.rate_limit"]) == 1
@@ -0,0 +1,58 @@
+from app import models
+from app.database import SessionLocal
+
+
+def new_transaction(business_id, amount=120.0, **overrides):
+    return {"business_id": business_id, "amount": amount, "type": "income",
+            "category": "Sales", "description": "Counter sale", **overrides}
+
+
+def test_crud_round_trip(client, owner):
+    headers = owner['headers']
+    created = client.post("/transactions/", json=new_transaction(owner['business_id']), headers=headers)
+    assert created.status_code == 200
+    transaction_id = created.json()["id"]
+
+    fetched = client.get(f"/transactions/{transaction_id}", headers=headers)
+    assert fetched.status_code == 200
+    assert fetched.json()["amount"] == 120.0
+
+    listed = client.get("/transactions/", params={"business_id": owner['business_id']}, headers=headers)
+    assert [row["id"] for row in listed.json()] == [transaction_id]
+
+    updated = client.put(f"/transactions/{transaction_id}", json={"amount": 80.0, "type": "expense"},
+                         headers=headers)
+    assert updated.status_code == 200
+    assert (updated.json()["amount"], updated.json()["type"]) == (80.0, "expense")
+
+    assert client.delete(f"/transactions/{transaction_id}", headers=headers).status_code == 200
+    assert client.get(f"/transactions/{transaction_id}", headers=headers).status_code == 404
+
+
+def test_unknown_business_is_refused(client, owner):
+    refused = client.post("/transactions/", json=new_transaction(owner['business_id'] + 10_000),
+                        headers=owner['headers'])
+    assert refused.status_code == 404
+
+
+def test_idempotency_key_replays_the_first_response(client, owner):
+    headers = {**owner['headers'], "Idempotency-Key": "retry-1"}
+    body = new_transaction(owner['business_id'])
+
+    first = client.post("/transactions/", json=body, headers=headers)
+    retry = client.post("/transactions/", json=body, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers.get("idempotent-replayed") == "true"
+
+    db = SessionLocal()
+    try:
+        stored = db.query(models.Transaction).filter(
+            models.Transaction.business_id == owner['business_id']
+        ).count()
+    finally:
+        db.close()
+    assert stored == 1
+
+    changed = client.post("/transactions/", json={**body, "amount": 999.0}, headers=headers)
+    assert changed.status_code == 422